@@ -0,0 +1,616 @@
+"""
+Builtin values of the SML subset: functions implemented in Python, called
+primitives, that every program can use without defining them. Names that
+are not bound by the program are looked up in BUILTINS by the evaluators,
+and their types by the analyses; thus, definitions of the program shadow
+builtins with the same name.
+
+Host programs add their own primitives with register(), which takes the
+name, the SML type and a Python callable:
+
+    from Builtins import register
+    register("clamp", "int -> int -> int -> int", lambda lo, hi, x: max(lo, min(hi, x)),
+             pure=True)
+
+A primitive is pure if calling it again with the same arguments only
+returns the same result again; the others may have effects, such as
+printing, and are never called twice for the same call of the program (see
+effects). Host primitives are assumed to have effects unless registered with
+pure=True; the primitives of this module are pure.
+
+Primitives are curried, like the functions of the language: a primitive of
+arity n applied to fewer than n arguments is a new primitive that holds the
+arguments received so far. When the last argument arrives, the callable is
+called with the arguments, as Python values: int, bool, IntVector, Cell,
+or function values. Callables registered with visitor=True also receive, as
+the first argument, the visitor that evaluates the program, which they need
+to apply the function values that they receive (see apply). Calls to
+primitives copy no environment and create no closure.
+
+This module also defines integer vectors (IntVector) and lists (Cell), and
+their primitives. The primitives that take functions call host primitives
+directly (see _direct), so that, for instance, 'foldl max 0 l' makes no
+interpreted call per element.
+"""
+import sys
+from math import gcd
+from array import array
+from functools import partial
+from Types import *
+
+BUILTINS = {}
+
+_signature = None
+
+# Number of calls of primitives that may have effects (not pure), to all of
+# their arguments. An evaluation that overflows the Python stack is only
+# restarted if no such primitive was called in the meantime, since the
+# restart would repeat their effects (see Traversal.evaluate_expression).
+effects = 0
+
+class Primitive:
+    """
+    A function value implemented in Python.
+
+    Example:
+    >>> add = Primitive('add', 2, lambda x, y: x + y, None, pure=True)
+    >>> add3 = add.call(None, 3)
+    >>> add3, add3.call(None, 4)
+    (Primitive(add), 7)
+    >>> Primitive('neg', 1, lambda x: -x, parse_type('int -> int')).call(None, True)
+    Traceback (most recent call last):
+    ...
+    SystemExit: Type error
+
+    The TypeError and ValueError of host callables become the errors 'Type
+    error' and 'Domain' of the program. Callables that take the visitor check
+    their arguments themselves, and may evaluate functions of the program,
+    so their exceptions are not translated:
+    >>> Primitive('parse', 1, lambda visitor, s: int(s), None, visitor=True).call(None, 'x')
+    Traceback (most recent call last):
+    ...
+    ValueError: invalid literal for int() with base 10: 'x'
+    """
+    __slots__ = ("name", "arity", "function", "type", "visitor", "pure", "params",
+                 "result", "args", "__weakref__")
+
+    # Primitives capture no environment; the profilers measure this one.
+    env = {}
+
+    def __init__(self, name, arity, function, type_, visitor=False, args=(), pure=False):
+        self.name = name
+        self.arity = arity
+        self.function = function
+        self.type = type_
+        self.visitor = visitor
+        self.pure = pure
+        self.args = args
+        # The arguments and the result of base types (int, bool, lists and
+        # vectors) are checked against the declared type; params is None if
+        # no argument has a base type.
+        self.params = None
+        self.result = None
+        if type_ is not None and not args:
+            params = []
+            for _ in range(arity):
+                type_ = prune(type_)
+                params.append(_base_class(type_.domain))
+                type_ = type_.codomain
+            if any(param is not None for param in params):
+                self.params = tuple(params)
+            self.result = _base_class(type_)
+
+    def call(self, visitor, *arguments):
+        args = self.args + arguments
+        if len(args) < self.arity:
+            partial = Primitive(self.name, self.arity, self.function, self.type,
+                                self.visitor, args, self.pure)
+            partial.params = self.params
+            partial.result = self.result
+            return partial
+        if not self.pure:
+            global effects
+            effects += 1
+        if self.params is not None:
+            _check_arguments(args, self.params)
+        if self.visitor:
+            return self.function(visitor, *args)
+        try:
+            result = self.function(*args)
+        except TypeError:
+            sys.exit("Type error")
+        except ValueError:
+            sys.exit("Domain")
+        if self.result is not None and type(result) is not self.result:
+            sys.exit("Type error")
+        return result
+
+    def __str__(self):
+        return f"Primitive({self.name})"
+
+    __repr__ = __str__
+
+def _base_class(type_):
+    """
+    Returns the class of the values of a base type, or None for function
+    types and type variables, whose values are not checked.
+    """
+    type_ = prune(type_)
+    if isinstance(type_, ListType):
+        return Cell
+    return type_ if isinstance(type_, type) else None
+
+def _check_arguments(args, params):
+    """Stops the program if an argument is not of the class declared for it."""
+    for value, param in zip(args, params):
+        if param is not None and type(value) is not param:
+            sys.exit("Type error")
+
+def arity(type_):
+    """
+    Returns the number of arguments of a function type.
+
+    Example:
+    >>> arity(ArrowType(type(1), ArrowType(type(1), type(True))))
+    2
+    """
+    count = 0
+    type_ = prune(type_)
+    while isinstance(type_, ArrowType):
+        count += 1
+        type_ = prune(type_.codomain)
+    return count
+
+def parse_type(text):
+    """
+    Returns the type denoted by a text in SML notation. Type variables with
+    the same name are the same variable, and are generic: each use of the
+    primitive gets a fresh copy of them.
+
+    Example:
+    >>> parse_type("('a -> 'b) -> int vector -> bool")
+    ('a -> 'b) -> int vector -> bool
+    """
+    tokens = text.replace("(", " ( ").replace(")", " ) ").replace("->", " -> ").split()
+    variables = {}
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def advance():
+        nonlocal position
+        if position >= len(tokens):
+            raise ValueError(f"Invalid type: {text}")
+        position += 1
+        return tokens[position - 1]
+
+    def arrow():
+        domain = applied()
+        if peek() == "->":
+            advance()
+            return ArrowType(domain, arrow())
+        return domain
+
+    def applied():
+        type_ = atom()
+        while peek() in TYPE_CONSTRUCTORS:
+            type_ = TYPE_CONSTRUCTORS[advance()](type_)
+            if type_ is None:
+                raise ValueError(f"Invalid type: {text}")
+        return type_
+
+    def atom():
+        token = advance()
+        if token == "(":
+            type_ = arrow()
+            if advance() != ")":
+                raise ValueError(f"Invalid type: {text}")
+            return type_
+        if token in BASE_TYPES:
+            return BASE_TYPES[token]
+        if token.startswith("'") and token[1:].isalnum():
+            return variables.setdefault(token, TypeVariable(GENERIC))
+        raise ValueError(f"Invalid type: {text}")
+
+    type_ = arrow()
+    if peek() is not None:
+        raise ValueError(f"Invalid type: {text}")
+    return type_
+
+def register(name, type_, function, visitor=False, pure=False):
+    """
+    Defines the builtin name, of type type_ (a text in SML notation, or a
+    type of Types.py), implemented by function, and returns the primitive.
+    A builtin with the same name is replaced. Unless pure is set, calls to
+    the primitive are assumed to have effects.
+
+    Example:
+    >>> _ = register("hypot", "int -> int -> int", lambda x, y: int((x * x + y * y) ** 0.5))
+    >>> BUILTINS["hypot"].call(None, 3).call(None, 4), BUILTINS["hypot"].pure
+    (5, False)
+    >>> unregister("hypot")
+    >>> register("in", "int", lambda: 1)
+    Traceback (most recent call last):
+    ...
+    ValueError: Invalid name: in
+    """
+    from Lexer import Lexer, TokenType
+    try:
+        kinds = [token.kind for token in Lexer(name).tokens()]
+    except SystemExit:
+        kinds = None
+    if kinds != [TokenType.VAR]:
+        raise ValueError(f"Invalid name: {name}")
+    if isinstance(type_, str):
+        type_ = parse_type(type_)
+    if arity(type_) == 0:
+        raise ValueError(f"Primitives must be functions: {name}")
+    global _signature
+    BUILTINS[name] = Primitive(name, arity(type_), function, type_, visitor, pure=pure)
+    _signature = None
+    return BUILTINS[name]
+
+def unregister(name):
+    """Removes the builtin name."""
+    global _signature
+    BUILTINS.pop(name, None)
+    _signature = None
+
+def signature():
+    """
+    Returns a description of the builtins, which changes when a builtin is
+    registered with another type or callable. Caches of types and of results
+    include it in their keys.
+    """
+    global _signature
+    if _signature is None:
+        _signature = "\n".join(sorted(
+            f"{name} : {type_to_string(primitive.type)} = "
+            f"{getattr(primitive.function, '__module__', None)}."
+            f"{getattr(primitive.function, '__qualname__', None) or repr(primitive.function)}"
+            for name, primitive in BUILTINS.items()))
+    return _signature
+
+def primitive(name, type_, pure=True):
+    """Decorator that registers the function, which takes the visitor, as a builtin."""
+    def define(function):
+        register(name, type_, function, visitor=True, pure=pure)
+        return function
+    return define
+
+def apply(visitor, function, argument):
+    """Applies a function value received by a primitive to an argument."""
+    if isinstance(function, Primitive):
+        return function.call(visitor, argument)
+    if not hasattr(function, "body"):
+        sys.exit("Type Error")
+    return visitor.apply(function, argument)
+
+def _direct(function, count):
+    """
+    Returns a Python callable that applies the function value to count
+    arguments at once, if it is a host primitive that is missing exactly
+    count arguments; otherwise, None, and the function must be applied with
+    apply, one argument at a time.
+    """
+    if type(function) is not Primitive or function.visitor:
+        return None
+    if function.arity - len(function.args) != count:
+        return None
+    call = partial(function.function, *function.args) if function.args else function.function
+    params, expected = function.params, function.result
+    if params is not None:
+        # The arguments held by a partial application are checked once.
+        _check_arguments(function.args, params)
+        params = params[len(function.args):]
+    def checked(*args):
+        if params is not None:
+            _check_arguments(args, params)
+        try:
+            result = call(*args)
+        except TypeError:
+            sys.exit("Type error")
+        except ValueError:
+            sys.exit("Domain")
+        if expected is not None and type(result) is not expected:
+            sys.exit("Type error")
+        return result
+    return checked
+
+def _saturated(visitor, function, count):
+    """
+    Returns a Python callable that applies the function value to count
+    arguments in a single call, if it is a closure of arity count, and the
+    visitor binds several arguments at once (see EvalVisitor.visit_spine);
+    otherwise, None.
+    """
+    if type(function) is Primitive or not getattr(visitor, "uncurried_calls", False):
+        return None
+    if getattr(function, "arity", 1) != count:
+        return None
+    return lambda *args: visitor.call_closure(function, args)
+
+def _int(value):
+    if type(value) is not int:
+        sys.exit("Type error")
+    return value
+
+class IntVector:
+    """
+    An immutable vector of integers. The elements are stored as machine
+    integers, in an array('q'), and read through a read-only memoryview:
+    slices share the memory of the vector that they come from. Vectors are
+    values of the base type 'int vector'.
+
+    Example:
+    >>> v = IntVector.from_iterable(range(5))
+    >>> v, len(v), v[2]
+    (#[0, 1, 2, 3, 4], 5, 2)
+    >>> IntVector(v.items[1:3]) == IntVector.from_iterable([1, 2])
+    True
+    """
+    __slots__ = ("items",)
+
+    sml_name = "int vector"
+
+    def __init__(self, items):
+        self.items = items
+
+    @staticmethod
+    def from_iterable(values):
+        try:
+            return IntVector(memoryview(array('q', values)).toreadonly())
+        except OverflowError:
+            sys.exit("Overflow")
+        except TypeError:
+            sys.exit("Type error")
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __eq__(self, other):
+        return isinstance(other, IntVector) and self.items == other.items
+
+    def __str__(self):
+        return "#[" + ", ".join(map(str, self.items)) + "]"
+
+    __repr__ = __str__
+
+    def __reduce__(self):
+        # Memoryviews cannot be pickled: images keep the bytes of the elements.
+        return (_load_vector, (self.items.tobytes(),))
+
+def _load_vector(data):
+    items = array('q')
+    items.frombytes(data)
+    return IntVector(memoryview(items).toreadonly())
+
+def _vector(value):
+    if type(value) is not IntVector:
+        sys.exit("Type error")
+    return value
+
+BASE_TYPES = {"int": type(1), "bool": type(True)}
+
+# Postfix type constructors: each maps the type of the argument to the
+# constructed type, or to None if the argument is not accepted.
+TYPE_CONSTRUCTORS = {
+    "vector": lambda t: IntVector if prune(t) is type(1) else None,
+    "list": ListType,
+}
+
+@primitive("vtabulate", "int -> (int -> int) -> int vector")
+def vtabulate(visitor, n, f):
+    """Returns the vector [f 0, ..., f (n - 1)]."""
+    if _int(n) < 0:
+        sys.exit("Size")
+    call = _direct(f, 1) or partial(apply, visitor, f)
+    # The elements are computed before the conversion, whose errors are
+    # translated, so that the errors of f are not.
+    return IntVector.from_iterable([_int(call(i)) for i in range(n)])
+
+@primitive("vsub", "int vector -> int -> int")
+def vsub(visitor, v, i):
+    """Returns the element of index i of v."""
+    if not 0 <= _int(i) < len(_vector(v)):
+        sys.exit("Subscript")
+    return v.items[i]
+
+@primitive("vlength", "int vector -> int")
+def vlength(visitor, v):
+    return len(_vector(v))
+
+@primitive("vmap", "(int -> int) -> int vector -> int vector")
+def vmap(visitor, f, v):
+    call = _direct(f, 1) or partial(apply, visitor, f)
+    return IntVector.from_iterable([_int(call(x)) for x in _vector(v)])
+
+@primitive("vfoldl", "(int -> 'a -> 'a) -> 'a -> int vector -> 'a")
+def vfoldl(visitor, f, acc, v):
+    """Returns f xn (... (f x1 (f x0 acc))), where x0, ..., xn are the elements of v."""
+    return _foldl(visitor, f, acc, _vector(v))
+
+@primitive("vsum", "int vector -> int")
+def vsum(visitor, v):
+    return sum(_vector(v).items)
+
+@primitive("vslice", "int vector -> int -> int -> int vector")
+def vslice(visitor, v, i, n):
+    """Returns the n elements of v from index i on, without copying them."""
+    if not (0 <= _int(i) <= len(_vector(v)) and 0 <= _int(n) <= len(v) - i):
+        sys.exit("Subscript")
+    return IntVector(v.items[i:i + n])
+
+class Cell:
+    """
+    A cell of an immutable list: the first element (head) and the rest of
+    the list (tail). The empty list is the cell NIL. Lists share their
+    tails, so 'x :: l' allocates one cell, and every operation walks lists
+    with loops, never with recursion, so lists of any length are handled.
+
+    Example:
+    >>> l = Cell.from_iterable([1, 2, 3])
+    >>> l, len(l), l.tail, NIL
+    ([1, 2, 3], 3, [2, 3], [])
+    >>> Cell(0, l) == Cell.from_iterable(range(4)), l == l.tail
+    (True, False)
+    """
+    __slots__ = ("head", "tail")
+
+    def __init__(self, head, tail):
+        self.head = head
+        self.tail = tail
+
+    @staticmethod
+    def from_iterable(values, tail=None):
+        """Returns the list of the values, followed by tail (by default, NIL)."""
+        cell = NIL if tail is None else tail
+        values = values if isinstance(values, (list, tuple)) else list(values)
+        for value in reversed(values):
+            cell = Cell(value, cell)
+        return cell
+
+    def __iter__(self):
+        cell = self
+        while cell is not NIL:
+            yield cell.head
+            cell = cell.tail
+
+    def __len__(self):
+        count = 0
+        cell = self
+        while cell is not NIL:
+            count += 1
+            cell = cell.tail
+        return count
+
+    def __eq__(self, other):
+        if type(other) is not Cell:
+            return False
+        cell = self
+        while cell is not NIL and other is not NIL:
+            if cell is other:
+                return True
+            if not cell.head == other.head:
+                return False
+            cell, other = cell.tail, other.tail
+        return cell is other
+
+    __hash__ = None
+
+    def __str__(self):
+        return "[" + ", ".join(map(str, self)) + "]"
+
+    __repr__ = __str__
+
+    def __reduce__(self):
+        # Pickling the cells one inside the other would recurse once per element.
+        return (_load_list, (tuple(self),))
+
+NIL = Cell(None, None)
+
+def _load_list(items):
+    return Cell.from_iterable(items)
+
+def _list(value):
+    if type(value) is not Cell:
+        sys.exit("Type error")
+    return value
+
+def append(l0, l1):
+    """Returns the list of the elements of l0 followed by l1, which is shared."""
+    if _list(l1) is NIL:
+        return _list(l0)
+    return Cell.from_iterable(list(_list(l0)), l1)
+
+def _foldl(visitor, f, acc, items):
+    step = _direct(f, 2) or _saturated(visitor, f, 2)
+    if step is None:
+        for x in items:
+            acc = apply(visitor, apply(visitor, f, x), acc)
+    else:
+        for x in items:
+            acc = step(x, acc)
+    return acc
+
+@primitive("hd", "'a list -> 'a")
+def hd(visitor, l):
+    if _list(l) is NIL:
+        sys.exit("Empty")
+    return l.head
+
+@primitive("tl", "'a list -> 'a list")
+def tl(visitor, l):
+    if _list(l) is NIL:
+        sys.exit("Empty")
+    return l.tail
+
+@primitive("null", "'a list -> bool")
+def null(visitor, l):
+    return _list(l) is NIL
+
+@primitive("length", "'a list -> int")
+def length(visitor, l):
+    return len(_list(l))
+
+@primitive("rev", "'a list -> 'a list")
+def rev(visitor, l):
+    items = list(_list(l))
+    items.reverse()
+    return Cell.from_iterable(items)
+
+@primitive("map", "('a -> 'b) -> 'a list -> 'b list")
+def map_(visitor, f, l):
+    call = _direct(f, 1) or partial(apply, visitor, f)
+    return Cell.from_iterable([call(x) for x in _list(l)])
+
+@primitive("filter", "('a -> bool) -> 'a list -> 'a list")
+def filter_(visitor, f, l):
+    call = _direct(f, 1) or partial(apply, visitor, f)
+    kept = []
+    for x in _list(l):
+        keep = call(x)
+        if type(keep) is not bool:
+            sys.exit("Type error")
+        if keep:
+            kept.append(x)
+    return Cell.from_iterable(kept)
+
+@primitive("foldl", "('a -> 'b -> 'b) -> 'b -> 'a list -> 'b")
+def foldl(visitor, f, acc, l):
+    """Returns f xn (... (f x1 (f x0 acc))), where x0, ..., xn are the elements of l."""
+    return _foldl(visitor, f, acc, _list(l))
+
+@primitive("foldr", "('a -> 'b -> 'b) -> 'b -> 'a list -> 'b")
+def foldr(visitor, f, acc, l):
+    """Returns f x0 (f x1 (... (f xn acc))), where x0, ..., xn are the elements of l."""
+    items = list(_list(l))
+    items.reverse()
+    return _foldl(visitor, f, acc, items)
+
+@primitive("tabulate", "int -> (int -> 'a) -> 'a list")
+def tabulate(visitor, n, f):
+    """Returns the list [f 0, ..., f (n - 1)]."""
+    if _int(n) < 0:
+        sys.exit("Size")
+    call = _direct(f, 1) or partial(apply, visitor, f)
+    return Cell.from_iterable([call(i) for i in range(n)])
+
+def _pow(base, exponent):
+    if exponent < 0:
+        sys.exit("Domain")
+    return base ** exponent
+
+# Arithmetic helpers, implemented by the host.
+register("abs", "int -> int", abs, pure=True)
+register("max", "int -> int -> int", max, pure=True)
+register("min", "int -> int -> int", min, pure=True)
+register("pow", "int -> int -> int", _pow, pure=True)
+register("gcd", "int -> int -> int", gcd, pure=True)
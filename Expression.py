@@ -1,7 +1,11 @@
 from abc import ABC, abstractmethod
-from Visitor import *
 
 class Expression(ABC):
+    # Position of the expression in the source code, when it comes from the
+    # parser. Expressions built directly have no position.
+    line = None
+    column = None
+
     @abstractmethod
     def accept(self, visitor, arg):
         raise NotImplementedError
@@ -17,6 +21,7 @@ class Var(Expression):
         """
         Example:
         >>> e = Var('var')
+        >>> from Visitor import EvalVisitor
         >>> ev = EvalVisitor()
         >>> e.accept(ev, {'var': 42})
         42
@@ -40,6 +45,7 @@ class Bln(Expression):
         """
         Example:
         >>> e = Bln(True)
+        >>> from Visitor import EvalVisitor
         >>> ev = EvalVisitor()
         >>> e.accept(ev, None)
         True
@@ -57,6 +63,7 @@ class Num(Expression):
         """
         Example:
         >>> e = Num(3)
+        >>> from Visitor import EvalVisitor
         >>> ev = EvalVisitor()
         >>> e.accept(ev, None)
         3
@@ -88,6 +95,7 @@ class Eql(BinaryExpression):
         >>> n1 = Num(3)
         >>> n2 = Num(4)
         >>> e = Eql(n1, n2)
+        >>> from Visitor import EvalVisitor
         >>> ev = EvalVisitor()
         >>> e.accept(ev, None)
         False
@@ -112,6 +120,7 @@ class Add(BinaryExpression):
         >>> n1 = Num(3)
         >>> n2 = Num(4)
         >>> e = Add(n1, n2)
+        >>> from Visitor import EvalVisitor
         >>> ev = EvalVisitor()
         >>> e.accept(ev, None)
         7
@@ -129,6 +138,7 @@ class Sub(BinaryExpression):
         >>> n1 = Num(3)
         >>> n2 = Num(4)
         >>> e = Sub(n1, n2)
+        >>> from Visitor import EvalVisitor
         >>> ev = EvalVisitor()
         >>> e.accept(ev, None)
         -1
@@ -146,6 +156,7 @@ class Mul(BinaryExpression):
         >>> n1 = Num(3)
         >>> n2 = Num(4)
         >>> e = Mul(n1, n2)
+        >>> from Visitor import EvalVisitor
         >>> ev = EvalVisitor()
         >>> e.accept(ev, None)
         12
@@ -164,6 +175,7 @@ class Div(BinaryExpression):
         >>> n1 = Num(28)
         >>> n2 = Num(4)
         >>> e = Div(n1, n2)
+        >>> from Visitor import EvalVisitor
         >>> ev = EvalVisitor()
         >>> e.accept(ev, None)
         7
@@ -189,6 +201,7 @@ class Leq(BinaryExpression):
         >>> n1 = Num(3)
         >>> n2 = Num(4)
         >>> e = Leq(n1, n2)
+        >>> from Visitor import EvalVisitor
         >>> ev = EvalVisitor()
         >>> e.accept(ev, None)
         True
@@ -220,6 +233,7 @@ class Lth(BinaryExpression):
         >>> n1 = Num(3)
         >>> n2 = Num(4)
         >>> e = Lth(n1, n2)
+        >>> from Visitor import EvalVisitor
         >>> ev = EvalVisitor()
         >>> e.accept(ev, None)
         True
@@ -265,6 +279,7 @@ class Neg(UnaryExpression):
         Example:
         >>> n = Num(3)
         >>> e = Neg(n)
+        >>> from Visitor import EvalVisitor
         >>> ev = EvalVisitor()
         >>> e.accept(ev, None)
         -3
@@ -286,6 +301,7 @@ class Not(UnaryExpression):
         Example:
         >>> t = Bln(True)
         >>> e = Not(t)
+        >>> from Visitor import EvalVisitor
         >>> ev = EvalVisitor()
         >>> e.accept(ev, None)
         False
@@ -312,6 +328,7 @@ class Let(Expression):
         """
         Example:
         >>> e = Let('v', Num(42), Var('v'))
+        >>> from Visitor import EvalVisitor
         >>> ev = EvalVisitor()
         >>> e.accept(ev, {})
         42
@@ -346,6 +363,7 @@ class IfThenElse(Expression):
         """
         Example:
         >>> e = IfThenElse(Bln(True), Num(42), Num(30))
+        >>> from Visitor import EvalVisitor
         >>> ev = EvalVisitor()
         >>> e.accept(ev, {})
         42
@@ -371,10 +389,21 @@ class Or(BinaryExpression):
 
 # Formal aqui é o parâmetro
 class Fn(Expression):
+    """
+    This class represents an anonymous function of one parameter. Functions
+    of several parameters, such as 'fn x y => e', are curried: they are
+    read as 'fn x => fn y => e'. The arity of a function is the number of
+    parameters of that chain, which the evaluator uses to apply the function
+    to all of them in a single call, when it is given that many arguments.
 
+    Example:
+    >>> Fn(Var('x'), Fn(Var('y'), Add(Var('x'), Var('y')))).arity
+    2
+    """
     def __init__(self, formal, body):
         self.formal = formal
         self.body = body
+        self.arity = body.arity + 1 if type(body) is Fn else 1
 
     def accept(self, visitor, arg):
         return visitor.visit_function(self, arg)
@@ -398,10 +427,129 @@ class Fun(Fn):
     def accept(self, visitor, arg):
         return visitor.visit_rec_fun(self, arg)
 
+class LetRec(Expression):
+    """
+    This class represents a group of mutually recursive functions, such as
+    "let fun f x = e0 and g y = e1 in e2 end": every function of the group
+    can call itself and the others, and e2 is evaluated in the environment
+    extended with all of them.
+    """
+    def __init__(self, functions, exp_body):
+        self.functions = functions
+        self.exp_body = exp_body
 
+    def accept(self, visitor, arg):
+        """
+        Example:
+        >>> e0 = Fun(Var('even'), Var('n'), IfThenElse(Eql(Var('n'), Num(0)), Bln(True),
+        ...          App(Var('odd'), Sub(Var('n'), Num(1)))))
+        >>> e1 = Fun(Var('odd'), Var('n'), IfThenElse(Eql(Var('n'), Num(0)), Bln(False),
+        ...          App(Var('even'), Sub(Var('n'), Num(1)))))
+        >>> from Visitor import EvalVisitor
+        >>> LetRec([e0, e1], App(Var('odd'), Num(7))).accept(EvalVisitor(), {})
+        True
+        """
+        return visitor.visit_letrec(self, arg)
 
+class Global(Var):
+    """
+    This class represents a use of a top-level name of a program compiled
+    into a Module (see Module.py). The name was resolved at compile time to
+    a slot of the array of globals of the module, so its value is loaded
+    from that slot, instead of being looked up in the environment.
+    """
+    def __init__(self, identifier, slots, slot):
+        super().__init__(identifier)
+        self.slots = slots
+        self.slot = slot
 
+    def accept(self, visitor, arg):
+        """
+        Example:
+        >>> from Visitor import EvalVisitor
+        >>> Global('x', [7, 42], 1).accept(EvalVisitor(), {})
+        42
+        """
+        return visitor.visit_global(self, arg)
 
+class Nil(Expression):
+    """
+    This class represents the empty list, written []. List literals such as
+    [e0, e1] are read by the parser as e0 :: e1 :: [].
+    """
+    def accept(self, visitor, arg):
+        """
+        Example:
+        >>> from Visitor import EvalVisitor
+        >>> Nil().accept(EvalVisitor(), {})
+        []
+        """
+        return visitor.visit_nil(self, arg)
 
+class Cons(BinaryExpression):
+    """
+    This class represents the construction of a list, 'head :: tail'. The
+    evaluation of such an expression is a new list whose first element is
+    the value of the left operand, followed by the elements of the right
+    operand, which must be a list. The right operand is shared, not copied.
+    """
+    def accept(self, visitor, arg):
+        """
+        Example:
+        >>> e = Cons(Num(1), Cons(Num(2), Nil()))
+        >>> from Visitor import EvalVisitor
+        >>> ev = EvalVisitor()
+        >>> e.accept(ev, {})
+        [1, 2]
+        """
+        return visitor.visit_cons(self, arg)
 
-
+class Append(BinaryExpression):
+    """
+    This class represents the concatenation of two lists, 'l0 @ l1'. The
+    elements of l0 are copied, and l1 is shared.
+    """
+    def accept(self, visitor, arg):
+        """
+        Example:
+        >>> e = Append(Cons(Num(1), Nil()), Cons(Num(2), Nil()))
+        >>> from Visitor import EvalVisitor
+        >>> ev = EvalVisitor()
+        >>> e.accept(ev, {})
+        [1, 2]
+        """
+        return visitor.visit_append(self, arg)
+
+def structural_hash(exp):
+    """
+    Returns a digest of the structure of an expression: the classes of its
+    nodes, in order, with their names and literals. Source positions, the
+    addresses that the analysis gives to variables, and the arities of
+    functions, which are derived from the structure, are not part of it, so
+    the same code has the same digest wherever it appears in a file. The
+    elements of list fields, such as the functions of a LetRec, are
+    children too.
+
+    Example:
+    >>> structural_hash(Add(Num(1), Var('x'))) == structural_hash(Add(Num(1), Var('x')))
+    True
+    >>> structural_hash(Add(Num(1), Var('x'))) == structural_hash(Add(Var('x'), Num(1)))
+    False
+    """
+    import hashlib
+    digest = hashlib.sha256()
+    stack = [exp]
+    while stack:
+        node = stack.pop()
+        children = []
+        fields = []
+        for key, value in vars(node).items():
+            if isinstance(value, Expression):
+                children.append(value)
+            elif isinstance(value, list):
+                children.extend(item for item in value if isinstance(item, Expression))
+            elif key not in ("line", "column", "address", "arity"):
+                fields.append(f"{key}={value!r}")
+        digest.update(f"{type(node).__name__}/{len(children)}/{','.join(fields)};".encode())
+        stack.extend(reversed(children))
+    return digest.hexdigest()
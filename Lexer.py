@@ -1,10 +1,13 @@
+import sys
 import enum
 
 
 class Token:
-    def __init__(self, tokenText, tokenKind):
+    def __init__(self, tokenText, tokenKind, line=None, column=None):
         self.text = tokenText
         self.kind = tokenKind
+        self.line = line
+        self.column = column
 
 
 class TokenType(enum.Enum):
@@ -45,12 +48,22 @@ class TokenType(enum.Enum):
     MOD = 224
     FUN = 225
     VAL = 226
+    LBK = 227
+    RBK = 228
+    CMA = 229
+    CNS = 230
+    CAT = 231
+    GTH = 232
+    GEQ = 233
+    SMC = 234
 
 
 class Lexer:
     def __init__(self, source: str):
         self.source = source
         self.sourcePointer = 0
+        self.line = 1
+        self.lineStart = 0
         self.currChar = self.source[self.sourcePointer] if self.source else None
 
     def nextChar(self):
@@ -61,11 +74,52 @@ class Lexer:
             self.currChar = self.source[self.sourcePointer]
 
     def tokens(self):
-        token = self.getToken()
+        token = self.spannedToken()
         while token is not None and token.kind != TokenType.EOF:
-            if token.kind not in (TokenType.WSP, TokenType.NLN):
+            if token.kind not in (TokenType.WSP, TokenType.NLN, TokenType.COM):
                 yield token
-            token = self.getToken()
+            token = self.spannedToken()
+
+    def spannedToken(self):
+        """
+        Returns the next token, annotated with the line and the column (both
+        starting at 1) where it begins in the source.
+
+        Example:
+        >>> lexer = Lexer('1 +\\n  x')
+        >>> [(t.text, t.line, t.column) for t in lexer.tokens()]
+        [('1', 1, 1), ('+', 1, 3), ('x', 2, 3)]
+        """
+        line, column = self.line, self.sourcePointer - self.lineStart + 1
+        token = self.getToken()
+        token.line, token.column = line, column
+        return token
+
+    def blockComment(self):
+        """
+        Reads a comment '(* ... *)', which may span several lines and contain
+        other comments. A comment that is not closed stops the program.
+
+        Example:
+        >>> [t.text for t in Lexer('(* a (* b *) *) x_1 (* c\\n *) >= 1').tokens()]
+        ['x_1', '>=', '1']
+        """
+        start, depth = self.sourcePointer, 0
+        while self.currChar is not None:
+            if self.source.startswith("(*", self.sourcePointer):
+                depth += 1
+                self.nextChar()
+            elif self.source.startswith("*)", self.sourcePointer):
+                depth -= 1
+                self.nextChar()
+                if depth == 0:
+                    self.nextChar()
+                    return Token(self.source[start:self.sourcePointer], TokenType.COM)
+            elif self.currChar == "\n":
+                self.line += 1
+                self.lineStart = self.sourcePointer + 1
+            self.nextChar()
+        sys.exit("Parse error")
 
     def getToken(self):
         # Skip whitespace
@@ -75,6 +129,8 @@ class Lexer:
         if self.currChar.isspace():
             if self.currChar == "\n":
                 self.nextChar()
+                self.line += 1
+                self.lineStart = self.sourcePointer
                 return Token("\\n", TokenType.NLN)
             self.nextChar()
             return Token(" ", TokenType.WSP)
@@ -134,12 +190,39 @@ class Lexer:
                 self.nextChar()
                 return Token("<-", TokenType.BACKARROW)
             return Token("<", TokenType.LTH)
+        if self.currChar == ">":
+            self.nextChar()
+            if self.currChar == "=":
+                self.nextChar()
+                return Token(">=", TokenType.GEQ)
+            return Token(">", TokenType.GTH)
+        if self.source.startswith("(*", self.sourcePointer):
+            return self.blockComment()
         if self.currChar == "(":
             self.nextChar()
             return Token("(", TokenType.LPR)
         if self.currChar == ")":
             self.nextChar()
             return Token(")", TokenType.RPR)
+        if self.currChar == "[":
+            self.nextChar()
+            return Token("[", TokenType.LBK)
+        if self.currChar == "]":
+            self.nextChar()
+            return Token("]", TokenType.RBK)
+        if self.currChar == ",":
+            self.nextChar()
+            return Token(",", TokenType.CMA)
+        if self.currChar == ";":
+            self.nextChar()
+            return Token(";", TokenType.SMC)
+        if self.currChar == "@":
+            self.nextChar()
+            return Token("@", TokenType.CAT)
+        if self.source.startswith("::", self.sourcePointer):
+            self.sourcePointer += 2
+            self.currChar = self.source[self.sourcePointer] if self.sourcePointer < len(self.source) else None
+            return Token("::", TokenType.CNS)
 
         if self.source.startswith("fn", self.sourcePointer):
             self.sourcePointer += 2 
@@ -223,7 +306,7 @@ class Lexer:
         if self.currChar.isalpha():
             text = self.currChar
             self.nextChar()
-            while self.currChar is not None and (self.currChar.isalpha() or self.currChar.isdigit()):
+            while self.currChar is not None and (self.currChar.isalnum() or self.currChar == "_"):
                 text += self.currChar
                 self.nextChar()
             return Token(text, TokenType.VAR)
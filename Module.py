@@ -0,0 +1,206 @@
+"""
+Compilation of the top-level declarations of a program into a module. The
+parser reads a program 'd1 ... dn e' as nested let expressions, so the
+evaluator would keep the top-level names in the dictionary environments of
+EvalVisitor: every closure would capture every name declared before it, and
+every call would copy all of them. A Module gives each top-level name a slot
+of a fixed array instead, and resolves, at compile time, each use of the
+name to a Global node that loads that slot. Thus the environments that
+closures capture and copy only hold their local names (and the names of the
+environment where the module runs, such as a prelude), and a call to a
+top-level function loads it directly from its slot.
+"""
+import copy
+from Expression import *
+from Visitor import *
+from Traversal import run, evaluate_expression
+
+class GlobalResolver(Visitor):
+    """
+    Rewrites an expression so that the names of globals, which scope maps to
+    their slots, are loaded from the slots: each Var node of such a name
+    becomes a Global node, unless a local binding shadows the global. The
+    nodes that do not change are shared with the original expression, which
+    is left intact for the other tools (type checking, caches, profilers).
+    The visiting methods are generators, run by Traversal.run, so deep trees
+    are compiled without recursion.
+
+    Example:
+    >>> from Runtime import parse_source
+    >>> exp = run(GlobalResolver({'x': 0}, [7]), parse_source('x + (fn x => x) x'), None)
+    >>> exp.left.accept(EvalVisitor(), {}), type(exp.right.function.body).__name__
+    (7, 'Var')
+    """
+    def __init__(self, scope, slots):
+        self.scope = scope
+        self.slots = slots
+        # Number of enclosing local bindings of each name.
+        self.locals = {}
+
+    def enter(self, name):
+        self.locals[name] = self.locals.get(name, 0) + 1
+
+    def exit(self, name):
+        self.locals[name] -= 1
+
+    def visit_var(self, var, env):
+        name = var.identifier
+        if name not in self.scope or self.locals.get(name):
+            return var
+        node = Global(name, self.slots, self.scope[name])
+        node.line, node.column = var.line, var.column
+        return node
+
+    def visit_global(self, var, env):
+        return var
+
+    def leaf(self, exp, env):
+        return exp
+
+    visit_bln = visit_num = visit_nil = leaf
+
+    def rebuild(self, exp, env):
+        """Rebuilds a node whose fields are all sub-expressions."""
+        changed = {}
+        for key, child in vars(exp).items():
+            if isinstance(child, Expression):
+                new = yield child, env
+                if new is not child:
+                    changed[key] = new
+        if not changed:
+            return exp
+        exp = copy.copy(exp)
+        vars(exp).update(changed)
+        return exp
+
+    visit_eql = visit_add = visit_sub = visit_mul = visit_div = rebuild
+    visit_leq = visit_lth = visit_mod = visit_neg = visit_not = rebuild
+    visit_and = visit_or = visit_ifThenElse = visit_app = rebuild
+    visit_cons = visit_append = rebuild
+
+    def with_body(self, exp, body):
+        if body is exp.body:
+            return exp
+        exp = copy.copy(exp)
+        exp.body = body
+        return exp
+
+    def visit_function(self, exp, env):
+        self.enter(exp.formal.identifier)
+        body = yield exp.body, env
+        self.exit(exp.formal.identifier)
+        return self.with_body(exp, body)
+
+    def visit_rec_fun(self, exp, env):
+        self.enter(exp.name.identifier)
+        body = yield from self.visit_function(exp, env)
+        self.exit(exp.name.identifier)
+        return body
+
+    def visit_let(self, let, env):
+        exp_def = yield let.exp_def, env
+        name = identifier_name(let.identifier)
+        self.enter(name)
+        exp_body = yield let.exp_body, env
+        self.exit(name)
+        if exp_def is let.exp_def and exp_body is let.exp_body:
+            return let
+        return self.located(Let(let.identifier, exp_def, exp_body), let)
+
+    def visit_letrec(self, exp, env):
+        for function in exp.functions:
+            self.enter(function.name.identifier)
+        functions = []
+        for function in exp.functions:
+            functions.append((yield function, env))
+        exp_body = yield exp.exp_body, env
+        for function in exp.functions:
+            self.exit(function.name.identifier)
+        if exp_body is exp.exp_body and all(new is old for new, old in zip(functions, exp.functions)):
+            return exp
+        return self.located(LetRec(functions, exp_body), exp)
+
+    @staticmethod
+    def located(node, original):
+        node.line, node.column = original.line, original.column
+        return node
+
+class Module:
+    """
+    A program compiled into a module. The declarations at the top of the
+    program, the chain of Let and LetRec nodes that the parser builds for
+    them, are its globals: each one gets a slot of the array slots, whose
+    names are in names, and the uses of globals are resolved to their slots
+    (see GlobalResolver). A name that is declared again gets a new slot, so
+    the code compiled before keeps seeing the older value. Top-level
+    functions are still RecFunction values, but their calls to themselves,
+    and to the other functions of their group, load them from their slots.
+
+    Example:
+    >>> from Runtime import parse_source
+    >>> module = Module(parse_source('val a = 1 fun f x = x + a fun g y = f (f y) val a = 5; g a'))
+    >>> module.names, module.evaluate({})
+    (['a', 'f', 'g', 'a'], 7)
+    >>> module.slots[2].env
+    {}
+    """
+    def __init__(self, exp):
+        self.names = []
+        self.slots = []
+        # The declarations, in order: each is a list of slots and a list of
+        # their compiled expressions (the functions of a group, or one value).
+        self.code = []
+        scope = {}
+        while True:
+            if type(exp) is Let:
+                name = identifier_name(exp.identifier)
+                definition = exp.exp_def
+                if type(definition) is Fun and definition.name.identifier == name:
+                    # The function is a global within its own body too.
+                    slot = self.allocate(name, scope)
+                    compiled = self.compile_function(definition, scope)
+                else:
+                    compiled = self.compile(definition, scope)
+                    slot = self.allocate(name, scope)
+                self.code.append(([slot], [compiled]))
+            elif type(exp) is LetRec:
+                slots = [self.allocate(function.name.identifier, scope)
+                         for function in exp.functions]
+                self.code.append((slots, [self.compile_function(function, scope)
+                                          for function in exp.functions]))
+            else:
+                break
+            exp = exp.exp_body
+        self.body = self.compile(exp, scope)
+
+    def allocate(self, name, scope):
+        """Gives a new slot to a global, and makes the name refer to it."""
+        scope[name] = len(self.slots)
+        self.names.append(name)
+        self.slots.append(None)
+        return scope[name]
+
+    def compile(self, exp, scope):
+        return run(GlobalResolver(dict(scope), self.slots), exp, None)
+
+    def compile_function(self, function, scope):
+        """Compiles a top-level Fun, whose own name is a global."""
+        resolver = GlobalResolver(dict(scope), self.slots)
+        resolver.enter(function.formal.identifier)
+        return resolver.with_body(function, run(resolver, function.body, None))
+
+    def evaluate(self, env):
+        """
+        Evaluates the declarations in order, storing their values in their
+        slots, and returns the value of the program. The functions of a
+        declaration are closures over env, which is not extended: their
+        slots are enough for them to find each other.
+        """
+        for slots, compiled in self.code:
+            if type(compiled[0]) is Fun:
+                for slot, function in zip(slots, compiled):
+                    self.slots[slot] = RecFunction(function.name, function.formal,
+                                                   function.body, env, function.arity)
+            else:
+                self.slots[slots[0]] = evaluate_expression(compiled[0], env)
+        return evaluate_expression(self.body, env)
@@ -1,7 +1,6 @@
-from sys import warnoptions
+import sys
 from Expression import *
 from Lexer import Token, TokenType
-from typing import Optional
 
 class Parser:
     
@@ -9,6 +8,9 @@ class Parser:
 
         self.tokens = list(tokens)
         self.curr_pointer = 0
+        # Whether the parser is in the body of a function declaration, where
+        # 'and' may start the next function of a group (see starts_clause).
+        self.fun_body = False
 
     def curr_token(self):
         
@@ -19,6 +21,15 @@ class Parser:
     def advance(self):
         self.curr_pointer += 1
 
+    def located(self, node, tok):
+        """
+        Records in the node the line and the column of the token where the
+        node starts in the source, if the lexer provided them.
+        """
+        if tok is not None and tok.line is not None:
+            node.line, node.column = tok.line, tok.column
+        return node
+
     def parse(self):
 
         """
@@ -27,6 +38,7 @@ class Parser:
         Examples:
         >>> parser = Parser([Token('123', TokenType.INT)])
         >>> exp = parser.parse()
+        >>> from Visitor import EvalVisitor
         >>> ev = EvalVisitor()
         >>> exp.accept(ev, None)
         123
@@ -224,26 +236,129 @@ class Parser:
 
         if not self.tokens:
             raise ValueError("Cannot parse empty stream of tokens")
-        expr = self.parse_fn_exp()
+        return self.parse_program()
 
+    def parse_program(self):
+        """
+        Returns the expression of a program: a sequence of top-level 'val'
+        and 'fun' declarations and expressions, optionally separated by ';'.
+        Each declaration scopes over the rest of the program, so the program
+        is read as nested let expressions. As in the toplevel of SML, an
+        expression that is not the last one is bound to the name 'it', and a
+        program that ends with a declaration evaluates to the value that it
+        declares. The evaluator compiles these top-level bindings into a
+        Module (see Module.py).
+
+        Example:
+        >>> from Lexer import Lexer
+        >>> from Traversal import evaluate
+        >>> source = 'fun even n = n = 0 or odd (n - 1) and odd n = not (n = 0) and even (n - 1); odd 7'
+        >>> exp = Parser(Lexer(source).tokens()).parse()
+        >>> type(exp).__name__, evaluate(exp, {})
+        ('LetRec', True)
+        >>> evaluate(Parser(Lexer('1 + 1 val two = it').tokens()).parse(), {})
+        2
+        """
+        items = []
         tok = self.curr_token()
-        if tok is not None:
+        while tok is not None:
+            if tok.kind in (TokenType.VAL, TokenType.FUN):
+                items.append((tok, self.parse_decl()))
+            else:
+                items.append((tok, (None, self.parse_fn_exp())))
+                next_tok = self.curr_token()
+                if next_tok is not None and next_tok.kind not in (TokenType.VAL, TokenType.FUN, TokenType.SMC):
+                    sys.exit("Parse error")
+            tok = self.curr_token()
+            while tok is not None and tok.kind == TokenType.SMC:
+                self.advance()
+                tok = self.curr_token()
+        if not items:
             sys.exit("Parse error")
-        return expr
-    
+        start, (name, node) = items.pop()
+        if name is not None:
+            last = name[-1] if isinstance(name, list) else name
+            node = self.binding((name, node), self.located(Var(last.identifier), last), start)
+        for start, (name, exp) in reversed(items):
+            if name is None:
+                name = self.located(Var("it"), start)
+            node = self.binding((name, exp), node, start)
+        return node
+
+    def parse_declarations(self, until_expression=False):
+        """
+        Returns the list of (name, expression) pairs defined by a stream of
+        top-level 'val' and 'fun' declarations, such as a prelude. Each
+        function of a group 'fun f ... and g ...' gets its own pair, whose
+        expression is the whole group, evaluated to that function. If
+        until_expression is set, the declarations end at the first token that
+        does not start one, instead of failing there.
+
+        Example:
+        >>> from Lexer import Lexer
+        >>> parser = Parser(Lexer('val one = 1 fun succ x = x + one').tokens())
+        >>> [name.identifier for name, exp in parser.parse_declarations()]
+        ['one', 'succ']
+        """
+        decls = []
+        tok = self.curr_token()
+        while tok is not None:
+            if tok.kind == TokenType.SMC:
+                self.advance()
+                tok = self.curr_token()
+                continue
+            if until_expression and tok.kind not in (TokenType.VAL, TokenType.FUN):
+                break
+            decl = self.parse_decl()
+            if decl is None:
+                sys.exit("Parse error")
+            name, exp = decl
+            if isinstance(name, list):
+                for function_name in name:
+                    group = LetRec(exp, self.located(Var(function_name.identifier), function_name))
+                    decls.append((function_name, self.located(group, function_name)))
+            else:
+                decls.append(decl)
+            tok = self.curr_token()
+        return decls
+
+    def parse_input(self):
+        """
+        Returns the pair (declarations, expression) of an input of an
+        interactive session: a sequence of top-level declarations, as in
+        parse_declarations, followed by an optional program, as in
+        parse_program. The expression is None if the input has only
+        declarations.
+
+        Example:
+        >>> from Lexer import Lexer
+        >>> decls, exp = Parser(Lexer('val a = 1; fun f x = x + a; f a').tokens()).parse_input()
+        >>> [name.identifier for name, _ in decls], type(exp).__name__
+        (['a', 'f'], 'App')
+        >>> Parser(Lexer('val a = 1;').tokens()).parse_input()[1] is None
+        True
+        """
+        decls = self.parse_declarations(until_expression=True)
+        exp = None if self.curr_token() is None else self.parse_program()
+        return decls, exp
+
     def parse_fn_exp(self):
         
         tok = self.curr_token()
 
+        if tok is not None and tok.kind == TokenType.FUN:
+            # 'fun f x => e', as an expression, is the recursive function f.
+            self.advance()
+            return self.parse_fun(tok)[1]
+
         if tok is not None and tok.kind == TokenType.FNX:
+           start = tok
            self.advance() 
            tok = self.curr_token()
 
            if tok is not None and tok.kind != TokenType.VAR:
                 sys.exit("Expected VAR token")
-           arg = Var(str(tok.text))
-
-           self.advance()
+           formals = self.parse_formals()
            tok = self.curr_token()
 
            if tok is not None and tok.kind != TokenType.ARW:
@@ -253,7 +368,7 @@ class Parser:
            body = self.parse_fn_exp()
            tok = self.curr_token()
            
-           return Fn(arg, body)
+           return self.located(Fn(formals[0], self.curried(formals, body)), start)
 
         else:
             return self.parse_if_exp()
@@ -264,6 +379,7 @@ class Parser:
         tok = self.curr_token()
 
         if tok is not None and tok.kind == TokenType.IF:
+            start = tok
             self.advance()
             cond = self.parse_if_exp()
             tok = self.curr_token()
@@ -282,7 +398,7 @@ class Parser:
             e1 = self.parse_fn_exp()
             tok = self.curr_token()
 
-            return IfThenElse(cond, e0, e1)
+            return self.located(IfThenElse(cond, e0, e1), start)
         else:
             return self.parse_or_exp()
 
@@ -293,7 +409,7 @@ class Parser:
         tok = self.curr_token()
         while tok is not None and tok.kind == TokenType.OR:
             self.advance()
-            node = Or(node, self.parse_and_exp()) 
+            node = self.located(Or(node, self.parse_and_exp()), tok)
             tok = self.curr_token()
         return node
 
@@ -304,9 +420,9 @@ class Parser:
         tok = self.curr_token()
         node = self.parse_eq_exp()
         tok = self.curr_token()
-        while tok is not None and tok.kind == TokenType.AND:
+        while tok is not None and tok.kind == TokenType.AND and not self.starts_clause():
             self.advance()
-            node = And(node, self.parse_eq_exp()) 
+            node = self.located(And(node, self.parse_eq_exp()), tok)
             tok = self.curr_token()
         return node
 
@@ -319,7 +435,7 @@ class Parser:
         tok = self.curr_token()
         while tok is not None and tok.kind == TokenType.EQL:
             self.advance()
-            node = Eql(node, self.parse_cmp_exp())
+            node = self.located(Eql(node, self.parse_cmp_exp()), tok)
             tok = self.curr_token()
         return node
 
@@ -328,20 +444,55 @@ class Parser:
     def parse_cmp_exp(self):
 
         tok = self.curr_token()
-        node = self.parse_add_exp()
+        node = self.parse_cons_exp()
         tok = self.curr_token()
-        while tok is not None and tok.kind in (TokenType.LTH, TokenType.LEQ):
+        while tok is not None and tok.kind in (TokenType.LTH, TokenType.LEQ, TokenType.GTH, TokenType.GEQ):
             if tok.kind == TokenType.LTH:
 
                 self.advance()
-                node = Lth(node, self.parse_add_exp())
+                node = self.located(Lth(node, self.parse_cons_exp()), tok)
 
             elif tok.kind == TokenType.LEQ:
 
                 self.advance()
-                node = Leq(node, self.parse_add_exp())
+                node = self.located(Leq(node, self.parse_cons_exp()), tok)
+
+            else:
+                # 'a > b' is read as 'b < a', and 'a >= b' as 'b <= a': the
+                # right operand is evaluated first.
+                self.advance()
+                operator = Lth if tok.kind == TokenType.GTH else Leq
+                node = self.located(operator(self.parse_cons_exp(), node), tok)
+
+            tok = self.curr_token()
+        return node
 
+    def parse_cons_exp(self):
+        """
+        Parses the list operators '::' and '@', which are right-associative
+        and bind less tightly than '+' and '-'. The operands are collected in
+        a loop and combined from the right, so long chains do not recurse.
+
+        Example:
+        >>> from Lexer import Lexer
+        >>> from Visitor import EvalVisitor
+        >>> exp = Parser(Lexer('1 :: [2] @ 3 + 4 :: []').tokens()).parse()
+        >>> type(exp).__name__, exp.accept(EvalVisitor(), {})
+        ('Cons', [1, 2, 7])
+        """
+        operands = [self.parse_add_exp()]
+        operators = []
+        tok = self.curr_token()
+        while tok is not None and tok.kind in (TokenType.CNS, TokenType.CAT):
+            self.advance()
+            operators.append(tok)
+            operands.append(self.parse_add_exp())
             tok = self.curr_token()
+        node = operands.pop()
+        while operators:
+            tok = operators.pop()
+            operator = Cons if tok.kind == TokenType.CNS else Append
+            node = self.located(operator(operands.pop(), node), tok)
         return node
 
 
@@ -355,12 +506,12 @@ class Parser:
             if tok.kind == TokenType.ADD:
 
                 self.advance()
-                node = Add(node, self.parse_mul_exp())
+                node = self.located(Add(node, self.parse_mul_exp()), tok)
 
             elif tok.kind == TokenType.SUB:
 
                 self.advance()
-                node = Sub(node, self.parse_mul_exp())
+                node = self.located(Sub(node, self.parse_mul_exp()), tok)
 
             tok = self.curr_token()
         return node
@@ -377,17 +528,17 @@ class Parser:
             if tok.kind == TokenType.MUL:
 
                 self.advance()
-                node = Mul(node, self.parse_unary_exp())
+                node = self.located(Mul(node, self.parse_unary_exp()), tok)
 
             elif tok.kind == TokenType.DIV:
 
                 self.advance()
-                node = Div(node, self.parse_unary_exp())
+                node = self.located(Div(node, self.parse_unary_exp()), tok)
 
             elif tok.kind == TokenType.MOD:
 
                 self.advance()
-                node = Mod(node, self.parse_unary_exp())
+                node = self.located(Mod(node, self.parse_unary_exp()), tok)
 
             tok = self.curr_token()
         return node
@@ -401,14 +552,12 @@ class Parser:
             if tok.kind == TokenType.NEG:
 
                 self.advance()
-                tok = self.curr_token()
-                return Neg(self.parse_unary_exp())
+                return self.located(Neg(self.parse_unary_exp()), tok)
 
             elif tok.kind == TokenType.NOT:
 
                 self.advance()
-                tok = self.curr_token()
-                return Not(self.parse_unary_exp())
+                return self.located(Not(self.parse_unary_exp()), tok)
         else:
             return self.parse_let_exp()
 
@@ -418,35 +567,38 @@ class Parser:
         tok = self.curr_token() 
         if tok is not None and tok.kind == TokenType.LET:
             
+            start = tok
             self.advance()
+            decls = []
             tok = self.curr_token()
-            identifier, exp_def = self.parse_decl() 
-            tok = self.curr_token()
-            if tok is not None and tok.kind != TokenType.IN:
-                sys.exit("Parse error")
-
-            else:
-                self.advance()
+            while tok is not None and tok.kind != TokenType.IN:
+                decl = self.parse_decl()
+                if decl is None:
+                    sys.exit("Parse error")
+                decls.append((start if not decls else tok, decl))
                 tok = self.curr_token()
+            if tok is None or not decls:
+                sys.exit("Parse error")
+            self.advance()
             exp_body = self.parse_fn_exp()
             tok = self.curr_token()
-            if tok is not None and tok.kind != TokenType.END:
+            if tok is None or tok.kind != TokenType.END:
                 sys.exit("Parse error")
-
-            else:
-                self.advance()
-            return Let(identifier, exp_def, exp_body)
+            self.advance()
+            for decl_start, decl in reversed(decls):
+                exp_body = self.binding(decl, exp_body, decl_start)
+            return exp_body
 
         else:
             return self.parse_val_exp()
     
     def parse_val_exp(self):
 
-        tok = self.curr_token()
+        start = self.curr_token()
         node = self.parse_val_tk() 
         tok = self.curr_token()
-        while tok is not None and tok.kind in (TokenType.VAR, TokenType.LPR, TokenType.INT, TokenType.OCT, TokenType.BIN, TokenType.HEX, TokenType.FLS, TokenType.TRU):
-            node = App(node, self.parse_val_tk())
+        while tok is not None and tok.kind in (TokenType.VAR, TokenType.LPR, TokenType.LBK, TokenType.INT, TokenType.OCT, TokenType.BIN, TokenType.HEX, TokenType.FLS, TokenType.TRU):
+            node = self.located(App(node, self.parse_val_tk()), start)
             tok = self.curr_token()
         return node
 
@@ -455,33 +607,110 @@ class Parser:
         tok = self.curr_token()
         if tok is not None and tok.kind in (TokenType.HEX, TokenType.BIN, TokenType.INT, TokenType.OCT):
             self.advance()
-            return Num(int(tok.text, 0))
+            return self.located(Num(int(tok.text, 0)), tok)
 
         elif tok is not None and tok.kind in (TokenType.FLS, TokenType.TRU):
             self.advance()
-            return Bln(tok.kind == TokenType.TRU) 
+            return self.located(Bln(tok.kind == TokenType.TRU), tok)
 
         elif tok is not None and tok.kind == TokenType.LPR:
             self.advance()
+            fun_body, self.fun_body = self.fun_body, False
             exp = self.parse_fn_exp()
+            self.fun_body = fun_body
             tok = self.curr_token()
             if tok is not None and tok.kind != TokenType.RPR:
                 sys.exit("Parse error")
             self.advance()
             return exp
+        elif tok is not None and tok.kind == TokenType.LBK:
+            return self.parse_list_exp()
         elif tok is not None and tok.kind == TokenType.VAR:
             self.advance()
-            return Var(tok.text) 
+            return self.located(Var(tok.text), tok)
+
+    def parse_list_exp(self):
+        """
+        Parses a list literal, [e0, ..., en], as e0 :: ... :: en :: [].
+
+        Example:
+        >>> from Lexer import Lexer
+        >>> from Visitor import EvalVisitor
+        >>> Parser(Lexer('[1, 1 + 1, 3]').tokens()).parse().accept(EvalVisitor(), {})
+        [1, 2, 3]
+        """
+        start = self.curr_token()
+        self.advance()
+        elements = []
+        fun_body, self.fun_body = self.fun_body, False
+        tok = self.curr_token()
+        if tok is not None and tok.kind != TokenType.RBK:
+            elements.append(self.parse_fn_exp())
+            tok = self.curr_token()
+            while tok is not None and tok.kind == TokenType.CMA:
+                self.advance()
+                elements.append(self.parse_fn_exp())
+                tok = self.curr_token()
+        self.fun_body = fun_body
+        if tok is None or tok.kind != TokenType.RBK:
+            sys.exit("Parse error")
+        node = self.located(Nil(), tok)
+        self.advance()
+        for element in reversed(elements):
+            node = self.located(Cons(element, node), start)
+        return node
+
+    def parse_formals(self):
+        """
+        Parses the parameters of a function, one or more VAR tokens, and
+        returns them as Var nodes.
+        """
+        formals = []
+        tok = self.curr_token()
+        while tok is not None and tok.kind == TokenType.VAR:
+            formals.append(self.located(Var(str(tok.text)), tok))
+            self.advance()
+            tok = self.curr_token()
+        return formals
+
+    def curried(self, formals, body):
+        """
+        Returns the body of a function of the parameters formals, curried:
+        body wrapped in a function of each parameter but the first, from the
+        last to the second. The caller builds the Fn, or the Fun, of the
+        first parameter.
+
+        Example:
+        >>> from Lexer import Lexer
+        >>> exp = Parser(Lexer('fn a b c => a').tokens()).parse()
+        >>> exp.formal.identifier, exp.body.formal.identifier, exp.arity
+        ('a', 'b', 3)
+        """
+        for formal in reversed(formals[1:]):
+            body = self.located(Fn(formal, body), formal)
+        return body
 
     def parse_decl(self):
-       
+        """
+        Parses a declaration, and returns the pair (name, expression) that it
+        defines: 'val x = e', 'fun f x1 ... xn = e' or, in let expressions,
+        'x <- e'. A group of mutually recursive functions, 'fun f ... and g
+        ...', gives the pair of the list of their names and the list of their
+        Fun nodes. Returns None if no declaration starts at the current token.
+
+        Example:
+        >>> from Lexer import Lexer
+        >>> names, functions = Parser(Lexer('fun f x = g x and g y = y').tokens()).parse_decl()
+        >>> [name.identifier for name in names], [type(f).__name__ for f in functions]
+        (['f', 'g'], ['Fun', 'Fun'])
+        """
         tok = self.curr_token()
         if tok is not None and tok.kind == TokenType.VAL:
             self.advance()
             tok = self.curr_token()
             if tok is not None and tok.kind != TokenType.VAR:
                 sys.exit("Expected VAR token")
-            var = Var(str(tok.text))
+            var = self.located(Var(str(tok.text)), tok)
             self.advance()
             tok = self.curr_token()
             if tok is not None and tok.kind != TokenType.EQL:
@@ -492,21 +721,74 @@ class Parser:
 
         elif tok is not None and tok.kind == TokenType.FUN:
             self.advance()
+            name, function = self.parse_fun(tok)
+            functions = [function]
             tok = self.curr_token()
-            if tok is not None and tok.kind != TokenType.VAR:
-                sys.exit("Expected VAR token(name of rec function)")
-            name = Var(str(tok.text))
-            self.advance()
-            tok = self.curr_token()
-            if tok is not None and tok.kind != TokenType.VAR:
-                sys.exit("Expected VAR token(parameter of rec function)")
-            formal = Var(str(tok.text))
+            while tok is not None and tok.kind == TokenType.AND:
+                self.advance()
+                functions.append(self.parse_fun(tok)[1])
+                tok = self.curr_token()
+            if len(functions) == 1:
+                return (name, function)
+            return ([function.name for function in functions], functions)
+
+        elif tok is not None and tok.kind == TokenType.VAR:
+            var = self.located(Var(str(tok.text)), tok)
             self.advance()
             tok = self.curr_token()
-            if tok is not None and tok.kind != TokenType.EQL:
-                sys.exit("Expected EQL token in recursive function declaration")
+            if tok is None or tok.kind != TokenType.BACKARROW:
+                sys.exit("Parse error")
             self.advance()
-            tok = self.curr_token()
-            body = self.parse_fn_exp()
-            return (name, Fun(name, formal, body))
+            return (var, self.parse_fn_exp())
 
+    def parse_fun(self, start):
+        """
+        Parses a function of a 'fun' declaration, 'f x1 ... xn = e', which
+        follows the 'fun' or the 'and' token start. Returns its name and its
+        Fun node.
+        """
+        tok = self.curr_token()
+        if tok is not None and tok.kind != TokenType.VAR:
+            sys.exit("Expected VAR token(name of rec function)")
+        name = self.located(Var(str(tok.text)), tok)
+        self.advance()
+        tok = self.curr_token()
+        if tok is not None and tok.kind != TokenType.VAR:
+            sys.exit("Expected VAR token(parameter of rec function)")
+        formals = self.parse_formals()
+        tok = self.curr_token()
+        # 'fun f x = e' is the syntax of SML; 'fun f x => e' is accepted too.
+        if tok is not None and tok.kind not in (TokenType.EQL, TokenType.ARW):
+            sys.exit("Expected EQL token in recursive function declaration")
+        self.advance()
+        fun_body, self.fun_body = self.fun_body, True
+        body = self.curried(formals, self.parse_fn_exp())
+        self.fun_body = fun_body
+        return (name, self.located(Fun(name, formals[0], body), start))
+
+    def starts_clause(self):
+        """
+        Tells whether the 'and' at the current token starts the next function
+        of a group, 'and g y1 ... yn =', instead of a conjunction. This is
+        only the case in the body of a function declaration, outside of
+        parentheses and brackets; a conjunction of that shape, there, must
+        be written within parentheses.
+        """
+        if not self.fun_body:
+            return False
+        index = self.curr_pointer + 1
+        while index < len(self.tokens) and self.tokens[index].kind == TokenType.VAR:
+            index += 1
+        return (index - self.curr_pointer > 2 and index < len(self.tokens)
+                and self.tokens[index].kind in (TokenType.EQL, TokenType.ARW))
+
+    def binding(self, decl, body, start):
+        """
+        Returns the expression where the declaration decl, as returned by
+        parse_decl, scopes over body: a Let or, for a group of functions, a
+        LetRec.
+        """
+        name, exp = decl
+        if isinstance(name, list):
+            return self.located(LetRec(exp, body), start)
+        return self.located(Let(name, exp, body), start)
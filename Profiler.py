@@ -0,0 +1,568 @@
+"""
+Profilers for the evaluation of SML programs. They are subclasses of the
+iterative evaluator of Traversal.py, so the plain EvalVisitor stays
+untouched, programs that are not profiled pay nothing for the
+instrumentation, and programs of any depth can be profiled.
+"""
+import sys
+import weakref
+import tracemalloc
+from time import perf_counter
+from Expression import *
+from Visitor import *
+from Traversal import CO_GENERATOR, IterativeEvalVisitor, run
+
+def _profiled(method):
+    """
+    Wraps a visiting method of IterativeEvalVisitor, so that it updates the
+    counters of the node that it visits, and of the source line of that
+    node. The wrapper of a generator is a generator too.
+    """
+    if method.__code__.co_flags & CO_GENERATOR:
+        def visit(self, node, env):
+            start = self.start_visit(node)
+            result = yield from method(self, node, env)
+            self.end_visit(node, start)
+            return result
+    else:
+        def visit(self, node, env):
+            start = self.start_visit(node)
+            try:
+                return method(self, node, env)
+            finally:
+                self.end_visit(node, start)
+    visit.__name__ = method.__name__
+    visit.__doc__ = method.__doc__
+    return visit
+
+class NodeProfiler(CurriedCalls, IterativeEvalVisitor):
+    """
+    This visitor evaluates expressions like EvalVisitor, and also counts how
+    many times each node of the AST was visited, and how much time was spent
+    on it. Inclusive time contains the time spent on the sub-expressions of
+    the node; exclusive time does not. The counters are aggregated per source
+    line as well, using the positions that the parser records on the nodes.
+
+    Example:
+    >>> from Runtime import parse_source
+    >>> exp = parse_source('let fun sum k = if k = 0 then 0\\nelse k + sum (k - 1)\\nin sum 3 end')
+    >>> profiler = NodeProfiler()
+    >>> profiler.evaluate(exp, {})
+    6
+    >>> sorted((r['line'], r['count']) for r in profiler.line_report())
+    [(1, 19), (2, 21), (3, 3)]
+    >>> [(r['line'], r['count']) for r in profiler.node_report('count')
+    ...  if r['node'] == 'App']
+    [(2, 3), (3, 1)]
+    """
+    def __init__(self):
+        self.nodes = {}
+        self.lines = {}
+        self.active_nodes = {}
+        self.active_lines = {}
+        self.children = [0.0]
+
+    def evaluate(self, exp, env):
+        return run(self, exp, env)
+
+    def start_visit(self, node):
+        line = node.line
+        self.active_nodes[node] = self.active_nodes.get(node, 0) + 1
+        self.active_lines[line] = self.active_lines.get(line, 0) + 1
+        self.children.append(0.0)
+        return perf_counter()
+
+    def end_visit(self, node, start):
+        """
+        Updates the counters of the node, and of its line. Inclusive time is
+        only accounted for the outermost activation of a node (or line), so
+        that recursion does not count the same time twice.
+        """
+        line = node.line
+        active_nodes, active_lines = self.active_nodes, self.active_lines
+        elapsed = perf_counter() - start
+        exclusive = elapsed - self.children.pop()
+        self.children[-1] += elapsed
+        active_nodes[node] -= 1
+        active_lines[line] -= 1
+        record = self.nodes.get(node)
+        if record is None:
+            record = self.nodes[node] = [0, 0.0, 0.0]
+        record[0] += 1
+        record[2] += exclusive
+        if not active_nodes[node]:
+            record[1] += elapsed
+        record = self.lines.get(line)
+        if record is None:
+            record = self.lines[line] = [0, 0.0, 0.0]
+        record[0] += 1
+        record[2] += exclusive
+        if not active_lines[line]:
+            record[1] += elapsed
+
+    @staticmethod
+    def _sorted(entries, sort):
+        return sorted(entries, key=lambda e: (-e[sort], e['line'] or 0,
+                                              e.get('column') or 0))
+
+    def node_report(self, sort='exclusive'):
+        """
+        Returns one entry per visited node, sorted by 'exclusive', 'inclusive'
+        or 'count'.
+        """
+        return self._sorted([
+            {"node": type(node).__name__, "line": node.line,
+             "column": node.column, "count": count,
+             "inclusive": inclusive, "exclusive": exclusive}
+            for node, (count, inclusive, exclusive) in self.nodes.items()
+        ], sort)
+
+    def line_report(self, sort='exclusive'):
+        """
+        Returns one entry per source line, sorted by 'exclusive', 'inclusive'
+        or 'count'.
+        """
+        return self._sorted([
+            {"line": line, "count": count,
+             "inclusive": inclusive, "exclusive": exclusive}
+            for line, (count, inclusive, exclusive) in self.lines.items()
+        ], sort)
+
+    def to_json(self, sort='exclusive'):
+        return {"lines": self.line_report(sort), "nodes": self.node_report(sort)}
+
+    def format_report(self, source=None, sort='exclusive', limit=20):
+        """
+        Formats the per-line report as a table. If the source code is given,
+        each line of the table shows the corresponding line of the program.
+        """
+        source_lines = source.splitlines() if source else []
+        out = [f"{'linha':>6s} {'visitas':>10s} {'inclusivo (ms)':>15s} "
+               f"{'exclusivo (ms)':>15s}  código"]
+        for entry in self.line_report(sort)[:limit]:
+            line = entry["line"]
+            text = ""
+            if line is not None and 0 < line <= len(source_lines):
+                text = source_lines[line - 1].strip()
+            out.append(f"{str(line):>6s} {entry['count']:10d} "
+                       f"{entry['inclusive'] * 1000:15.3f} "
+                       f"{entry['exclusive'] * 1000:15.3f}  {text}")
+        return "\n".join(out)
+
+for _name in [name for name in vars(Visitor) if name.startswith("visit_")]:
+    setattr(NodeProfiler, _name, _profiled(getattr(IterativeEvalVisitor, _name)))
+
+def function_name(function_value, names=None):
+    """
+    Returns the name used by the call profiler for a function value: the
+    name of recursive functions, or the parameter and the line of anonymous
+    functions. The dictionary names maps parameters to the name of the
+    binding that defines their function, so that the inner functions of a
+    curried definition are named after it.
+
+    Example:
+    >>> function_name(RecFunction(Var('fact'), Var('n'), Num(1), {}))
+    'fact'
+    >>> function_name(Function(Var('x'), Num(1), {}))
+    'fn(x)'
+    >>> y = Var('y')
+    >>> function_name(Function(y, Num(1), {}), {y: 'add'})
+    'add'
+    """
+    if isinstance(function_value, RecFunction):
+        return function_value.name.identifier
+    if isinstance(function_value, Primitive):
+        return function_value.name
+    formal = function_value.formal
+    if names and formal in names:
+        return names[formal]
+    if formal.line is None:
+        return f"fn({formal.identifier})"
+    return f"fn({formal.identifier})@{formal.line}"
+
+class _CallNode:
+    """A node of the calling context tree: one path of nested calls."""
+    __slots__ = ("name", "children", "calls", "self_time")
+
+    def __init__(self, name):
+        self.name = name
+        self.children = {}
+        self.calls = 0
+        self.self_time = 0.0
+
+class CallProfiler(CurriedCalls, IterativeEvalVisitor):
+    """
+    This visitor evaluates expressions like EvalVisitor, and profiles the
+    application of function values: how many times each function is called,
+    the maximum recursion depth that it reaches, the distribution of its
+    arguments, and the time spent in it, with (total) and without (self) the
+    time spent in the functions that it calls. It also builds the calling
+    context tree, which can be written in the collapsed-stack format read by
+    flamegraph tools.
+
+    Example:
+    >>> from Runtime import parse_source
+    >>> exp = parse_source('let fun fib n = if n < 2 then n else fib (n - 1) + fib (n - 2) in fib 5 end')
+    >>> profiler = CallProfiler()
+    >>> profiler.evaluate(exp, {})
+    5
+    >>> [(r['function'], r['calls'], r['max_depth']) for r in profiler.report()]
+    [('fib', 15, 5)]
+    >>> profiler.report()[0]['arguments'][:3]
+    [('1', 5), ('0', 3), ('2', 3)]
+    >>> [line.rsplit(' ', 1)[0] for line in profiler.collapsed_stacks()][:3]
+    ['programa', 'programa;fib', 'programa;fib;fib']
+
+    A curried function is named after its binding, and each of its
+    parameters is applied in a call of its own:
+    >>> exp = parse_source('fun add x y = x + y; val sub = fn x => fn y => x - y; sub (add 1 2) 3')
+    >>> profiler = CallProfiler()
+    >>> profiler.evaluate(exp, {})
+    0
+    >>> [(r['function'], r['calls']) for r in profiler.report('calls')]
+    [('add', 2), ('sub', 2)]
+    """
+    def __init__(self, max_distinct_arguments=1000):
+        self.max_distinct_arguments = max_distinct_arguments
+        self.functions = {}
+        self.active = {}
+        self.root = _CallNode("programa")
+        self.current = self.root
+        self.children = [0.0]
+        # Name of the binding of each function of a curried definition,
+        # indexed by its parameter.
+        self.names = {}
+
+    def evaluate(self, exp, env):
+        """
+        Evaluates the expression, charging the time spent outside of any
+        function to the root of the calling context tree.
+        """
+        start = perf_counter()
+        try:
+            return run(self, exp, env)
+        finally:
+            elapsed = perf_counter() - start
+            self.root.calls += 1
+            self.root.self_time += elapsed - self.children[0]
+            self.children[0] = 0.0
+
+    def name_functions(self, name, function):
+        """
+        Names the function of a binding, and the functions of its body that
+        take the remaining parameters, after the binding.
+        """
+        names = self.names
+        names[function.formal] = name
+        function = function.body
+        while type(function) is Fn:
+            names[function.formal] = name
+            function = function.body
+
+    def visit_let(self, let, env):
+        if isinstance(let.exp_def, Fn):
+            self.name_functions(let.identifier.identifier, let.exp_def)
+        return (yield from IterativeEvalVisitor.visit_let(self, let, env))
+
+    def visit_rec_fun(self, exp, env):
+        self.name_functions(exp.name.identifier, exp)
+        return IterativeEvalVisitor.visit_rec_fun(self, exp, env)
+
+    def visit_letrec(self, exp, env):
+        for function in exp.functions:
+            self.name_functions(function.name.identifier, function)
+        return (yield from IterativeEvalVisitor.visit_letrec(self, exp, env))
+
+    def invoke(self, function_value, values):
+        call = self.start_call(function_value, values[0])
+        result = yield from IterativeEvalVisitor.invoke(self, function_value, values)
+        self.end_call(call)
+        return result
+
+    def apply(self, function_value, parameter_value):
+        call = self.start_call(function_value, parameter_value)
+        try:
+            return IterativeEvalVisitor.apply(self, function_value, parameter_value)
+        finally:
+            self.end_call(call)
+
+    def start_call(self, function_value, parameter_value):
+        """
+        Counts a call of the function value, and enters its node of the
+        calling context tree. Returns the state that end_call needs.
+        """
+        name = function_name(function_value, self.names)
+        stats = self.functions.get(name)
+        if stats is None:
+            stats = self.functions[name] = [0, 0, 0.0, 0.0, {}]
+        depth = self.active.get(name, 0) + 1
+        self.active[name] = depth
+        stats[0] += 1
+        if depth > stats[1]:
+            stats[1] = depth
+        arguments = stats[4]
+        argument = str(parameter_value)
+        if argument in arguments or len(arguments) < self.max_distinct_arguments:
+            arguments[argument] = arguments.get(argument, 0) + 1
+        else:
+            arguments["<outros>"] = arguments.get("<outros>", 0) + 1
+
+        parent = self.current
+        node = parent.children.get(name)
+        if node is None:
+            node = parent.children[name] = _CallNode(name)
+        self.current = node
+        self.children.append(0.0)
+        return name, depth, stats, parent, node, perf_counter()
+
+    def end_call(self, call):
+        """Accounts the time of a call, and returns to the caller's node."""
+        name, depth, stats, parent, node, start = call
+        elapsed = perf_counter() - start
+        self_time = elapsed - self.children.pop()
+        self.children[-1] += elapsed
+        self.current = parent
+        self.active[name] = depth - 1
+        if depth == 1:
+            stats[2] += elapsed
+        stats[3] += self_time
+        node.calls += 1
+        node.self_time += self_time
+
+    def report(self, sort='total'):
+        """
+        Returns one entry per function, sorted by 'total', 'self' or 'calls'.
+        The arguments of each function are listed from the most frequent.
+        """
+        entries = [
+            {"function": name, "calls": calls, "max_depth": max_depth,
+             "total": total, "self": self_time,
+             "arguments": sorted(arguments.items(), key=lambda a: (-a[1], a[0]))}
+            for name, (calls, max_depth, total, self_time, arguments)
+            in self.functions.items()
+        ]
+        return sorted(entries, key=lambda e: (-e[sort], e["function"]))
+
+    def to_json(self, sort='total'):
+        return {"functions": self.report(sort)}
+
+    def collapsed_stacks(self):
+        """
+        Returns the calling context tree in the collapsed-stack format: one
+        line per path of calls, with the frames separated by ';', followed by
+        the self time of that path in microseconds.
+        """
+        lines = []
+        stack = [(self.root, self.root.name)]
+        while stack:
+            node, path = stack.pop()
+            micros = round(node.self_time * 1000000)
+            if node.calls:
+                lines.append(f"{path} {micros}")
+            for name in sorted(node.children, reverse=True):
+                stack.append((node.children[name], f"{path};{name}"))
+        return lines
+
+    def format_report(self, sort='total', limit=20, arguments=3):
+        out = [f"{'função':20s} {'chamadas':>10s} {'prof. máx':>10s} "
+               f"{'total (ms)':>12s} {'self (ms)':>12s}  argumentos mais comuns"]
+        for entry in self.report(sort)[:limit]:
+            common = ", ".join(f"{a} ({n}x)" for a, n in entry["arguments"][:arguments])
+            out.append(f"{entry['function']:20s} {entry['calls']:10d} "
+                       f"{entry['max_depth']:10d} {entry['total'] * 1000:12.3f} "
+                       f"{entry['self'] * 1000:12.3f}  {common}")
+        return "\n".join(out)
+
+class MemoryProfiler(CurriedCalls, IterativeEvalVisitor):
+    """
+    This visitor evaluates expressions like EvalVisitor, and accounts for the
+    memory of environments and closures. Every environment copy (made by a
+    let, or by a function call) and every closure is attributed to the source
+    line of its binding site: the let, or the definition of the function.
+    Closures are also tracked with weak references, so that the profiler can
+    tell, at any time, how many of them are alive and how much memory their
+    captured environments retain, grouped by binding site. Snapshots of that
+    state are taken whenever the evaluation reaches a let or an application
+    on one of the lines listed in snapshot_lines (up to max_snapshots), or
+    whenever snapshot() is called.
+
+    Example:
+    >>> from Runtime import parse_source
+    >>> exp = parse_source('let val a = 1 in\\nlet val f = fn x => x + a in\\nf (f 1) end end')
+    >>> profiler = MemoryProfiler(snapshot_lines=[3])
+    >>> profiler.evaluate(exp, {})
+    3
+    >>> [(r['line'], r['kind'], r['count']) for r in profiler.allocation_report()]
+    [(1, 'let', 1), (2, 'call', 2), (2, 'closure', 1), (2, 'let', 1)]
+    >>> [(s['label'], s['live_closures']) for s in profiler.snapshots]
+    [('linha 3', 1), ('linha 3', 1)]
+    >>> [(r['line'], r['closures']) for r in profiler.snapshots[0]['sites']]
+    [(2, 1)]
+
+    The closures of a group of mutually recursive functions are counted too:
+    >>> exp = parse_source('let fun even n = n = 0 or odd (n - 1)\\nand odd n = not (n = 0) and even (n - 1)\\nin even 2 end')
+    >>> profiler = MemoryProfiler()
+    >>> profiler.evaluate(exp, {})
+    True
+    >>> [(r['line'], r['kind'], r['count']) for r in profiler.allocation_report()]
+    [(1, 'call', 2), (1, 'closure', 1), (2, 'call', 1), (2, 'closure', 1)]
+    """
+    def __init__(self, snapshot_lines=(), max_snapshots=100):
+        self.snapshot_lines = set(snapshot_lines)
+        self.max_snapshots = max_snapshots
+        self.allocations = {}
+        self.closures = weakref.WeakKeyDictionary()
+        self.snapshots = []
+
+    def record(self, line, kind, size):
+        record = self.allocations.get((line, kind))
+        if record is None:
+            record = self.allocations[(line, kind)] = [0, 0]
+        record[0] += 1
+        record[1] += size
+
+    def evaluate(self, exp, env):
+        """Evaluates the expression, tracing Python allocations as well."""
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        try:
+            return run(self, exp, env)
+        finally:
+            if not tracing:
+                tracemalloc.stop()
+
+    def visit_let(self, let, env):
+        if let.line in self.snapshot_lines:
+            self.snapshot(f"linha {let.line}")
+        definition_value = yield let.exp_def, env
+        new_env = env.copy()
+        new_env[let.identifier.identifier] = definition_value
+        self.record(let.line, "let", sys.getsizeof(new_env))
+        return (yield let.exp_body, new_env)
+
+    def visit_app(self, exp, env):
+        if exp.line in self.snapshot_lines:
+            self.snapshot(f"linha {exp.line}")
+        return (yield from IterativeEvalVisitor.visit_app(self, exp, env))
+
+    def visit_function(self, exp, env):
+        closure = IterativeEvalVisitor.visit_function(self, exp, env)
+        self.closures[closure] = exp.line
+        self.record(exp.line, "closure", sys.getsizeof(closure) + sys.getsizeof(closure.__dict__))
+        return closure
+
+    def visit_rec_fun(self, exp, env):
+        closure = IterativeEvalVisitor.visit_rec_fun(self, exp, env)
+        self.closures[closure] = exp.line
+        self.record(exp.line, "closure", sys.getsizeof(closure) + sys.getsizeof(closure.__dict__))
+        return closure
+
+    def visit_letrec(self, exp, env):
+        new_env = self.bind_group(env, exp.functions)
+        for function in exp.functions:
+            closure = new_env[function.name.identifier]
+            self.closures[closure] = function.line
+            self.record(function.line, "closure", sys.getsizeof(closure) + sys.getsizeof(closure.__dict__))
+        return (yield exp.exp_body, new_env)
+
+    def invoke(self, function_value, values):
+        # The call copies the captured environment of the function, which has
+        # the size of that environment, plus one or two bindings.
+        self.record(self.closures.get(function_value), "call",
+                    sys.getsizeof(function_value.env))
+        return (yield from IterativeEvalVisitor.invoke(self, function_value, values))
+
+    def apply(self, function_value, parameter_value):
+        self.record(self.closures.get(function_value), "call",
+                    sys.getsizeof(function_value.env))
+        return IterativeEvalVisitor.apply(self, function_value, parameter_value)
+
+    @staticmethod
+    def retained_size(closure, seen):
+        """
+        Returns the size of the environments reachable from a closure: its
+        own environment, and the environments of the closures stored in it,
+        transitively. Environments already in seen are not counted again.
+        """
+        size = 0
+        stack = [closure]
+        while stack:
+            env = stack.pop().env
+            if id(env) in seen:
+                continue
+            seen.add(id(env))
+            size += sys.getsizeof(env)
+            stack.extend(v for v in env.values() if isinstance(v, Function))
+        return size
+
+    def live_report(self):
+        """
+        Returns one entry per binding site with live closures: the number of
+        closures alive, and the memory retained by their environments.
+        """
+        sites = {}
+        for closure, line in list(self.closures.items()):
+            site = sites.get(line)
+            if site is None:
+                site = sites[line] = {"line": line, "closures": 0,
+                                      "retained": 0, "seen": set()}
+            site["closures"] += 1
+            site["retained"] += self.retained_size(closure, site["seen"])
+        for site in sites.values():
+            del site["seen"]
+        return sorted(sites.values(), key=lambda s: (-s["retained"], s["line"] or 0))
+
+    def snapshot(self, label):
+        """Records the live closures and the Python heap at this point."""
+        if len(self.snapshots) >= self.max_snapshots:
+            return None
+        sites = self.live_report()
+        snapshot = {"label": label,
+                    "live_closures": sum(s["closures"] for s in sites),
+                    "retained": sum(s["retained"] for s in sites),
+                    "sites": sites}
+        if tracemalloc.is_tracing():
+            snapshot["heap"], snapshot["heap_peak"] = tracemalloc.get_traced_memory()
+        self.snapshots.append(snapshot)
+        return snapshot
+
+    def allocation_report(self, sort='line'):
+        """
+        Returns one entry per binding site and kind of allocation ('let',
+        'call' or 'closure'), sorted by 'line' or by 'bytes'.
+        """
+        entries = [{"line": line, "kind": kind, "count": count, "bytes": size}
+                   for (line, kind), (count, size) in self.allocations.items()]
+        if sort == 'bytes':
+            return sorted(entries, key=lambda e: (-e["bytes"], e["line"] or 0, e["kind"]))
+        return sorted(entries, key=lambda e: (e["line"] or 0, e["kind"]))
+
+    def to_json(self):
+        return {"allocations": self.allocation_report('bytes'),
+                "live": self.live_report(), "snapshots": self.snapshots}
+
+    def format_report(self, source=None, limit=20):
+        source_lines = source.splitlines() if source else []
+        def text(line):
+            if line is not None and 0 < line <= len(source_lines):
+                return source_lines[line - 1].strip()
+            return ""
+        out = [f"{'linha':>6s} {'tipo':8s} {'alocações':>10s} {'bytes':>12s}  código"]
+        for e in self.allocation_report('bytes')[:limit]:
+            out.append(f"{str(e['line']):>6s} {e['kind']:8s} {e['count']:10d} "
+                       f"{e['bytes']:12d}  {text(e['line'])}")
+        out.append("")
+        out.append(f"{'linha':>6s} {'closures vivas':>15s} {'retido (bytes)':>15s}  código")
+        for s in self.live_report()[:limit]:
+            out.append(f"{str(s['line']):>6s} {s['closures']:15d} {s['retained']:15d}  "
+                       f"{text(s['line'])}")
+        for snapshot in self.snapshots:
+            out.append("")
+            out.append(f"snapshot '{snapshot['label']}': {snapshot['live_closures']} "
+                       f"closures vivas, {snapshot['retained']} bytes retidos"
+                       + (f", heap Python {snapshot['heap']} bytes" if "heap" in snapshot else ""))
+            for s in snapshot["sites"][:limit]:
+                out.append(f"  linha {s['line']}: {s['closures']} closures, "
+                           f"{s['retained']} bytes")
+        return "\n".join(out)
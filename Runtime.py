@@ -0,0 +1,693 @@
+"""
+Entry points used by the tools that run whole programs: parsing a source
+text, loading a prelude of top-level declarations, evaluating jobs on a
+pool of pre-warmed worker processes and serving the checks of driver.py
+over a stream of framed requests. Results can be kept in a persistent
+ResultCache, shared by every tool.
+"""
+import gc
+import io
+import os
+import sys
+import json
+import zlib
+import pickle
+import hashlib
+import importlib
+import time
+import queue
+import threading
+import multiprocessing
+from collections import ChainMap
+from contextlib import redirect_stdout
+from concurrent.futures import Future, ProcessPoolExecutor
+from Expression import *
+from Visitor import *
+from Lexer import Lexer
+from Parser import Parser
+from Traversal import evaluate, undefined_variables
+from Builtins import signature
+
+def parse_source(source):
+    """
+    Returns the expression denoted by the source text.
+
+    Example:
+    >>> exp = parse_source('1 + 2')
+    >>> exp.accept(EvalVisitor(), {})
+    3
+    """
+    return Parser(Lexer(source).tokens()).parse()
+
+def load_prelude(source, env=None):
+    """
+    Evaluates a sequence of top-level 'val' and 'fun' declarations, and
+    returns the environment that they define. Each declaration gets a fresh
+    environment, so that closures keep seeing the bindings that existed when
+    they were created, even if later declarations shadow them.
+
+    Example:
+    >>> env = load_prelude('val one = 1 fun succ x = x + one val one = 2')
+    >>> env['one']
+    2
+    >>> parse_source('succ 41').accept(EvalVisitor(), env)
+    42
+    """
+    env = {} if env is None else env
+    decls = Parser(Lexer(source).tokens()).parse_declarations()
+    for name, exp in decls:
+        value = evaluate(exp, env)
+        env = env.copy()
+        env[name.identifier] = value
+    return env
+
+# Modules whose sources define the result of a program: the key of every
+# cached result depends on them (see interpreter_digest).
+INTERPRETER_MODULES = ("Expression", "Lexer", "Parser", "Visitor", "Types",
+                       "Builtins", "Traversal", "Module", "Runtime")
+
+_interpreter_digest = None
+
+def interpreter_digest():
+    """Returns a digest of the sources of the interpreter."""
+    global _interpreter_digest
+    if _interpreter_digest is None:
+        digest = hashlib.sha256()
+        for name in INTERPRETER_MODULES:
+            # Some of them, such as Module, are only imported when needed.
+            # The loader also reads modules packed in a zip file (zipapp).
+            module = importlib.import_module(name)
+            digest.update(module.__loader__.get_data(module.__file__))
+        _interpreter_digest = digest.hexdigest()
+    return _interpreter_digest
+
+class ResultCache:
+    """
+    A persistent cache of the results of programs, kept in a directory with
+    one file per result. Programs take no input, so the result of a program
+    only depends on its AST, on the interpreter, on the prelude (the context)
+    and on what is done with it (the engine). The key of a program is the
+    structural hash of its AST, so edits to blanks and line breaks still hit.
+
+    Entries are written to a temporary file, which is then renamed over the
+    entry: readers never see partial entries, and processes that share the
+    directory can write concurrently. Hits update the modification time of
+    the entry, so when the directory grows beyond max_bytes, the entries
+    used least recently are removed first. The size is checked after every
+    prune_every writes, and when the cache is closed.
+
+    Example:
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as path:
+    ...     cache = ResultCache(path)
+    ...     exp = parse_source('1 + 2')
+    ...     miss = cache.get(exp)
+    ...     cache.put(exp, {"value": "3", "error": None})
+    ...     hit = cache.get(parse_source('1+\\n  2'))
+    ...     miss, hit, cache.hits, cache.misses
+    (None, {'value': '3', 'error': None}, 1, 1)
+    """
+    def __init__(self, path, context="", max_bytes=64 * 1024 * 1024, prune_every=64):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.prune_every = prune_every
+        self.context = hashlib.sha256(
+            (interpreter_digest() + "\0" + context).encode()).hexdigest()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        os.makedirs(path, exist_ok=True)
+
+    def entry(self, exp, engine="evaluate"):
+        # Registering another builtin changes the results of the programs that use it.
+        key = hashlib.sha256(
+            f"{self.context}/{signature()}/{engine}/{structural_hash(exp)}".encode()).hexdigest()
+        return os.path.join(self.path, key + ".json")
+
+    def get(self, exp, engine="evaluate"):
+        """Returns the result cached for exp, or None."""
+        entry = self.entry(exp, engine)
+        try:
+            with open(entry, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            os.utime(entry)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def put(self, exp, result, engine="evaluate"):
+        entry = self.entry(exp, engine)
+        tmp = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(result, f)
+            os.replace(tmp, entry)
+        except OSError:
+            return
+        self.writes += 1
+        if self.writes % self.prune_every == 0:
+            self.prune()
+
+    def prune(self):
+        """Removes the least recently used entries beyond max_bytes."""
+        entries = []
+        with os.scandir(self.path) as it:
+            for item in it:
+                try:
+                    stat = item.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, item.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def close(self):
+        if self.writes % self.prune_every:
+            self.prune()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def run_source(source, env=None, cache=None):
+    """
+    Evaluates a program, and returns a dictionary with the printable value of
+    the program, or the error that stopped it, plus the evaluation time. The
+    interpreter reports errors through sys.exit, so SystemExit is captured
+    here as well; this lets many programs run in the same process. Other
+    exceptions are bugs of the interpreter, not errors of the program: their
+    message is the error, and crashed is set. With a ResultCache, whose
+    context must be the source of env, programs already evaluated are not
+    evaluated again; only values and the errors reported by the interpreter
+    are cached.
+
+    Example:
+    >>> run_source('2 + 3 * 4')['value']
+    '14'
+    >>> run_source('2 + x')['error']
+    'Def error'
+    >>> run_source('succ 1', load_prelude('fun succ x = x + 1'))['value']
+    '2'
+    """
+    start = time.perf_counter()
+    value, error, cached, crashed = None, None, None, False
+    try:
+        exp = parse_source(source)
+        cached = cache.get(exp) if cache is not None else None
+        if cached is None:
+            try:
+                value = str(evaluate(exp, {} if env is None else env))
+            except SystemExit as e:
+                error = str(e.code)
+            if cache is not None:
+                cache.put(exp, {"value": value, "error": error})
+        else:
+            value, error = cached["value"], cached["error"]
+    except SystemExit as e:
+        error = str(e.code)
+    except Exception as e:
+        error, crashed = str(e) or type(e).__name__, True
+    return {"value": value, "error": error, "cached": cached is not None,
+            "crashed": crashed, "time": time.perf_counter() - start}
+
+def run_file(path, env=None, cache=None):
+    """
+    Reads a program from a file and evaluates it with run_source. The result
+    also has the name of the file and the time spent reading it; a file that
+    cannot be read is reported as an error, like a program that fails.
+
+    Example:
+    >>> run_file('missing.sml')['error']
+    "Arquivo 'missing.sml' não encontrado"
+    """
+    start = time.perf_counter()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            source = f.read().strip()
+    except FileNotFoundError:
+        return {"file": path, "value": None,
+                "error": f"Arquivo '{path}' não encontrado", "cached": False,
+                "read": time.perf_counter() - start, "time": 0.0}
+    except Exception as e:
+        return {"file": path, "value": None, "error": f"Erro ao ler arquivo: {e}",
+                "cached": False, "read": time.perf_counter() - start, "time": 0.0}
+    read = time.perf_counter() - start
+    result = run_source(source, env, cache)
+    return {"file": path, "value": result["value"], "error": result["error"],
+            "cached": result["cached"], "read": read, "time": result["time"]}
+
+IMAGE_MAGIC = b"SML-IMAGE 1\n"
+
+# Limits used to pickle the ASTs of very deep closures (see _deep).
+DEEP_RECURSION_LIMIT = 1000000
+DEEP_STACK_SIZE = 512 * 1024 * 1024
+
+def _deep(function, *args):
+    """
+    Calls function, which may recurse once per level of an AST. If the
+    Python stack is not deep enough, calls it again in a thread with a
+    larger stack and a higher recursion limit.
+    """
+    try:
+        return function(*args)
+    except RecursionError:
+        pass
+    limit = sys.getrecursionlimit()
+    outcome = {}
+    def target():
+        try:
+            outcome["result"] = function(*args)
+        except BaseException as e:
+            outcome["error"] = e
+    sys.setrecursionlimit(DEEP_RECURSION_LIMIT)
+    stack_size = threading.stack_size(DEEP_STACK_SIZE)
+    try:
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+    finally:
+        threading.stack_size(stack_size)
+        sys.setrecursionlimit(limit)
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+def save_image(path, env, types=None):
+    """
+    Saves an evaluated top-level environment, such as the one built by
+    load_prelude, into an image file; types, if given, are the types of
+    its names. Closures are saved with their ASTs and the environments that
+    they captured. Values shared by many closures are saved once, and stay
+    shared when the image is loaded. The image is compressed, and is tied
+    to the version of the interpreter that wrote it.
+
+    Example:
+    >>> import tempfile
+    >>> env = load_prelude('fun fact n = if n <= 1 then 1 else n * fact (n - 1) val f = fact')
+    >>> with tempfile.TemporaryDirectory() as path:
+    ...     save_image(path + '/prelude.img', env)
+    ...     image_env, types = load_image(path + '/prelude.img')
+    >>> image_env['f'] is image_env['fact'], types
+    (True, None)
+    >>> run_source('f 5', image_env)['value']
+    '120'
+    """
+    data = _deep(pickle.dumps, {"env": env, "types": types}, pickle.HIGHEST_PROTOCOL)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(IMAGE_MAGIC + interpreter_digest().encode() + b"\n")
+        f.write(zlib.compress(data))
+    os.replace(tmp, path)
+
+def load_image(path):
+    """
+    Loads an image written by save_image, and returns the pair (env, types).
+    Images hold pickled objects, so only images from trusted sources should
+    be loaded. Stops with 'Image error' if the file is not an image, or was
+    written by another version of the interpreter.
+    """
+    with open(path, 'rb') as f:
+        magic = f.readline()
+        version = f.readline().strip().decode('ascii', 'replace')
+        data = f.read()
+    if magic != IMAGE_MAGIC:
+        sys.exit("Image error: not an image")
+    if version != interpreter_digest():
+        sys.exit("Image error: written by another version of the interpreter")
+    image = _deep(pickle.loads, zlib.decompress(data))
+    return image["env"], image["types"]
+
+class Session:
+    """
+    A top-level environment that persists across inputs, as in an
+    interactive session. Each input is a sequence of top-level 'val' and 'fun'
+    declarations, which extend the environment, followed by an optional
+    expression, which is evaluated in the extended environment.
+    The session keeps the values and the types of every name defined so far,
+    so only the new input is parsed, analyzed and evaluated: the cost of an
+    input does not depend on how much has been defined before it. A session
+    may start from an environment, such as the one of an image, and the
+    types of its names.
+
+    Example:
+    >>> session = Session()
+    >>> session.run('fun twice f = fn x => f (f x)')['names']
+    [('twice', "('a -> 'a) -> 'a -> 'a")]
+    >>> session.run('val succ = fn x => x + 1')['names']
+    [('succ', 'int -> int')]
+    >>> result = session.run('twice succ 40')
+    >>> result['value'], result['type']
+    ('42', 'int')
+    >>> session.run('succ true')['error']
+    'Type Error'
+    >>> session.run('succ y')['error']
+    'Def error'
+    >>> result = session.run('val a = 1; a + 1')
+    >>> result['names'], result['value'], result['type']
+    ([('a', 'int')], '2', 'int')
+    """
+    def __init__(self, env=None, types=None):
+        self.env = {} if env is None else env
+        # Names whose types are not known accept any type.
+        self.types = {name: TypeVariable(GENERIC) for name in self.env}
+        self.types.update(types or {})
+        self.inputs = 0
+        self.last_times = {}
+
+    def check(self, exp, define=False):
+        """
+        Analyzes an input against the names defined so far. Only the new
+        bindings of the input go into a fresh layer over the persistent types,
+        which are shared, not copied; an input with errors leaves them intact.
+        Returns the (generalized, if define is set) type of exp.
+        """
+        analysis = AnalysisVisitor()
+        analysis.scope = ChainMap({}, self.types)
+        if define:
+            type_ = analysis.define(exp)
+        else:
+            exp.accept(analysis, analysis.type)
+            type_ = analysis.type
+        if analysis.undefined:
+            sys.exit("Def error")
+        if analysis.type_error is not None:
+            sys.exit(analysis.type_error)
+        return type_
+
+    def define(self, name, value, type_):
+        """
+        Binds a name in the top-level environment. The environment grows in
+        place, which is safe because the analysis rejects uses of names that
+        were not yet defined; a name that is defined again gets a copy of
+        the environment, so that closures keep seeing the older binding.
+        Inputs are evaluated in a layer over this environment, so the
+        environments that closures capture, and copy at each call, only hold
+        local bindings.
+        """
+        if name in self.env:
+            self.env = self.env.copy()
+        self.env[name] = value
+        self.types[name] = type_
+
+    def run(self, source):
+        """
+        Runs one input, and returns a dictionary with its value and type, or
+        the names that it defined with their types, or the error that stopped
+        it, plus the time of each phase.
+        """
+        self.inputs += 1
+        times = {}
+        result = {"value": None, "type": None, "names": [], "error": None,
+                  "times": times}
+        try:
+            start = time.perf_counter()
+            tokens = list(Lexer(source).tokens())
+            decls, exp = Parser(tokens).parse_input()
+            times["parser"] = time.perf_counter() - start
+            times["analysis"] = times["eval"] = 0.0
+            for name, decl in decls:
+                start = time.perf_counter()
+                type_ = self.check(decl, define=True)
+                times["analysis"] += time.perf_counter() - start
+                start = time.perf_counter()
+                value = evaluate(decl, ChainMap({}, self.env))
+                times["eval"] += time.perf_counter() - start
+                self.define(name.identifier, value, type_)
+                result["names"].append((name.identifier, type_to_string(type_)))
+            if exp is not None:
+                start = time.perf_counter()
+                type_ = self.check(exp)
+                times["analysis"] += time.perf_counter() - start
+                start = time.perf_counter()
+                result["value"] = str(evaluate(exp, ChainMap({}, self.env)))
+                times["eval"] += time.perf_counter() - start
+                result["type"] = type_to_string(type_)
+        except SystemExit as e:
+            result["error"] = str(e.code)
+        except Exception as e:
+            result["error"] = str(e) or type(e).__name__
+        self.last_times = times
+        return result
+
+# Environment inherited by the workers of a WorkerPool. It is a module global
+# so that forked workers find it already evaluated in their address space.
+_prelude_env = {}
+_cache = None
+
+def image_context(path):
+    """Returns the context of the results computed over an image."""
+    with open(path, 'rb') as f:
+        return "image:" + hashlib.sha256(f.read()).hexdigest()
+
+def _init_worker(prelude, cache_path=None, image=None):
+    global _prelude_env, _cache
+    if image:
+        _prelude_env, _ = load_image(image)
+    else:
+        _prelude_env = load_prelude(prelude) if prelude else {}
+    context = image_context(image) if image else prelude
+    _cache = ResultCache(cache_path, context) if cache_path else None
+
+def _run_job(source):
+    return run_source(source, _prelude_env, _cache)
+
+def _run_file_job(path):
+    return run_file(path, _prelude_env, _cache)
+
+class WorkerPool:
+    """
+    A pool of worker processes that evaluate programs against a shared
+    prelude. The parent process parses and evaluates the prelude once, moves
+    every object that exists at that point into the permanent generation of
+    the garbage collector (gc.freeze), and only then forks the workers. Thus,
+    the workers inherit the evaluated environment copy-on-write: the
+    collector never touches those pages, and no job re-parses the prelude.
+    On platforms without fork, each worker loads the prelude once at startup.
+    The environment can also come from an image file (see save_image). If
+    cache is the path of a ResultCache, the workers share it.
+
+    Example:
+    >>> with WorkerPool('fun double x = x + x', processes=2) as pool:
+    ...     [r['value'] for r in pool.map(['double 21', 'double 1', 'y'])]
+    ['42', '2', None]
+    """
+    def __init__(self, prelude="", processes=None, cache=None, image=None):
+        context = image_context(image) if image else prelude
+        self.cache = ResultCache(cache, context) if cache else None
+        if "fork" in multiprocessing.get_all_start_methods():
+            _init_worker(prelude, cache, image)
+            gc.collect()
+            gc.freeze()
+            self.frozen = True
+            context = multiprocessing.get_context("fork")
+            self.pool = context.Pool(processes)
+        else:
+            self.frozen = False
+            self.pool = multiprocessing.Pool(processes, _init_worker,
+                                             (prelude, cache, image))
+
+    def run(self, source):
+        return self.pool.apply(_run_job, (source,))
+
+    def map(self, sources, ordered=True, chunksize=1):
+        """
+        Evaluates the programs in the workers. If ordered is False, results
+        are produced in completion order, instead of in input order.
+        """
+        return self._map(_run_job, sources, ordered, chunksize)
+
+    def map_files(self, paths, ordered=True, chunksize=1):
+        """
+        Like map, but the workers read the programs from the files themselves
+        (see run_file), so only the paths travel through the pipes.
+        """
+        return self._map(_run_file_job, paths, ordered, chunksize)
+
+    def _map(self, job, items, ordered, chunksize):
+        if ordered:
+            return self.pool.imap(job, items, chunksize)
+        return self.pool.imap_unordered(job, items, chunksize)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        if self.cache is not None:
+            self.cache.prune()
+        if self.frozen:
+            gc.unfreeze()
+            self.frozen = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def run_check(option, program, cache=None):
+    """
+    Runs one check of driver.py ('eval', 'usedef' or 'safe_eval') on a
+    program, and returns a pair (status, output): output is the text that
+    driver.py would print, and status is 'ok', or 'error' if the check was
+    stopped by an error, whose message then ends the output. With a
+    ResultCache, the answers of checks already done are reused.
+
+    Example:
+    >>> run_check('eval', 'let val x = 2 in x * 21 end')
+    ('ok', 'Value is 42\\n')
+    >>> run_check('usedef', 'x + 1')
+    ('ok', 'Are there undefs? True\\n')
+    >>> run_check('safe_eval', 'true + 1')
+    ('error', 'Warning: Type Error\\nType error\\n')
+    >>> run_check('safe_eval', 'if true then 1 else false')
+    ('ok', 'Warning: Type Error\\nValue is 1\\n')
+    >>> run_check('lint', '1')
+    ('error', 'Invalid option = lint\\n')
+    """
+    out = io.StringIO()
+    try:
+        exp = parse_source(program)
+        cached = cache.get(exp, option) if cache is not None else None
+        if cached is not None:
+            return cached["status"], cached["output"]
+        try:
+            with redirect_stdout(out):
+                if option == 'eval':
+                    print(f"Value is {evaluate(exp, {})}")
+                elif option == 'usedef':
+                    print(f"Are there undefs? {len(undefined_variables(exp, set())) > 0}")
+                elif option == 'safe_eval':
+                    safe_eval(exp)
+                else:
+                    sys.exit(f"Invalid option = {option}")
+            status, output = "ok", out.getvalue()
+        except SystemExit as e:
+            status, output = "error", f"{out.getvalue()}{e.code}\n"
+        if cache is not None:
+            cache.put(exp, {"status": status, "output": output}, option)
+        return status, output
+    except SystemExit as e:
+        return "error", f"{out.getvalue()}{e.code}\n"
+    except Exception as e:
+        return "error", f"{out.getvalue()}{str(e) or type(e).__name__}\n"
+
+def _run_check_job(option, program):
+    return run_check(option, program, _cache)
+
+def read_frame(stream):
+    """
+    Reads one frame from a binary stream: a header line with a tag and the
+    length, in bytes, of the payload, followed by the payload. Returns the
+    pair (tag, payload), or None at the end of the stream. Raises ValueError
+    if the frame is malformed or truncated.
+
+    Example:
+    >>> stream = io.BytesIO(b'eval 5\\n1 + 2')
+    >>> read_frame(stream), read_frame(stream)
+    (('eval', '1 + 2'), None)
+    >>> read_frame(io.BytesIO(b'eval five\\n1 + 2'))
+    Traceback (most recent call last):
+    ...
+    ValueError: Invalid frame header
+    """
+    header = stream.readline()
+    if not header.strip():
+        return None
+    fields = header.split()
+    if len(fields) != 2 or not fields[1].isdigit():
+        raise ValueError("Invalid frame header")
+    tag, length = fields
+    payload = stream.read(int(length))
+    if len(payload) != int(length):
+        raise ValueError("Truncated frame")
+    try:
+        return tag.decode('ascii'), payload.decode('utf-8')
+    except UnicodeDecodeError:
+        raise ValueError("Invalid frame encoding") from None
+
+def write_frame(stream, tag, payload):
+    """Writes one frame (see read_frame) and flushes the stream."""
+    data = payload.encode('utf-8')
+    stream.write(f"{tag} {len(data)}\n".encode('ascii') + data)
+    stream.flush()
+
+def serve(input, output, jobs=1, cache=None):
+    """
+    Answers framed requests, one after the other, until the input ends. The
+    tag of a request is the check to run, and its payload is the program;
+    the tag of each response is the status of the check, and its payload is
+    the output of driver.py (see run_check). Responses come in the order of
+    the requests. The interpreter is loaded once, for every request.
+
+    With more than one job, requests are handed to a pool of processes as
+    soon as they are read, and a separate thread writes each response when
+    it is ready; thus, a client may send many requests before reading the
+    responses, or wait for each of them. Checks run in processes, not in
+    threads, because they capture what the interpreter prints. If cache is
+    the path of a ResultCache, answers are kept there.
+
+    A malformed frame is answered with a frame of tag 'error', whose payload
+    is the reason, and ends the requests, since the frames that follow it
+    cannot be found.
+
+    Example:
+    >>> requests = io.BytesIO(b'eval 5\\n1 + 2usedef 1\\nx')
+    >>> responses = io.BytesIO()
+    >>> serve(requests, responses)
+    >>> responses.getvalue()
+    b'ok 11\\nValue is 3\\nok 23\\nAre there undefs? True\\n'
+    >>> responses = io.BytesIO()
+    >>> serve(io.BytesIO(b'eval 5\\n1 + 2eval\\n1 + 2'), responses)
+    >>> responses.getvalue()
+    b'ok 11\\nValue is 3\\nerror 21\\nInvalid frame header\\n'
+    """
+    if jobs == 1:
+        results = ResultCache(cache) if cache else None
+        while True:
+            try:
+                frame = read_frame(input)
+            except ValueError as e:
+                write_frame(output, "error", f"{e}\n")
+                break
+            if frame is None:
+                break
+            write_frame(output, *run_check(*frame, results))
+        if results is not None:
+            results.close()
+        return
+    pending = queue.Queue()
+    def write_responses():
+        for future in iter(pending.get, None):
+            write_frame(output, *future.result())
+    writer = threading.Thread(target=write_responses)
+    writer.start()
+    try:
+        with ProcessPoolExecutor(jobs, initializer=_init_worker,
+                                 initargs=("", cache)) as pool:
+            while True:
+                try:
+                    frame = read_frame(input)
+                except ValueError as e:
+                    # Answered after the responses to the requests before it.
+                    failed = Future()
+                    failed.set_result(("error", f"{e}\n"))
+                    pending.put(failed)
+                    break
+                if frame is None:
+                    break
+                pending.put(pool.submit(_run_check_job, *frame))
+    finally:
+        pending.put(None)
+        writer.join()
+    if cache:
+        ResultCache(cache).prune()
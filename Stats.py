@@ -0,0 +1,223 @@
+"""
+Run statistics for sml.py: wall and CPU time of each phase of the
+interpreter, sizes of the program, and counters collected while it runs.
+Timings come from plain runs of the interpreter; the counters and the peak
+memory come from one extra run, traced with Tracing.Tracer and tracemalloc,
+so that the instrumentation does not distort the timings. If the traced run
+overflows the Python stack, it is done again on the iterative evaluator,
+whose depth is not limited; the depth of the Python stack is then unknown.
+"""
+import sys
+import statistics
+import tracemalloc
+from time import perf_counter, process_time
+from Expression import *
+from Visitor import *
+from Lexer import Lexer
+from Parser import Parser
+from Tracing import Tracer
+from Traversal import IterativeEvalVisitor, evaluate, run, walk
+
+PHASES = ("lexer", "parser", "analysis", "eval")
+
+def ast_size(exp):
+    """
+    Returns the number of nodes and the depth of an AST. The walk uses an
+    explicit stack (see Traversal.walk), so that it also works on very deep
+    trees.
+
+    Example:
+    >>> ast_size(Add(Num(1), Mul(Num(2), Var('x'))))
+    (5, 3)
+    """
+    nodes, depth = 0, 0
+    for node, level in walk(exp):
+        nodes += 1
+        depth = max(depth, level)
+    return nodes, depth
+
+def _timed(function):
+    wall, cpu = perf_counter(), process_time()
+    result = function()
+    return result, perf_counter() - wall, process_time() - cpu
+
+def _run_phases(code, env):
+    """
+    Runs every phase once. Returns the tokens, the AST, the value and the
+    (wall, cpu) times of each phase. The analysis records its errors instead
+    of stopping, so the evaluation always runs, as in sml.py.
+    """
+    times = {}
+    tokens, *times["lexer"] = _timed(lambda: list(Lexer(code).tokens()))
+    exp, *times["parser"] = _timed(lambda: Parser(tokens).parse())
+    # The types of the names of the prelude are not known: any type is accepted.
+    scope = {name: TypeVariable(GENERIC) for name in env}
+    _, *times["analysis"] = _timed(lambda: analyze(exp, scope))
+    value, *times["eval"] = _timed(lambda: evaluate(exp, env))
+    return tokens, exp, value, times
+
+def _summary(samples):
+    return {
+        "mean": statistics.mean(samples),
+        "min": min(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+class _Counters:
+    """
+    Callbacks of the tracer used to count events of the evaluation. The
+    Python stack is only measured if measure_stack is true.
+    """
+    def __init__(self, measure_stack=True):
+        self.measure_stack = measure_stack
+        self.closures = 0
+        self.env_copies = 0
+        self.depth = 0
+        self.max_depth = 0
+        self.calls = 0
+        self.frames = 0
+        self.max_frame = None
+        self.python_depth = 0
+
+    def enter(self, visitor, node, env):
+        if isinstance(node, Fn):
+            self.closures += 1
+        self.depth += 1
+        if self.depth > self.max_depth:
+            self.max_depth = self.depth
+            if self.measure_stack:
+                self.measure_python_depth()
+
+    def exit(self, visitor, node, env, result):
+        self.depth -= 1
+
+    def call(self, visitor, function, argument):
+        self.calls += 1
+        self.env_copies += 1
+
+    def ret(self, visitor, function, argument, result):
+        self.calls -= 1
+
+    def bind(self, visitor, name, value):
+        self.env_copies += 1
+
+    def measure_python_depth(self):
+        """
+        Counts the Python frames on the stack, below the callback. A new
+        maximum depth is usually reached right below the previous one, so the
+        walk stops as soon as it finds the frame of the previous maximum.
+        Every active visit and call runs inside one frame of the tracer, which
+        would not exist in an untraced run; those frames are discounted.
+        """
+        top = sys._getframe(2)
+        frame, steps = top, 0
+        while frame is not None and frame is not self.max_frame:
+            frame = frame.f_back
+            steps += 1
+        self.frames = steps if frame is None else self.frames + steps
+        self.max_frame = top
+        self.python_depth = max(self.python_depth,
+                                self.frames - self.depth - self.calls)
+
+def collect_stats(code, env=None, repeat=1, read_time=None):
+    """
+    Runs the program repeat times, and returns its statistics. The value of
+    the program, or the error that stopped it, is returned as well.
+
+    Example:
+    >>> stats = collect_stats('let val f = fn x => x + 1 in f (f 40) end', repeat=2)
+    >>> stats['value'], stats['tokens'], stats['ast_nodes'], stats['closures']
+    ('42', 17, 12, 1)
+    >>> stats['env_copies'], stats['visit_depth']
+    (3, 5)
+    >>> sorted(stats['phases'])
+    ['analysis', 'eval', 'lexer', 'parser']
+    >>> stats = collect_stats(' + '.join(['1'] * 20000))
+    >>> stats['value'], stats['visit_depth'], 'python_depth' in stats
+    ('20000', 20000, False)
+    """
+    env = {} if env is None else env
+    samples = {phase: ([], []) for phase in PHASES}
+    stats = {"repeat": repeat, "value": None, "error": None}
+    try:
+        for _ in range(repeat):
+            tokens, exp, value, times = _run_phases(code, env)
+            for phase, (wall, cpu) in times.items():
+                samples[phase][0].append(wall)
+                samples[phase][1].append(cpu)
+        stats["value"] = str(value)
+    except SystemExit as e:
+        stats["error"] = str(e.code)
+    except Exception as e:
+        stats["error"] = str(e) or type(e).__name__
+
+    stats["phases"] = {}
+    if read_time is not None:
+        stats["phases"]["read"] = {"wall": _summary([read_time])}
+    for phase in PHASES:
+        wall, cpu = samples[phase]
+        if wall:
+            stats["phases"][phase] = {"wall": _summary(wall), "cpu": _summary(cpu)}
+    if stats["error"] is not None:
+        return stats
+
+    stats["tokens"] = len(tokens)
+    stats["ast_nodes"], stats["ast_depth"] = ast_size(exp)
+
+    tracing_memory = tracemalloc.is_tracing()
+    if not tracing_memory:
+        tracemalloc.start()
+    try:
+        try:
+            counters = _traced_run(exp, env, EvalVisitor())
+        except RecursionError:
+            counters = _traced_run(exp, env, IterativeEvalVisitor())
+        _, stats["peak_memory"] = tracemalloc.get_traced_memory()
+    finally:
+        if not tracing_memory:
+            tracemalloc.stop()
+    stats["closures"] = counters.closures
+    stats["env_copies"] = counters.env_copies
+    stats["visit_depth"] = counters.max_depth
+    if counters.measure_stack:
+        stats["python_depth"] = counters.python_depth
+    return stats
+
+def _traced_run(exp, env, visitor):
+    """
+    Evaluates the expression with the visitor, traced, and returns the
+    counters of the run. The iterative visitors are run by Traversal.run.
+    """
+    iterative = isinstance(visitor, IterativeEvalVisitor)
+    counters = _Counters(measure_stack=not iterative)
+    tracer = Tracer()
+    tracer.on("enter", counters.enter).on("exit", counters.exit)
+    tracer.on("call", counters.call).on("return", counters.ret)
+    tracer.on("bind", counters.bind)
+    tracer.attach(visitor)
+    tracemalloc.reset_peak()
+    if iterative:
+        run(visitor, exp, env)
+    else:
+        exp.accept(visitor, env)
+    return counters
+
+def format_stats(stats):
+    """Formats the statistics as a table, for humans."""
+    out = [f"{'fase':10s} {'wall (ms)':>12s} {'min (ms)':>12s} "
+           f"{'desvio (ms)':>12s} {'cpu (ms)':>12s}"]
+    for phase, times in stats["phases"].items():
+        wall, cpu = times["wall"], times.get("cpu")
+        out.append(f"{phase:10s} {wall['mean'] * 1000:12.3f} {wall['min'] * 1000:12.3f} "
+                   f"{wall['stdev'] * 1000:12.3f} "
+                   f"{cpu['mean'] * 1000 if cpu else 0.0:12.3f}")
+    labels = [("repeat", "repetições"), ("tokens", "tokens"),
+              ("ast_nodes", "nós da AST"), ("ast_depth", "profundidade da AST"),
+              ("visit_depth", "profundidade de visitas"),
+              ("python_depth", "profundidade da pilha Python"),
+              ("closures", "closures criadas"), ("env_copies", "cópias de ambiente"),
+              ("peak_memory", "pico de memória (bytes)")]
+    for key, label in labels:
+        if key in stats:
+            out.append(f"{label:30s} {stats[key]}")
+    return "\n".join(out)
@@ -0,0 +1,228 @@
+"""
+Tracing hooks for the visitors. A Tracer holds the callbacks registered for
+each kind of event, and attaches itself to a visitor by swapping the class of
+that visitor for an instrumented subclass, whose visiting methods report the
+events before delegating to the original ones. The original classes are never
+modified, so visitors that are not traced pay nothing for the hooks; and the
+instrumentation works for any visitor, including the iterative visitors of
+Traversal.py, whose visiting methods are generators: their instrumented
+methods are generators too.
+
+Events and the arguments given to their callbacks:
+    enter  (visitor, node, arg)              before a node is visited
+    exit   (visitor, node, arg, result)      after a node is visited
+    call   (visitor, function, argument)     before a function is applied
+    return (visitor, function, argument, result)
+    bind   (visitor, name, value)            when a let binds a name
+The result given to 'exit' and 'return' is None if the visit raised; the
+generators of iterative visitors that raise report neither event.
+'call' and 'return' only happen for visitors that define an 'apply' method
+(and, within a traversal of the iterative evaluator, an 'invoke' method),
+and 'bind' only for visitors that define a 'bind' method: the lets of their
+instrumented subclass are visited by bind_let, which binds with that method,
+while the original visit_let binds inline. Only the evaluators and the
+use-def visitors define it. The type checkers (CtrGenVisitor, AnalysisVisitor
+and their iterative ports) bind names in a scope that they update in place,
+with enter_scope, and report no 'bind' events.
+"""
+from Visitor import CurriedCalls
+from Traversal import CO_GENERATOR
+
+EVENTS = ("enter", "exit", "call", "return", "bind")
+
+def _traced_visit(method):
+    if method.__code__.co_flags & CO_GENERATOR:
+        return _traced_generator(method)
+    def visit(self, node, arg):
+        tracer = self.tracer
+        for callback in tracer.callbacks["enter"]:
+            callback(self, node, arg)
+        result = None
+        try:
+            result = method(self, node, arg)
+            return result
+        finally:
+            for callback in tracer.callbacks["exit"]:
+                callback(self, node, arg, result)
+    visit.__name__ = method.__name__
+    return visit
+
+def _traced_generator(method):
+    """
+    Instruments a visiting method that is a generator. If the traversal
+    stops with an error, the generator is abandoned without reporting 'exit'.
+    """
+    def visit(self, node, arg):
+        tracer = self.tracer
+        for callback in tracer.callbacks["enter"]:
+            callback(self, node, arg)
+        result = yield from method(self, node, arg)
+        for callback in tracer.callbacks["exit"]:
+            callback(self, node, arg, result)
+        return result
+    visit.__name__ = method.__name__
+    return visit
+
+def _traced_apply(method):
+    def apply(self, function, argument):
+        tracer = self.tracer
+        for callback in tracer.callbacks["call"]:
+            callback(self, function, argument)
+        result = None
+        try:
+            result = method(self, function, argument)
+            return result
+        finally:
+            for callback in tracer.callbacks["return"]:
+                callback(self, function, argument, result)
+    return apply
+
+def _traced_invoke(method):
+    def invoke(self, function, values):
+        tracer = self.tracer
+        for callback in tracer.callbacks["call"]:
+            callback(self, function, values[0])
+        result = yield from method(self, function, values)
+        for callback in tracer.callbacks["return"]:
+            callback(self, function, values[0], result)
+        return result
+    return invoke
+
+def _traced_bind(method):
+    def bind(self, env, name, value):
+        for callback in self.tracer.callbacks["bind"]:
+            callback(self, name, value)
+        return method(self, env, name, value)
+    return bind
+
+# Instrumented subclass of each visitor class, built on first use.
+_traced_classes = {}
+
+def traced_class(cls):
+    """
+    Returns the instrumented subclass of a visitor class: the same class,
+    with a dispatch table where every visiting method reports events.
+
+    Example:
+    >>> from Visitor import EvalVisitor
+    >>> traced_class(EvalVisitor).__name__
+    'TracedEvalVisitor'
+    >>> traced_class(EvalVisitor) is traced_class(EvalVisitor)
+    True
+    """
+    traced = _traced_classes.get(cls)
+    if traced is None:
+        table = {"traced_base": cls}
+        for name in dir(cls):
+            if name.startswith("visit_"):
+                table[name] = _traced_visit(getattr(cls, name))
+        if hasattr(cls, "apply"):
+            table["apply"] = _traced_apply(cls.apply)
+            # The class must keep the layout of cls, to be swapped for it, so
+            # it takes the attribute of the mixin instead of deriving from it.
+            table["uncurried_calls"] = CurriedCalls.uncurried_calls
+        if hasattr(cls, "invoke"):
+            table["invoke"] = _traced_invoke(cls.invoke)
+        if hasattr(cls, "bind"):
+            table["visit_let"] = _traced_visit(cls.bind_let)
+            table["bind"] = _traced_bind(cls.bind)
+        traced = _traced_classes[cls] = type(f"Traced{cls.__name__}", (cls,), table)
+    return traced
+
+class Tracer:
+    """
+    A set of callbacks, indexed by event, that can be attached to visitors at
+    runtime.
+
+    Example:
+    >>> from Visitor import EvalVisitor
+    >>> from Runtime import parse_source
+    >>> exp = parse_source('let val f = fn x => x + 1 in f 41 end')
+    >>> events = []
+    >>> tracer = Tracer()
+    >>> _ = tracer.on('call', lambda v, f, a: events.append(('call', str(f), a)))
+    >>> _ = tracer.on('return', lambda v, f, a, r: events.append(('return', r)))
+    >>> _ = tracer.on('bind', lambda v, name, value: events.append(('bind', name)))
+    >>> ev = EvalVisitor()
+    >>> with tracer.tracing(ev):
+    ...     exp.accept(ev, {})
+    42
+    >>> events
+    [('bind', 'f'), ('call', 'Fn(x)', 41), ('return', 42)]
+    >>> type(ev).__name__
+    'EvalVisitor'
+
+    >>> from Visitor import UseDefVisitor
+    >>> nodes = []
+    >>> tracer = Tracer().on('enter', lambda v, node, arg: nodes.append(type(node).__name__))
+    >>> uv = tracer.attach(UseDefVisitor())
+    >>> parse_source('1 + y').accept(uv, set())
+    {'y'}
+    >>> nodes
+    ['Add', 'Num', 'Var']
+
+    >>> from Visitor import CtrGenVisitor
+    >>> events = []
+    >>> tracer = Tracer().on('bind', lambda v, name, value: events.append(name))
+    >>> _ = tracer.on('enter', lambda v, node, arg: events.append(type(node).__name__))
+    >>> cv = tracer.attach(CtrGenVisitor())
+    >>> parse_source('let val x = 1 in x end').accept(cv, cv.fresh_type_var())
+    >>> events
+    ['Let', 'Num', 'Var']
+
+    >>> from Traversal import IterativeEvalVisitor, run
+    >>> calls = []
+    >>> tracer = Tracer().on('call', lambda v, f, a: calls.append((str(f), a)))
+    >>> with tracer.tracing(IterativeEvalVisitor()) as ev:
+    ...     run(ev, exp, {})
+    42
+    >>> calls
+    [('Fn(x)', 41)]
+    """
+    def __init__(self):
+        self.callbacks = {event: [] for event in EVENTS}
+
+    def on(self, event, callback):
+        """Registers a callback for the event, and returns the tracer."""
+        if event not in self.callbacks:
+            raise ValueError(f"Unknown event: {event}")
+        self.callbacks[event].append(callback)
+        return self
+
+    def off(self, event, callback):
+        """Unregisters a callback of the event."""
+        self.callbacks[event].remove(callback)
+        return self
+
+    def attach(self, visitor):
+        """
+        Starts tracing the visitor, by swapping its class for the
+        instrumented subclass. Returns the visitor.
+        """
+        if getattr(visitor, "tracer", None) is not None:
+            raise ValueError("Visitor is already traced")
+        visitor.tracer = self
+        visitor.__class__ = traced_class(type(visitor))
+        return visitor
+
+    @staticmethod
+    def detach(visitor):
+        """Stops tracing the visitor, restoring its original class."""
+        visitor.__class__ = visitor.traced_base
+        visitor.tracer = None
+        return visitor
+
+    def tracing(self, visitor):
+        """Context manager that traces the visitor within a 'with' block."""
+        return _Tracing(self, visitor)
+
+class _Tracing:
+    def __init__(self, tracer, visitor):
+        self.tracer = tracer
+        self.visitor = visitor
+
+    def __enter__(self):
+        return self.tracer.attach(self.visitor)
+
+    def __exit__(self, *exc):
+        Tracer.detach(self.visitor)
@@ -0,0 +1,635 @@
+"""
+Iterative traversal of expressions. The visitors of Visitor.py recurse once
+per node, through accept() and visit_*(), so deep trees overflow the Python
+stack. This module walks trees with an explicit stack instead:
+
+* run(visitor, exp, arg) drives visitors whose visiting methods are
+  generators: a method yields (child, arg) to have a child visited, and gets
+  its result back from the yield. Methods that are not generators (leaves)
+  return their result directly. The method of each class of node is looked
+  up once per visitor class, in a dispatch table.
+* walk(exp) and postorder(exp) iterate over the nodes of a tree, and
+  fold(exp, table) combines, bottom-up, the results of the children of each
+  node with the function that the table associates with its class.
+
+The iterative visitors defined here (IterativeEvalVisitor,
+IterativeUseDefVisitor, IterativeCtrGenVisitor, IterativeAnalysisVisitor)
+are ports of the visitors of Visitor.py, with the same results. Suspending a
+generator per node costs more than a Python call, so the entry points
+(evaluate, Visitor.analyze, Unifier.infer) run the recursive visitors first,
+and switch to the iterative ones only when the Python stack overflows.
+"""
+import sys
+import Builtins
+from Expression import *
+from Visitor import *
+
+# Visiting method of each class of node, as called by its accept method.
+VISIT_METHODS = {
+    Var: "visit_var", Bln: "visit_bln", Num: "visit_num", Eql: "visit_eql",
+    Add: "visit_add", Sub: "visit_sub", Mul: "visit_mul", Div: "visit_div",
+    Leq: "visit_leq", Lth: "visit_lth", Mod: "visit_mod", Neg: "visit_neg",
+    Not: "visit_not", Let: "visit_let", IfThenElse: "visit_ifThenElse",
+    And: "visit_and", Or: "visit_or", Fn: "visit_function", App: "visit_app",
+    Fun: "visit_rec_fun", Nil: "visit_nil", Cons: "visit_cons", Append: "visit_append",
+    LetRec: "visit_letrec", Global: "visit_global",
+}
+
+# Flag of the code of generator functions (inspect.CO_GENERATOR); testing it
+# directly spares the import of inspect.
+CO_GENERATOR = 0x20
+
+# Dispatch table of each visitor class, built on first use.
+_tables = {}
+
+# Maximum number of nodes being visited at once by run(): the counterpart of
+# the recursion limit of the recursive visitors, so that a program that
+# recurses forever stops with an error instead of exhausting the memory.
+_depth_limit = 200000
+
+def getdepthlimit():
+    """Returns the maximum number of nodes being visited at once by run()."""
+    return _depth_limit
+
+def setdepthlimit(limit):
+    """
+    Sets the maximum number of nodes being visited at once by run(), as
+    sys.setrecursionlimit does for the recursive visitors.
+    """
+    global _depth_limit
+    if limit < 1:
+        raise ValueError("The depth limit must be positive")
+    _depth_limit = limit
+
+def dispatch_table(cls):
+    """
+    Returns the table that maps each class of node to a pair (generator,
+    method): the visiting method of cls for that class, and whether the
+    method is a generator.
+
+    Example:
+    >>> table = dispatch_table(IterativeEvalVisitor)
+    >>> table[Add][0], table[Num][0]
+    (True, False)
+    """
+    table = _tables.get(cls)
+    if table is None:
+        table = _tables[cls] = {}
+        for node_class, name in VISIT_METHODS.items():
+            method = getattr(cls, name)
+            table[node_class] = (bool(method.__code__.co_flags & CO_GENERATOR), method)
+    return table
+
+def _lookup(table, node_class):
+    """Finds the entry of a subclass of a known class of node."""
+    for base in node_class.__mro__:
+        if base in table:
+            table[node_class] = table[base]
+            return table[base]
+    raise TypeError(f"No visiting method for {node_class.__name__}")
+
+def run(visitor, exp, arg):
+    """
+    Visits the expression with a visitor whose non-leaf methods are
+    generators, and returns the result of the visit. Stops the program if
+    more nodes than the depth limit are being visited at once.
+
+    Example:
+    >>> exp = Num(0)
+    >>> for i in range(1, 10001):
+    ...     exp = Add(exp, Num(i))
+    >>> run(IterativeEvalVisitor(), exp, {})
+    50005000
+    >>> from Runtime import parse_source
+    >>> loop = parse_source('let fun loop n = loop (n + 1) in loop 0 end')
+    >>> limit = getdepthlimit()
+    >>> setdepthlimit(1000)
+    >>> run(IterativeEvalVisitor(), loop, {})
+    Traceback (most recent call last):
+    ...
+    SystemExit: Stack overflow
+    >>> setdepthlimit(limit)
+    """
+    table = dispatch_table(type(visitor))
+    limit = _depth_limit
+    stack = []
+    node = exp
+    while True:
+        entry = table.get(type(node))
+        if entry is None:
+            entry = _lookup(table, type(node))
+        generator, method = entry
+        if generator:
+            if len(stack) >= limit:
+                sys.exit("Stack overflow")
+            stack.append(method(visitor, node, arg))
+            value = None
+        else:
+            value = method(visitor, node, arg)
+        while stack:
+            try:
+                node, arg = stack[-1].send(value)
+                break
+            except StopIteration as stop:
+                stack.pop()
+                value = stop.value
+        else:
+            return value
+
+def children(node):
+    """
+    Returns the sub-expressions of a node, in the order of its fields. The
+    elements of a list field, such as the functions of a LetRec, are
+    children in the order of the list.
+    """
+    result = []
+    for child in vars(node).values():
+        if isinstance(child, Expression):
+            result.append(child)
+        elif isinstance(child, list):
+            result.extend(item for item in child if isinstance(item, Expression))
+    return result
+
+def walk(exp):
+    """
+    Iterates over the nodes of a tree in pre-order, with their depth (the
+    root has depth 1).
+
+    Example:
+    >>> [(type(node).__name__, depth) for node, depth in walk(Add(Num(1), Neg(Var('x'))))]
+    [('Add', 1), ('Num', 2), ('Neg', 2), ('Var', 3)]
+    """
+    stack = [(exp, 1)]
+    while stack:
+        node, depth = stack.pop()
+        yield node, depth
+        stack.extend((child, depth + 1) for child in reversed(children(node)))
+
+def postorder(exp):
+    """
+    Iterates over the nodes of a tree in post-order.
+
+    Example:
+    >>> [type(node).__name__ for node in postorder(Add(Num(1), Neg(Var('x'))))]
+    ['Num', 'Var', 'Neg', 'Add']
+    """
+    stack = [(exp, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            yield node
+        else:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(children(node)))
+
+def fold(exp, table):
+    """
+    Combines the nodes of a tree bottom-up: the value of a node is given by
+    the function that table associates with its class, applied to the node
+    and to the list of the values of its children.
+
+    Example:
+    >>> size = {Expression: lambda node, values: 1 + sum(values)}
+    >>> fold(Add(Num(1), Neg(Var('x'))), size)
+    4
+    """
+    handlers = {}
+    values = []
+    for node in postorder(exp):
+        handler = handlers.get(type(node))
+        if handler is None:
+            handler = handlers[type(node)] = next(
+                table[base] for base in type(node).__mro__ if base in table)
+        count = len(children(node))
+        arguments = values[len(values) - count:] if count else []
+        del values[len(values) - count:]
+        values.append(handler(node, arguments))
+    return values[0]
+
+class IterativeEvalVisitor(EvalVisitor):
+    """
+    The evaluator of EvalVisitor, run by run(), so that the depth of the
+    tree and of the recursion of the program are not limited by the Python
+    stack.
+
+    Example:
+    >>> from Runtime import parse_source
+    >>> exp = parse_source('let fun sum n = if n = 0 then 0 else n + sum (n - 1) in sum 20000 end')
+    >>> evaluate(exp, {})
+    200010000
+    """
+    def visit_eql(self, eql, env):
+        left = yield eql.left, env
+        right = yield eql.right, env
+        if type(left) == type(right):
+            return left == right
+        else:
+            sys.exit("Type error")
+
+    def visit_add(self, add, env):
+        left = yield add.left, env
+        right = yield add.right, env
+        if type(left) == type(1) and type(right) == type(1):
+            return left + right
+        else:
+            sys.exit("Type error")
+
+    def visit_sub(self, sub, env):
+        left = yield sub.left, env
+        right = yield sub.right, env
+        if type(left) == type(1):
+            return left - right
+        else:
+            sys.exit("Type error")
+
+    def visit_mul(self, mul, env):
+        left = yield mul.left, env
+        right = yield mul.right, env
+        if type(left) == type(1):
+            return left * right
+        else:
+            sys.exit("Type error")
+
+    def visit_div(self, div, env):
+        left = yield div.left, env
+        right = yield div.right, env
+        if type(left) == type(1):
+            return left // right
+        else:
+            sys.exit("Type error")
+
+    def visit_leq(self, leq, env):
+        left = yield leq.left, env
+        right = yield leq.right, env
+        if type(left) == type(1):
+            return left <= right
+        else:
+            sys.exit("Type error")
+
+    def visit_lth(self, lth, env):
+        left = yield lth.left, env
+        right = yield lth.right, env
+        if type(left) == type(1):
+            return left < right
+        else:
+            sys.exit("Type error")
+
+    def visit_mod(self, exp, env):
+        left = yield exp.left, env
+        right = yield exp.right, env
+        if type(left) == type(1):
+            return left % right
+        else:
+            sys.exit("Type error")
+
+    def visit_cons(self, cons, env):
+        head = yield cons.left, env
+        tail = yield cons.right, env
+        if type(tail) != Cell:
+            sys.exit("Type error")
+        return Cell(head, tail)
+
+    def visit_append(self, exp, env):
+        left = yield exp.left, env
+        right = yield exp.right, env
+        return append(left, right)
+
+    def visit_letrec(self, exp, env):
+        return (yield exp.exp_body, self.bind_group(env, exp.functions))
+
+    def visit_neg(self, neg, env):
+        value = yield neg.exp, env
+        if type(value) == type(1):
+            return -1 * value
+        else:
+            sys.exit("Type error")
+
+    def visit_not(self, not_node, env):
+        value = yield not_node.exp, env
+        if type(value) == type(True):
+            return not value
+        else:
+            sys.exit("Type error")
+
+    def visit_let(self, let, env):
+        definition_value = yield let.exp_def, env
+        new_env = env.copy()
+        new_env[let.identifier.identifier] = definition_value
+        return (yield let.exp_body, new_env)
+
+    def bind_let(self, let, env):
+        definition_value = yield let.exp_def, env
+        new_env = self.bind(env, let.identifier.identifier, definition_value)
+        return (yield let.exp_body, new_env)
+
+    def visit_and(self, exp, env):
+        e0 = yield exp.left, env
+        if type(e0) != type(True):
+            sys.exit("Type error")
+        if e0:
+            e1 = yield exp.right, env
+            if type(e1) != type(True):
+                sys.exit("Type error")
+            return e1
+        return False
+
+    def visit_or(self, exp, env):
+        e0 = yield exp.left, env
+        if type(e0) != type(True):
+            sys.exit("Type error")
+        if not e0:
+            e1 = yield exp.right, env
+            if type(e1) != type(True):
+                sys.exit("Type error")
+            return e1
+        return True
+
+    def visit_ifThenElse(self, exp, env):
+        cond = yield exp.cond, env
+        if type(cond) != type(True):
+            sys.exit("Type error")
+        if cond:
+            return (yield exp.e0, env)
+        else:
+            return (yield exp.e1, env)
+
+    def visit_app(self, exp, env):
+        # Applications to several arguments are evaluated as in visit_spine.
+        if type(exp.function) is App and self.uncurried_calls:
+            function_exp, actuals = app_spine(exp)
+        else:
+            function_exp, actuals = exp.function, [exp.actual]
+        function_value = yield function_exp, env
+        index, count = 0, len(actuals)
+        while index < count:
+            arity = saturated_arity(function_value)
+            taken = arity if 1 < arity <= count - index else 1
+            values = []
+            for actual in actuals[index:index + taken]:
+                values.append((yield actual, env))
+            index += taken
+            function_value = yield from self.invoke(function_value, values)
+        return function_value
+
+    def invoke(self, function_value, values):
+        """
+        Calls a function value on the values, within the traversal: this is
+        the counterpart of EvalVisitor.apply for visit_app, and subclasses
+        override it to observe the calls.
+        """
+        if isinstance(function_value, Primitive):
+            return function_value.call(self, *values)
+        body, new_env = self.enter(function_value, values)
+        return (yield body, new_env)
+
+    def apply(self, function_value, parameter_value):
+        """
+        Applies a function value outside of a traversal, as the primitives
+        that take functions do (see Builtins.apply).
+        """
+        if isinstance(function_value, Primitive):
+            return function_value.call(self, parameter_value)
+        return self.call_closure(function_value, [parameter_value])
+
+    def call_closure(self, function_value, values):
+        body, new_env = self.enter(function_value, values)
+        return run(self, body, new_env)
+
+def evaluate(exp, env):
+    """
+    Evaluates a program. A program that starts with declarations is compiled
+    into a Module first, which keeps its top-level names in slots (see
+    Module.py); other expressions are evaluated by evaluate_expression.
+    """
+    if type(exp) is Let or type(exp) is LetRec:
+        from Module import Module
+        return Module(exp).evaluate(env)
+    return evaluate_expression(exp, env)
+
+def evaluate_expression(exp, env):
+    """
+    Evaluates the expression. The recursive EvalVisitor is faster in CPython,
+    so it is tried first; if the tree, or the recursion of the program, is
+    deeper than the Python stack, the evaluation restarts on the iterative
+    engine. The interpreted code has no side effects, and neither have the
+    pure primitives, but host primitives may have: the evaluation is only
+    restarted if no primitive with effects was called before the stack
+    overflowed, and stops with an error otherwise.
+
+    Example:
+    >>> from Runtime import parse_source
+    >>> exp = parse_source('let fun size l = if null l then 0 else 1 + size (tl l) in size (tabulate 5000 abs) end')
+    >>> evaluate_expression(exp, {})
+    5000
+    >>> exp = parse_source('let fun sum n = if n = 0 then 0 else abs n + sum (n - 1) in sum 5000 end')
+    >>> evaluate_expression(exp, {})
+    12502500
+    >>> from Builtins import register, unregister
+    >>> _ = register('tick', 'int -> int', lambda n: n)
+    >>> evaluate_expression(parse_source('let fun sum n = if n = 0 then 0 else tick n + sum (n - 1) in sum 5000 end'), {})
+    Traceback (most recent call last):
+    ...
+    SystemExit: Stack overflow
+    >>> unregister('tick')
+    """
+    effects = Builtins.effects
+    try:
+        return exp.accept(EvalVisitor(), env)
+    except RecursionError:
+        if Builtins.effects != effects:
+            sys.exit("Stack overflow")
+        return run(IterativeEvalVisitor(), exp, env)
+
+def undefined_variables(exp, env):
+    """
+    Returns the variables that the expression uses without defining them
+    (see UseDefVisitor), with the iterative analysis if the tree is deeper
+    than the Python stack. env is the set of names defined outside of it.
+
+    Example:
+    >>> exp = Var('x')
+    >>> for i in range(100000):
+    ...     exp = Add(Num(i), exp)
+    >>> undefined_variables(exp, set())
+    {'x'}
+    """
+    try:
+        return exp.accept(UseDefVisitor(), env)
+    except RecursionError:
+        return run(IterativeUseDefVisitor(), exp, env)
+
+class IterativeUseDefVisitor(UseDefVisitor):
+    """
+    The analysis of UseDefVisitor, run by run().
+
+    Example:
+    >>> exp = Var('x')
+    >>> for i in range(10000):
+    ...     exp = Add(exp, Num(i))
+    >>> run(IterativeUseDefVisitor(), Let('y', Num(1), exp), set())
+    {'x'}
+    """
+    def _binary(self, exp, env):
+        left = yield exp.left, env
+        right = yield exp.right, env
+        return left | right
+
+    visit_eql = visit_add = visit_sub = visit_mul = visit_div = _binary
+    visit_leq = visit_lth = visit_mod = visit_and = visit_or = _binary
+    visit_cons = visit_append = _binary
+
+    def visit_neg(self, neg, env):
+        return (yield neg.exp, env)
+
+    def visit_not(self, not_node, env):
+        return (yield not_node.exp, env)
+
+    def visit_let(self, let, env):
+        undef_in_def = yield let.exp_def, env
+        env_for_body = env | {identifier_name(let.identifier)}
+        undef_in_body = yield let.exp_body, env_for_body
+        return undef_in_body | undef_in_def
+
+    def bind_let(self, let, env):
+        undef_in_def = yield let.exp_def, env
+        env_for_body = self.bind(env, identifier_name(let.identifier), None)
+        undef_in_body = yield let.exp_body, env_for_body
+        return undef_in_body | undef_in_def
+
+    def visit_ifThenElse(self, exp, env):
+        cond = yield exp.cond, env
+        e0 = yield exp.e0, env
+        e1 = yield exp.e1, env
+        return cond | e0 | e1
+
+    def visit_app(self, exp, env):
+        function = yield exp.function, env
+        actual = yield exp.actual, env
+        return function | actual
+
+    def visit_function(self, exp, env):
+        return (yield exp.body, env | {exp.formal.identifier})
+
+    def visit_rec_fun(self, exp, env):
+        return (yield exp.body, env | {exp.name.identifier, exp.formal.identifier})
+
+    def visit_letrec(self, exp, env):
+        env = env | {function.name.identifier for function in exp.functions}
+        undefined = yield exp.exp_body, env
+        for function in exp.functions:
+            undefined = undefined | (yield function, env)
+        return undefined
+
+class IterativeCtrGenVisitor(CtrGenVisitor):
+    """
+    The constraint generator of CtrGenVisitor, run by run(). The leaves are
+    inherited: they emit their constraints without visiting anything.
+
+    Example:
+    >>> from Unifier import infer
+    >>> exp = Num(0)
+    >>> for i in range(10000):
+    ...     exp = Let(f'v{i}', Num(i), Add(exp, Var(f'v{i}')))
+    >>> type_to_string(infer(exp))
+    'int'
+    """
+    def define(self, exp):
+        self.level += 1
+        TV_1 = self.fresh_type_var()
+        run(self, exp, TV_1)
+        self.level -= 1
+        return generalize(TV_1, self.level)
+
+    def _arithmetic(self, exp, env):
+        yield exp.left, type(1)
+        yield exp.right, type(1)
+        self.emit(env, type(1))
+
+    def _comparison(self, exp, env):
+        yield exp.left, type(1)
+        yield exp.right, type(1)
+        self.emit(env, type(True))
+
+    def _logical(self, exp, env):
+        yield exp.left, type(True)
+        yield exp.right, type(True)
+        self.emit(env, type(True))
+
+    visit_add = visit_sub = visit_mul = visit_div = visit_mod = _arithmetic
+    visit_leq = visit_lth = _comparison
+    visit_and = visit_or = _logical
+
+    def visit_cons(self, cons, env):
+        TV_1 = self.fresh_type_var()
+        yield cons.left, TV_1
+        yield cons.right, ListType(TV_1)
+        self.emit(env, ListType(TV_1))
+
+    def visit_append(self, exp, env):
+        TV_1 = ListType(self.fresh_type_var())
+        yield exp.left, TV_1
+        yield exp.right, TV_1
+        self.emit(env, TV_1)
+
+    def visit_neg(self, neg, env):
+        yield neg.exp, type(1)
+        self.emit(env, type(1))
+
+    def visit_not(self, not_node, env):
+        yield not_node.exp, type(True)
+        self.emit(env, type(True))
+
+    def visit_eql(self, eql, env):
+        TV_1 = self.fresh_type_var()
+        yield eql.left, TV_1
+        yield eql.right, TV_1
+        self.emit(env, type(True))
+
+    def visit_let(self, let, env):
+        self.level += 1
+        TV_1 = self.fresh_type_var()
+        yield let.exp_def, TV_1
+        self.level -= 1
+        name = identifier_name(let.identifier)
+        previous = self.enter_scope(name, generalize(TV_1, self.level))
+        yield let.exp_body, env
+        self.exit_scope(name, previous)
+
+    def visit_ifThenElse(self, exp, env):
+        yield exp.cond, type(True)
+        yield exp.e0, env
+        yield exp.e1, env
+
+    def visit_app(self, exp, env):
+        TV_1 = self.fresh_type_var()
+        yield exp.function, ArrowType(TV_1, env)
+        yield exp.actual, TV_1
+
+    def visit_function(self, exp, env):
+        TV_1 = self.fresh_type_var()
+        TV_2 = self.fresh_type_var()
+        previous = self.enter_scope(exp.formal.identifier, TV_1)
+        yield exp.body, TV_2
+        self.exit_scope(exp.formal.identifier, previous)
+        self.emit(env, ArrowType(TV_1, TV_2))
+
+    def visit_rec_fun(self, exp, env):
+        TV_1 = self.fresh_type_var()
+        TV_2 = self.fresh_type_var()
+        previous_name = self.enter_scope(exp.name.identifier, ArrowType(TV_1, TV_2))
+        previous_formal = self.enter_scope(exp.formal.identifier, TV_1)
+        yield exp.body, TV_2
+        self.exit_scope(exp.formal.identifier, previous_formal)
+        self.exit_scope(exp.name.identifier, previous_name)
+        self.emit(env, ArrowType(TV_1, TV_2))
+
+    def visit_letrec(self, exp, env):
+        types, previous = self.enter_group(exp.functions)
+        for function, type_ in zip(exp.functions, types):
+            yield function, type_
+        self.generalize_group(exp.functions, types)
+        yield exp.exp_body, env
+        self.exit_group(exp.functions, previous)
+
+class IterativeAnalysisVisitor(AnalysisVisitor, IterativeCtrGenVisitor):
+    """The single-pass analysis of AnalysisVisitor, run by run()."""
@@ -0,0 +1,224 @@
+"""
+Types of the SML subset. The base types are the Python classes of the values
+(type(1) and type(True)), as in the rest of the interpreter. Function types
+are ArrowType objects, list types are ListType objects, and unknown types
+are TypeVariable objects, which are mutable: unifying a variable with a type
+makes the variable an instance of that type, so no substitution maps are
+ever built.
+
+Each type variable has a level: the number of let definitions that enclose
+the point where it was created. When a let definition has been typed, the
+variables whose level is deeper than the current one are not reachable from
+the enclosing scope, and can be generalized (let-polymorphism). Generalized
+variables have the level GENERIC, and are copied by instantiate() at each use.
+"""
+import sys
+
+GENERIC = float("inf")
+
+class TypeVariable:
+    def __init__(self, level):
+        self.instance = None
+        self.level = level
+
+    def __repr__(self):
+        return type_to_string(self)
+
+class ArrowType:
+    """
+    The type of the functions from domain to codomain.
+
+    Example:
+    >>> ArrowType(type(1), ArrowType(type(1), type(True)))
+    int -> int -> bool
+    """
+    def __init__(self, domain, codomain):
+        self.domain = domain
+        self.codomain = codomain
+
+    def __repr__(self):
+        return type_to_string(self)
+
+class ListType:
+    """
+    The type of the lists whose elements have type element.
+
+    Example:
+    >>> ListType(ArrowType(type(1), type(1)))
+    (int -> int) list
+    """
+    def __init__(self, element):
+        self.element = element
+
+    def __repr__(self):
+        return type_to_string(self)
+
+def _parts(t):
+    """Returns the types that a compound type is made of."""
+    if isinstance(t, ArrowType):
+        return (t.domain, t.codomain)
+    if isinstance(t, ListType):
+        return (t.element,)
+    return ()
+
+def prune(t):
+    """
+    Returns the representative of a type: the type itself, or, for instantiated
+    variables, the type that they stand for. Chains of variables are compressed,
+    so that later lookups are done in constant time.
+    """
+    if not isinstance(t, TypeVariable) or t.instance is None:
+        return t
+    root = t.instance
+    while isinstance(root, TypeVariable) and root.instance is not None:
+        root = root.instance
+    while t.instance is not root:
+        t.instance, t = root, t.instance
+    return root
+
+def _occurs_adjust(var, t):
+    """
+    Checks that var does not occur in t, and lowers the level of the variables
+    of t to the level of var, as t is about to become reachable from var.
+    Shared sub-types are visited only once.
+    """
+    stack, seen = [t], set()
+    while stack:
+        t = prune(stack.pop())
+        if id(t) in seen:
+            continue
+        seen.add(id(t))
+        if t is var:
+            sys.exit("Type Error")
+        if isinstance(t, TypeVariable):
+            t.level = min(t.level, var.level)
+        else:
+            stack.extend(_parts(t))
+
+def unify_types(t0, t1):
+    """
+    Makes the two types equal, instantiating type variables. Stops the program
+    with 'Type Error' if that is not possible.
+
+    Example:
+    >>> a, b = TypeVariable(0), TypeVariable(0)
+    >>> unify_types(ArrowType(a, type(True)), ArrowType(type(1), b))
+    >>> a, b
+    (int, bool)
+    >>> c = TypeVariable(0)
+    >>> unify_types(ListType(c), ListType(ListType(type(True))))
+    >>> c
+    bool list
+    """
+    work = [(t0, t1)]
+    while work:
+        t0, t1 = work.pop()
+        t0, t1 = prune(t0), prune(t1)
+        if t0 is t1:
+            continue
+        if isinstance(t1, TypeVariable) and not isinstance(t0, TypeVariable):
+            t0, t1 = t1, t0
+        if isinstance(t0, TypeVariable):
+            if isinstance(t1, TypeVariable):
+                t1.level = min(t0.level, t1.level)
+            elif isinstance(t1, (ArrowType, ListType)):
+                _occurs_adjust(t0, t1)
+            t0.instance = t1
+        elif isinstance(t0, ArrowType) and isinstance(t1, ArrowType):
+            work.append((t0.codomain, t1.codomain))
+            work.append((t0.domain, t1.domain))
+        elif isinstance(t0, ListType) and isinstance(t1, ListType):
+            work.append((t0.element, t1.element))
+        else:
+            sys.exit("Type Error")
+
+def generalize(t, level):
+    """
+    Turns the variables of t that are deeper than level into generic ones.
+    """
+    stack = [t]
+    while stack:
+        part = prune(stack.pop())
+        if isinstance(part, TypeVariable):
+            if part.level > level:
+                part.level = GENERIC
+        else:
+            stack.extend(_parts(part))
+    return t
+
+def is_closed(t):
+    """
+    Returns True if every variable of t is generic. Closed types are never
+    changed by unification, so they can be shared by different checks.
+
+    Example:
+    >>> is_closed(ArrowType(TypeVariable(GENERIC), type(1))), is_closed(TypeVariable(0))
+    (True, False)
+    """
+    stack = [t]
+    while stack:
+        t = prune(stack.pop())
+        if isinstance(t, TypeVariable) and t.level != GENERIC:
+            return False
+        stack.extend(_parts(t))
+    return True
+
+def instantiate(t, level):
+    """
+    Returns a copy of t where every generic variable is replaced by a fresh
+    variable of the given level. Types without generic variables are shared.
+
+    Example:
+    >>> a = TypeVariable(GENERIC)
+    >>> t = instantiate(ArrowType(a, a), 0)
+    >>> t.domain is t.codomain, t.domain is a
+    (True, False)
+    """
+    copies = {}
+    def copy(t):
+        t = prune(t)
+        if isinstance(t, TypeVariable):
+            if t.level != GENERIC:
+                return t
+            if t not in copies:
+                copies[t] = TypeVariable(level)
+            return copies[t]
+        if isinstance(t, ArrowType):
+            domain, codomain = copy(t.domain), copy(t.codomain)
+            if domain is t.domain and codomain is t.codomain:
+                return t
+            return ArrowType(domain, codomain)
+        if isinstance(t, ListType):
+            element = copy(t.element)
+            return t if element is t.element else ListType(element)
+        return t
+    return copy(t)
+
+def type_to_string(t, names=None):
+    """
+    Formats a type in SML notation. Type variables are named 'a, 'b, ... in
+    the order in which they appear.
+
+    Example:
+    >>> a, b = TypeVariable(0), TypeVariable(0)
+    >>> type_to_string(ArrowType(ArrowType(a, b), ArrowType(a, b)))
+    "('a -> 'b) -> 'a -> 'b"
+    """
+    names = {} if names is None else names
+    t = prune(t)
+    if isinstance(t, TypeVariable):
+        if t not in names:
+            index = len(names)
+            names[t] = "'" + chr(ord('a') + index % 26) + (str(index // 26) if index >= 26 else "")
+        return names[t]
+    if isinstance(t, ArrowType):
+        domain = type_to_string(t.domain, names)
+        if isinstance(prune(t.domain), ArrowType):
+            domain = f"({domain})"
+        return f"{domain} -> {type_to_string(t.codomain, names)}"
+    if isinstance(t, ListType):
+        element = type_to_string(t.element, names)
+        if isinstance(prune(t.element), ArrowType):
+            element = f"({element})"
+        return f"{element} list"
+    return getattr(t, "sml_name", t.__name__)
@@ -1,22 +1,80 @@
 from Expression import *
 from Visitor import *
+from Types import *
+from Traversal import IterativeCtrGenVisitor, IterativeUseDefVisitor, run
 import sys
 
+class UnionFind:
+    """
+    Disjoint sets of type names, with path compression and union by rank.
+
+    Example:
+        >>> uf = UnionFind()
+        >>> uf.union('a', 'b')
+        >>> uf.union('c', type(1))
+        >>> uf.find('a') == uf.find('b'), uf.find('a') == uf.find('c')
+        (True, False)
+    """
+    def __init__(self):
+        self.parent = {}
+        self.rank = {}
+
+    def add(self, x):
+        if x not in self.parent:
+            self.parent[x] = x
+            self.rank[x] = 0
+
+    def find(self, x):
+        self.add(x)
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, x, y):
+        rx, ry = self.find(x), self.find(y)
+        if rx == ry:
+            return
+        if self.rank[rx] < self.rank[ry]:
+            rx, ry = ry, rx
+        self.parent[ry] = rx
+        if self.rank[rx] == self.rank[ry]:
+            self.rank[rx] += 1
+
+    def classes(self):
+        """Returns a dictionary that maps each root to the set of its class."""
+        classes = {}
+        for x in self.parent:
+            classes.setdefault(self.find(x), set()).add(x)
+        return classes
+
 def unify(constraints, sets):
-    
-    if not constraints:
-        return sets
-    else:
-        t0, t1 = constraints[0]
-        rest = constraints[1:]
-        if t0 != t1:
-            s0 = sets.setdefault(t0, set())
-            s1 = sets.setdefault(t1, set())
-            new_set = s0 | s1 | {t0, t1}
-            for type_name in new_set:
-                sets[type_name] = new_set
+    """
+    Merges the type names that the constraints equate. Returns sets, where
+    each type name is mapped to the set of every type name in its class; the
+    names of a class share the same set. The sets that are given are merged
+    as well.
 
-        return unify(rest, sets)
+    Example:
+        >>> sets = unify([('a', 'b'), ('b', type(1)), ('c', 'c')], {})
+        >>> sets['a'] is sets['b'], sorted(map(str, sets['a']))
+        (True, ["<class 'int'>", 'a', 'b'])
+        >>> 'c' in sets
+        False
+    """
+    uf = UnionFind()
+    for key, my_set in sets.items():
+        for element in my_set:
+            uf.union(key, element)
+    for t0, t1 in constraints:
+        if t0 != t1:
+            uf.union(t0, t1)
+    for my_set in uf.classes().values():
+        for type_name in my_set:
+            sets[type_name] = my_set
+    return sets
 
 
 def name_sets(sets):
@@ -41,8 +99,14 @@ def name_sets(sets):
         [<class 'int'>, <class 'bool'>]
     """
     canonical_set = dict()
+    # Type names of the same class share one set, so each set is scanned once.
+    set_types = dict()
     for key, my_set in sets.items():
 
+        if id(my_set) in set_types:
+            canonical_set[key] = set_types[id(my_set)]
+            continue
+
         set_type = None
         for element in my_set:
 
@@ -56,16 +120,15 @@ def name_sets(sets):
         if set_type is None:
             sys.exit("Type Error") 
 
+        set_types[id(my_set)] = set_type
         canonical_set[key] = set_type
 
     return canonical_set
 
 def infer_types(expression):
     """
-    This method maps all the program variables to type names. We have
-    implemented this method for you. This implementation might help you to
-    understand how the other two methods, unify and name_sets are meant to
-    work.
+    This method maps all the program variables to their types. Names bound
+    to polymorphic values keep their type variables: see Types.type_to_string.
 
     Example:
         >>> e = Let('v', Num(42), Var('v'))
@@ -85,9 +148,140 @@ def infer_types(expression):
         >>> [type_names['v'], type_names['w'], type_names['y']]
         [<class 'int'>, <class 'bool'>, <class 'int'>]
     """
-    ev = CtrGenVisitor()
-    constraints = list(expression.accept(ev, ev.fresh_type_var()))
-    type_sets = unify(constraints, {})
-    return name_sets(type_sets)
+    try:
+        ev = CtrGenVisitor()
+        expression.accept(ev, ev.fresh_type_var())
+    except RecursionError:
+        ev = IterativeCtrGenVisitor()
+        run(ev, expression, ev.fresh_type_var())
+    return {name: prune(t) for name, t in ev.bindings.items()}
+
+def infer(expression, scope=None):
+    """
+    Returns the type of the expression. The scope maps the names that the
+    expression may use without defining them to their types.
+
+    Example:
+        >>> from Runtime import parse_source
+        >>> type_to_string(infer(parse_source('let fun fact n = if n <= 1 then 1 else n * fact (n - 1) in fact end')))
+        'int -> int'
+        >>> type_to_string(infer(Var('f'), {'f': ArrowType(type(1), type(True))}))
+        'int -> bool'
+    """
+    try:
+        ev = CtrGenVisitor(scope)
+        type_ = ev.fresh_type_var()
+        expression.accept(ev, type_)
+    except RecursionError:
+        ev = IterativeCtrGenVisitor(scope)
+        type_ = ev.fresh_type_var()
+        run(ev, expression, type_)
+    return prune(type_)
+
+def infer_declarations(decls, scope=None, cache=None):
+    """
+    Types a sequence of top-level (name, expression) declarations, such as
+    the ones of a prelude, and returns the scope that they define. With a
+    TypeCache, declarations already typed in the same context are not typed
+    again.
+
+    Example:
+        >>> from Lexer import Lexer
+        >>> from Parser import Parser
+        >>> decls = Parser(Lexer('fun twice f = fn x => f (f x) val one = 1').tokens()).parse_declarations()
+        >>> scope = infer_declarations(decls)
+        >>> type_to_string(scope['twice']), type_to_string(scope['one'])
+        ("('a -> 'a) -> 'a -> 'a", 'int')
+    """
+    ev = IterativeCtrGenVisitor(scope)
+    for name, exp in decls:
+        if cache is None:
+            ev.scope[identifier_name(name)] = ev.define(exp)
+        else:
+            ev.scope[identifier_name(name)] = cache.define(ev, exp)
+    return ev.scope
+
+class FreeVariables(IterativeUseDefVisitor):
+    """
+    The analysis of IterativeUseDefVisitor, except that builtins are not
+    taken as defined: the result has every name that the expression uses
+    without binding it, which may be a builtin or a definition that shadows
+    it.
+
+    Example:
+        >>> sorted(run(FreeVariables(), App(App(Var('max'), Var('x')), Num(1)), set()))
+        ['max', 'x']
+    """
+    def visit_var(self, var, env):
+        if var.identifier in env:
+            return set()
+        return {var.identifier}
+
+class TypeCache:
+    """
+    Types of top-level declarations, indexed by the structural hash of the
+    declaration and by the types of the free variables that it uses. When a
+    file is checked again after an edit, only the declarations that changed,
+    and the ones whose free variables changed type, are typed again.
+
+    Example:
+        >>> from Lexer import Lexer
+        >>> from Parser import Parser
+        >>> def declarations(source):
+        ...     return Parser(Lexer(source).tokens()).parse_declarations()
+        >>> cache = TypeCache()
+        >>> _ = infer_declarations(declarations('val a = 1 fun f x = x + a val g = f'), cache=cache)
+        >>> cache.hits, cache.misses
+        (0, 3)
+        >>> scope = infer_declarations(declarations('val a = 2 fun f x = x + a val g = f'), cache=cache)
+        >>> cache.hits, cache.misses, type_to_string(scope['g'])
+        (2, 4, 'int -> int')
+        >>> scope = infer_declarations(declarations('val a = true fun f x = x + a'), cache=cache)
+        Traceback (most recent call last):
+        ...
+        SystemExit: Type Error
+
+    A definition that shadows a builtin changes the key of the declarations
+    that use it:
+        >>> type_to_string(infer_declarations(declarations('val m = max 1'), cache=cache)['m'])
+        'int -> int'
+        >>> scope = infer_declarations(declarations('val max = fn b => b val m = max 1'), cache=cache)
+        >>> type_to_string(scope['m'])
+        'int'
+        >>> scope = infer_declarations(declarations('val max = true val m = max 1'), cache=cache)
+        Traceback (most recent call last):
+        ...
+        SystemExit: Type Error
+    """
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
 
+    @staticmethod
+    def key(exp, scope):
+        # The type of a free name comes from the scope, whose definitions
+        # shadow the builtins, and only then from the builtins.
+        free = sorted(run(FreeVariables(), exp, set()))
+        return (structural_hash(exp),
+                tuple((name, type_to_string(scope[name]) if name in scope else
+                       type_to_string(BUILTINS[name].type) if name in BUILTINS else None)
+                      for name in free))
 
+    def define(self, visitor, exp):
+        """Returns the generalized type of exp, typed by visitor on a miss."""
+        key = self.key(exp, visitor.scope)
+        type_ = self.entries.pop(key, None)
+        if type_ is not None:
+            self.hits += 1
+            self.entries[key] = type_
+            return type_
+        self.misses += 1
+        type_ = visitor.define(exp)
+        if is_closed(type_) and all(is_closed(visitor.scope[name])
+                                    for name, _ in key[1] if name in visitor.scope):
+            if len(self.entries) >= self.max_entries:
+                del self.entries[next(iter(self.entries))]
+            self.entries[key] = type_
+        return type_
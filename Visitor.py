@@ -1,21 +1,25 @@
 import sys
 from abc import ABC, abstractmethod
 from Expression import *
+from Types import *
+from Builtins import BUILTINS, Primitive, Cell, NIL, append
 
 class Function():
-    def __init__(self, formal, body, env):
+    def __init__(self, formal, body, env, arity=1):
 
         self.formal = formal
         self.body = body
         self.env = env
+        # Number of parameters that a call can bind at once (see Fn).
+        self.arity = arity
 
     def __str__(self):
         return f"Fn({self.formal.identifier})"
 
 class RecFunction(Function):
 
-    def __init__(self, name, formal, body, env):
-        super().__init__(formal, body, env)
+    def __init__(self, name, formal, body, env, arity=1):
+        super().__init__(formal, body, env, arity)
         self.name = name
 
     def __str__(self):
@@ -90,6 +94,26 @@ class Visitor(ABC):
     @abstractmethod
     def visit_mod(self, exp, env):
         pass
+    @abstractmethod
+    def visit_nil(self, nil, env):
+        pass
+    @abstractmethod
+    def visit_cons(self, cons, env):
+        pass
+    @abstractmethod
+    def visit_append(self, exp, env):
+        pass
+
+    @abstractmethod
+    def visit_letrec(self, exp, env):
+        pass
+
+    def visit_global(self, var, env):
+        """
+        Global nodes only appear in code compiled by Module.py; visitors
+        other than the evaluators treat them as the names that they are.
+        """
+        return self.visit_var(var, env)
 
 class EvalVisitor(Visitor):
     """
@@ -114,6 +138,8 @@ class EvalVisitor(Visitor):
     def visit_var(self, var, env):
         if var.identifier in env:
             return env[var.identifier]
+        elif var.identifier in BUILTINS:
+            return BUILTINS[var.identifier]
         else:
             raise sys.exit("Def error") 
 
@@ -205,6 +231,23 @@ class EvalVisitor(Visitor):
         new_env = env.copy()
         new_env[let.identifier.identifier] = definition_value
         return let.exp_body.accept(self, new_env) 
+
+    def bind(self, env, name, value):
+        """
+        Returns a copy of the environment where name is bound to value. The
+        lets of visit_let bind inline, without calling this method; the
+        subclasses that observe bindings (see Tracing.py) visit lets with
+        bind_let instead, and override this method.
+        """
+        new_env = env.copy()
+        new_env[name] = value
+        return new_env
+
+    def bind_let(self, let, env):
+        """Visits a let as visit_let does, binding its name with bind."""
+        definition_value = let.exp_def.accept(self, env)
+        new_env = self.bind(env, let.identifier.identifier, definition_value)
+        return let.exp_body.accept(self, new_env)
     
     def visit_and(self, exp, env):
         e0 = exp.left.accept(self, env)
@@ -243,19 +286,101 @@ class EvalVisitor(Visitor):
 
     #Recebe o env de fora
     def visit_function(self, exp, env):
-        return Function(exp.formal, exp.body, env)
+        return Function(exp.formal, exp.body, env, exp.arity)
 
     def visit_rec_fun(self, exp, env):
-        return RecFunction(exp.name, exp.formal, exp.body, env)
-    
+        return RecFunction(exp.name, exp.formal, exp.body, env, exp.arity)
+
+    # Whether applications to several arguments bind them in a single call.
+    # Visitors that observe each call derive from CurriedCalls.
+    uncurried_calls = True
+
     def visit_app(self, exp, env):
+        if type(exp.function) is App and self.uncurried_calls:
+            return self.visit_spine(exp, env)
 
         function_value = exp.function.accept(self, env)
-        if not isinstance(function_value, Function):
+        if not isinstance(function_value, (Function, Primitive)):
             sys.exit("Type Error") 
 
         parameter_value = exp.actual.accept(self, env)
-
+        return self.apply(function_value, parameter_value)
+
+    def visit_spine(self, exp, env):
+        """
+        Evaluates an application to several arguments, 'f a1 ... ak'. When
+        the function takes n > 1 parameters and at least n arguments are
+        left, the n arguments are bound in a single call, without creating
+        the closures of the partial applications; otherwise, the arguments
+        are applied one at a time.
+
+        Example:
+        >>> from Runtime import parse_source
+        >>> exp = parse_source('let fun power b e = if e = 0 then 1 else b * power b (e - 1) in power 2 10 end')
+        >>> exp.exp_def.arity, exp.accept(EvalVisitor(), {})
+        (2, 1024)
+        """
+        actuals = []
+        while type(exp) is App:
+            actuals.append(exp.actual)
+            exp = exp.function
+        # The arguments are popped from the end of the list, in source order.
+        function_value = exp.accept(self, env)
+        while actuals:
+            arity = saturated_arity(function_value)
+            if arity < 2 or arity > len(actuals):
+                function_value = self.apply(function_value, actuals.pop().accept(self, env))
+            elif isinstance(function_value, Primitive):
+                values = [actuals.pop().accept(self, env) for _ in range(arity)]
+                function_value = function_value.call(self, *values)
+            else:
+                new_env = function_value.env.copy()
+                new_env[function_value.formal.identifier] = actuals.pop().accept(self, env)
+                if isinstance(function_value, RecFunction):
+                    new_env[function_value.name.identifier] = function_value
+                body = function_value.body
+                for _ in range(arity - 1):
+                    new_env[body.formal.identifier] = actuals.pop().accept(self, env)
+                    body = body.body
+                function_value = body.accept(self, new_env)
+        return function_value
+
+    @staticmethod
+    def enter(function_value, values):
+        """
+        Returns the expression that a call of a closure to the values
+        evaluates, and the environment where it is evaluated: the
+        environment of the closure is copied once, and extended with all the
+        parameters, as applying the closure to one value at a time would do.
+        """
+        new_env = function_value.env.copy()
+        new_env[function_value.formal.identifier] = values[0]
+        if isinstance(function_value, RecFunction):
+            new_env[function_value.name.identifier] = function_value
+        body = function_value.body
+        for value in values[1:]:
+            new_env[body.formal.identifier] = value
+            body = body.body
+        return body, new_env
+
+    def call_closure(self, function_value, values):
+        """
+        Applies a closure to as many values as its arity, in a single call
+        (see enter), as the primitives that take functions of several
+        parameters do.
+        """
+        body, new_env = self.enter(function_value, values)
+        return body.accept(self, new_env)
+
+    def apply(self, function_value, parameter_value):
+        """
+        Evaluates the body of a function value, in its closure environment,
+        extended with the actual parameter (and, for recursive functions,
+        with the function itself). Subclasses override this method to observe
+        function calls.
+        """
+        if isinstance(function_value, Primitive):
+            return function_value.call(self, parameter_value)
         new_env = function_value.env.copy()
         new_env[function_value.formal.identifier] = parameter_value 
 
@@ -272,6 +397,50 @@ class EvalVisitor(Visitor):
         else:
             sys.exit("Type error")
 
+    def visit_nil(self, nil, env):
+        return NIL
+
+    def visit_cons(self, cons, env):
+        head = cons.left.accept(self, env)
+        tail = cons.right.accept(self, env)
+        if type(tail) != Cell:
+            sys.exit("Type error")
+        return Cell(head, tail)
+
+    def visit_append(self, exp, env):
+        left = exp.left.accept(self, env)
+        right = exp.right.accept(self, env)
+        return append(left, right)
+
+    def visit_letrec(self, exp, env):
+        return exp.exp_body.accept(self, self.bind_group(env, exp.functions))
+
+    @staticmethod
+    def bind_group(env, functions):
+        """
+        Returns a copy of the environment extended with the closures of a
+        group of mutually recursive functions. They all share the new
+        environment, which is completed after they are created.
+        """
+        new_env = env.copy()
+        for function in functions:
+            new_env[function.name.identifier] = RecFunction(
+                function.name, function.formal, function.body, new_env, function.arity)
+        return new_env
+
+    def visit_global(self, var, env):
+        return var.slots[var.slot]
+
+class CurriedCalls:
+    """
+    Mixin of the evaluators that observe every call, such as the profilers
+    and the traced visitors: it makes them apply functions one argument at a
+    time, so that each application of an argument is a call to apply (or, in
+    the iterative evaluator, to invoke), as in the source program.
+    """
+    __slots__ = ()
+    uncurried_calls = False
+
 class UseDefVisitor(Visitor):
     """
     The UseDefVisitor class reports the use of undefined variables. It takes
@@ -302,9 +471,8 @@ class UseDefVisitor(Visitor):
     >>> len(e0.accept(ev, set()))
     0
     """
-    # TODO: Implement all the 13 methods of the visitor.
     def visit_var(self, var, env):
-        if var.identifier in env: 
+        if var.identifier in env or var.identifier in BUILTINS:
             return set() 
         else:
             return {var.identifier} 
@@ -344,10 +512,24 @@ class UseDefVisitor(Visitor):
 
     def visit_let(self, let, env):
         undef_in_def = let.exp_def.accept(self, env)
-        env_for_body = env | {let.identifier} 
+        env_for_body = env | {identifier_name(let.identifier)}
         undef_in_body = let.exp_body.accept(self, env_for_body) 
         return undef_in_body |  undef_in_def 
 
+    def bind(self, env, name, value):
+        """
+        Returns the set of defined names extended with name. The value is not
+        known during this analysis, so it is always None. As in EvalVisitor,
+        only bind_let calls this method.
+        """
+        return env | {name}
+
+    def bind_let(self, let, env):
+        """Visits a let as visit_let does, binding its name with bind."""
+        undef_in_def = let.exp_def.accept(self, env)
+        env_for_body = self.bind(env, identifier_name(let.identifier), None)
+        return let.exp_body.accept(self, env_for_body) | undef_in_def
+
     def visit_and(self, exp, env):
         return exp.left.accept(self, env) | exp.right.accept(self, env)
 
@@ -358,24 +540,41 @@ class UseDefVisitor(Visitor):
         return exp.cond.accept(self, env) | exp.e0.accept(self, env) | exp.e1.accept(self, env)
     
     def visit_app(self, exp, env):
-        #IMPLEMENTAR DEPOIS
-        pass 
+        return exp.function.accept(self, env) | exp.actual.accept(self, env)
 
     def visit_function(self, exp, env):
-        #IMPLEMENTAR DEPOIS
-        pass
+        return exp.body.accept(self, env | {exp.formal.identifier})
 
     def visit_rec_fun(self, exp, env):
-        pass
+        return exp.body.accept(self, env | {exp.name.identifier, exp.formal.identifier})
 
     def visit_mod(self, exp, env):
-        pass
+        return exp.left.accept(self, env) | exp.right.accept(self, env)
+
+    def visit_nil(self, nil, env):
+        return set()
+
+    def visit_cons(self, cons, env):
+        return cons.left.accept(self, env) | cons.right.accept(self, env)
+
+    def visit_append(self, exp, env):
+        return exp.left.accept(self, env) | exp.right.accept(self, env)
+
+    def visit_letrec(self, exp, env):
+        env = env | {function.name.identifier for function in exp.functions}
+        undefined = exp.exp_body.accept(self, env)
+        for function in exp.functions:
+            undefined = undefined | function.accept(self, env)
+        return undefined
 
 def safe_eval(exp):
     """
     This method applies one simple semantic analysis onto an expression, before
     evaluating it: it checks if the expression contains free variables, there
-    is, variables used without being defined.
+    is, variables used without being defined. The check is done by analyze(),
+    which also types the expression in the same traversal. A type error is
+    reported, but does not stop the evaluation, since the expression may
+    still run without errors.
 
     Example:
     >>> e0 = Let('v', Add(Num(40), Num(2)), Mul(Var('v'), Var('v')))
@@ -387,118 +586,339 @@ def safe_eval(exp):
     >>> e1 = Lth(e0, Var('x'))
     >>> safe_eval(e1)
     Error: expression contains undefined variables.
+
+    >>> safe_eval(IfThenElse(Bln(True), Num(1), Bln(False)))
+    Warning: Type Error
+    Value is 1
     """
-    ev1 = UseDefVisitor()
-    if len(exp.accept(ev1, set())) > 0:
+    from Traversal import evaluate
+    analysis = analyze(exp)
+    if len(analysis.undefined) > 0:
         print("Error: expression contains undefined variables.")
     else:
-        ev2 = EvalVisitor()
-        value = exp.accept(ev2, {})
+        if analysis.type_error is not None:
+            print(f"Warning: {analysis.type_error}")
+        value = evaluate(exp, {})
         print(f"Value is {value}")
 
 
 class CtrGenVisitor(Visitor):
+    """
+    The CtrGenVisitor class generates the type constraints of an expression.
+    The inherited attribute is the type of the expression being visited, and
+    each constraint, a pair of types that must be equal, is handed to emit()
+    in the order of the traversal, which solves it right away. Names are
+    typed in a scope that maps them to their types. Once the definition of a
+    let has been visited, the variables that only it uses are generalized:
+    each use of the name gets a fresh copy of them.
+
+    Example:
+    >>> from Runtime import parse_source
+    >>> from Unifier import infer
+    >>> infer(parse_source('fn f => fn x => f (f x)'))
+    ('a -> 'a) -> 'a -> 'a
+    >>> type_to_string(infer(parse_source('let val id = fn x => x in if id true then id 1 else 2 end')))
+    'int'
+    >>> infer(parse_source('fn x => x x'))
+    Traceback (most recent call last):
+    ...
+    SystemExit: Type Error
+
+    >>> trace = []
+    >>> parse_source('1 < 2').accept(CtrGenVisitor(trace=trace), type(True))
+    >>> [(type_to_string(t0), type_to_string(t1)) for t0, t1 in trace]
+    [('int', 'int'), ('int', 'int'), ('bool', 'bool')]
+    """
 
     #No caso dessa classe, o env é o TYPE_VAR, ou seja o tipo de exp.
-    def __init__(self):
+    def __init__(self, scope=None, trace=None):
         self.fresh_type_counter = 0 
+        self.level = 0
+        self.scope = {} if scope is None else dict(scope)
+        # Types of every name bound in the program, by name.
+        self.bindings = {}
+        # If given, a list that receives every constraint, in emission order.
+        self.trace = trace
+
+    def emit(self, t0, t1):
+        """
+        Solves the constraint t0 = t1 as soon as it is produced, so that no
+        set of constraints is ever built: the memory used stays bounded by
+        the type variables that are still reachable.
+        """
+        if self.trace is not None:
+            self.trace.append((t0, t1))
+        unify_types(t0, t1)
 
     def fresh_type_var(self):
         self.fresh_type_counter += 1
-        variable = f"TV_{self.fresh_type_counter}"
-        return variable
+        return TypeVariable(self.level)
+
+    def define(self, exp):
+        """
+        Returns the generalized type of an expression bound to a name: it is
+        typed one level deeper than the current one, and the variables left
+        at that level become generic.
+        """
+        self.level += 1
+        TV_1 = self.fresh_type_var()
+        exp.accept(self, TV_1)
+        self.level -= 1
+        return generalize(TV_1, self.level)
+
+    def enter_scope(self, name, type_):
+        previous = self.scope.get(name)
+        self.scope[name] = type_
+        self.bindings[name] = type_
+        return previous
+
+    def exit_scope(self, name, previous):
+        if previous is None:
+            del self.scope[name]
+        else:
+            self.scope[name] = previous
 
     def visit_var(self, var, env):
-       return {(env, var.identifier)}
+        if var.identifier in self.scope:
+            type_ = self.scope[var.identifier]
+        elif var.identifier in BUILTINS:
+            type_ = BUILTINS[var.identifier].type
+        else:
+            sys.exit("Def error")
+        self.emit(env, instantiate(type_, self.level))
 
     def visit_num(self, num, env):
-       return {(env, type(1))} 
+        self.emit(env, type(1))
 
     def visit_sub(self, sub, env):
- 
-        K0 = sub.left.accept(self, type(1))
-        K1 = sub.right.accept(self, type(1))
-        return K0 | K1 | {(env, type(1))}       
+        sub.left.accept(self, type(1))
+        sub.right.accept(self, type(1))
+        self.emit(env, type(1))
 
     def visit_add(self, add, env):
- 
-        K0 = add.left.accept(self, type(1))
-        K1 = add.right.accept(self, type(1))
-        return K0 | K1 | {(env, type(1))}       
+        add.left.accept(self, type(1))
+        add.right.accept(self, type(1))
+        self.emit(env, type(1))
 
     def visit_div(self, div, env):
- 
-        K0 = div.left.accept(self, type(1))
-        K1 = div.right.accept(self, type(1))
-        return K0 | K1 | {(env, type(1))}       
+        div.left.accept(self, type(1))
+        div.right.accept(self, type(1))
+        self.emit(env, type(1))
 
     def visit_mul(self, mul, env):
+        mul.left.accept(self, type(1))
+        mul.right.accept(self, type(1))
+        self.emit(env, type(1))
 
-        K0 = mul.left.accept(self, type(1))
-        K1 = mul.right.accept(self, type(1))
-        return K0 | K1 | {(env, type(1))}
-        
     def visit_let(self, let, env):
-
-        K0 = let.exp_def.accept(self, let.identifier)
-        TV_2 = self.fresh_type_var()
-        K1 = let.exp_body.accept(self, TV_2)
-        return K0 | K1 | {(env, TV_2)}
+        name = identifier_name(let.identifier)
+        previous = self.enter_scope(name, self.define(let.exp_def))
+        let.exp_body.accept(self, env)
+        self.exit_scope(name, previous)
 
     def visit_ifThenElse(self, exp, env):
-        K0 = exp.cond.accept(self, type(True))
-        K1 = exp.e0.accept(self, env)
-        K2 = exp.e1.accept(self, env)
-        return K0 | K1 | K2
+        exp.cond.accept(self, type(True))
+        exp.e0.accept(self, env)
+        exp.e1.accept(self, env)
 
     def visit_or(self, exp, env):
-        K0 = exp.left.accept(self, type(True)) 
-        K1 = exp.right.accept(self, type(True))
-        return K0 | K1 | {(env, type(True))}
+        exp.left.accept(self, type(True))
+        exp.right.accept(self, type(True))
+        self.emit(env, type(True))
 
     def visit_bln(self, bln, env):
-        return {(env, type(True))} 
+        self.emit(env, type(True))
 
     def visit_neg(self, neg, env):
-        K0 = neg.exp.accept(self, type(1))
-        return K0 | {(env, type(1))} 
+        neg.exp.accept(self, type(1))
+        self.emit(env, type(1))
 
     def visit_not(self, not_node, env):
-        K0 = not_node.exp.accept(self, type(True)) 
-        return K0 | {(env, type(True))}
+        not_node.exp.accept(self, type(True))
+        self.emit(env, type(True))
 
     def visit_and(self, exp, env):
-        K0 = exp.left.accept(self, type(True))
-        K1 = exp.right.accept(self, type(True))
-        return K0 | K1 | {(env, type(True))}
+        exp.left.accept(self, type(True))
+        exp.right.accept(self, type(True))
+        self.emit(env, type(True))
 
     def visit_leq(self, leq, env):
-        K0 = leq.left.accept(self, type(1))
-        K1 = leq.right.accept(self, type(1))
-        return K0 | K1 | {(env, type(True))}
+        leq.left.accept(self, type(1))
+        leq.right.accept(self, type(1))
+        self.emit(env, type(True))
 
     def visit_lth(self, lth, env):
-        K0 = lth.left.accept(self, type(1))
-        K1 = lth.right.accept(self, type(1))
-        return K0 | K1 | {(env, type(True))}
+        lth.left.accept(self, type(1))
+        lth.right.accept(self, type(1))
+        self.emit(env, type(True))
 
     def visit_eql(self, eql, env):
         TV_1 = self.fresh_type_var()
-        K0 = eql.left.accept(self, TV_1)
-        K1 = eql.right.accept(self, TV_1) 
-        return K0 | K1 | {(env, type(True))}
+        eql.left.accept(self, TV_1)
+        eql.right.accept(self, TV_1)
+        self.emit(env, type(True))
 
     def visit_app(self, exp, env):
-        pass
-        #IMPLEMENTAR ISSO AQUI DEPOIS
+        TV_1 = self.fresh_type_var()
+        exp.function.accept(self, ArrowType(TV_1, env))
+        exp.actual.accept(self, TV_1)
 
     def visit_function(self, exp, env):
-        pass
-        #IMPLEMENTAR ISSO AQUI DEPOIS
+        TV_1 = self.fresh_type_var()
+        TV_2 = self.fresh_type_var()
+        previous = self.enter_scope(exp.formal.identifier, TV_1)
+        exp.body.accept(self, TV_2)
+        self.exit_scope(exp.formal.identifier, previous)
+        self.emit(env, ArrowType(TV_1, TV_2))
 
     def visit_rec_fun(self, exp, env):
-        pass
+        TV_1 = self.fresh_type_var()
+        TV_2 = self.fresh_type_var()
+        previous_name = self.enter_scope(exp.name.identifier, ArrowType(TV_1, TV_2))
+        previous_formal = self.enter_scope(exp.formal.identifier, TV_1)
+        exp.body.accept(self, TV_2)
+        self.exit_scope(exp.formal.identifier, previous_formal)
+        self.exit_scope(exp.name.identifier, previous_name)
+        self.emit(env, ArrowType(TV_1, TV_2))
 
     def visit_mod(self, exp, env):
-        pass
+        exp.left.accept(self, type(1))
+        exp.right.accept(self, type(1))
+        self.emit(env, type(1))
+
+    def visit_nil(self, nil, env):
+        self.emit(env, ListType(self.fresh_type_var()))
+
+    def visit_cons(self, cons, env):
+        TV_1 = self.fresh_type_var()
+        cons.left.accept(self, TV_1)
+        cons.right.accept(self, ListType(TV_1))
+        self.emit(env, ListType(TV_1))
+
+    def visit_append(self, exp, env):
+        TV_1 = ListType(self.fresh_type_var())
+        exp.left.accept(self, TV_1)
+        exp.right.accept(self, TV_1)
+        self.emit(env, TV_1)
+
+    def visit_letrec(self, exp, env):
+        types, previous = self.enter_group(exp.functions)
+        for function, type_ in zip(exp.functions, types):
+            function.accept(self, type_)
+        self.generalize_group(exp.functions, types)
+        exp.exp_body.accept(self, env)
+        self.exit_group(exp.functions, previous)
+
+    def enter_group(self, functions):
+        """
+        Puts the names of a group of mutually recursive functions in scope,
+        one level deeper than the current one. Within the group, each
+        function has a single type, shared by all of its uses: the group is
+        only generalized (generalize_group) once every function has been
+        typed. Returns the types, and what the scope held before.
+        """
+        self.level += 1
+        types = [self.fresh_type_var() for _ in functions]
+        previous = [self.enter_scope(function.name.identifier, type_)
+                    for function, type_ in zip(functions, types)]
+        return types, previous
+
+    def generalize_group(self, functions, types):
+        self.level -= 1
+        for function, type_ in zip(functions, types):
+            self.scope[function.name.identifier] = generalize(type_, self.level)
+
+    def exit_group(self, functions, previous):
+        for function, before in zip(reversed(functions), reversed(previous)):
+            self.exit_scope(function.name.identifier, before)
+
+class AnalysisVisitor(CtrGenVisitor):
+    """
+    The AnalysisVisitor class does every static analysis in one traversal:
+    it collects the names used without being defined, and generates and
+    solves the type constraints. The defined names live in the scope of
+    CtrGenVisitor, which is updated on entry and restored on exit of each
+    binding, instead of being copied.
+    Errors do not stop the analysis: undefined names are collected, and the
+    first type error is recorded in type_error.
 
+    Example:
+    >>> from Runtime import parse_source
+    >>> exp = parse_source('let val a = 1 in fn x => x + a + b end')
+    >>> analysis = analyze(exp)
+    >>> analysis.undefined, analysis.type_error, type_to_string(analysis.type)
+    ({'b'}, None, 'int -> int')
+    >>> analyze(parse_source('if 1 then 2 else 3')).type_error
+    'Type Error'
+    """
+    def __init__(self, scope=None):
+        super().__init__(scope)
+        self.undefined = set()
+        self.type_error = None
+        self.type = self.fresh_type_var()
+
+    def emit(self, t0, t1):
+        if self.type_error is None:
+            try:
+                super().emit(t0, t1)
+            except SystemExit as e:
+                self.type_error = str(e.code)
+
+    def visit_var(self, var, env):
+        if var.identifier not in self.scope and var.identifier not in BUILTINS:
+            self.undefined.add(var.identifier)
+            return
+        super().visit_var(var, env)
+
+def analyze(exp, scope=None):
+    """
+    Analyzes the expression with AnalysisVisitor (or, on trees deeper than
+    the Python stack, with its iterative port in Traversal.py), and returns
+    the visitor, whose attributes undefined, type and type_error hold the
+    results. The scope maps names defined outside of the expression to their
+    types.
+    """
+    try:
+        analysis = AnalysisVisitor(scope)
+        exp.accept(analysis, analysis.type)
+    except RecursionError:
+        from Traversal import IterativeAnalysisVisitor, run
+        analysis = IterativeAnalysisVisitor(scope)
+        run(analysis, exp, analysis.type)
+    return analysis
+
+def app_spine(exp):
+    """
+    Returns the function and the list of arguments of an application to
+    several arguments.
+
+    Example:
+    >>> function, actuals = app_spine(App(App(Var('f'), Num(1)), Num(2)))
+    >>> function.identifier, [actual.num for actual in actuals]
+    ('f', [1, 2])
+    """
+    actuals = []
+    while type(exp) is App:
+        actuals.append(exp.actual)
+        exp = exp.function
+    actuals.reverse()
+    return exp, actuals
+
+def saturated_arity(function_value):
+    """
+    Returns the number of arguments that a function value can take in a
+    single call: the arity of a closure, or the number of arguments that a
+    primitive is missing. Stops the program if the value is not a function.
+    """
+    if isinstance(function_value, Function):
+        return function_value.arity
+    if isinstance(function_value, Primitive):
+        return function_value.arity - len(function_value.args)
+    sys.exit("Type Error")
+
+def identifier_name(identifier):
+    """
+    Returns the name of an identifier. The parser represents the names bound by
+    let as Var nodes, but expressions built directly may use plain strings.
+    """
+    return getattr(identifier, "identifier", identifier)
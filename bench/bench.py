@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Benchmarks do interpretador SML
+
+Gera programas sintéticos (ver generators.py) em vários tamanhos e mede,
+separadamente, cada fase do interpretador: Lexer, Parser, UseDefVisitor,
+CtrGenVisitor + Unifier, a análise combinada (AnalysisVisitor) e a avaliação
+(Traversal.evaluate, como no sml.py). Cada medida tem aquecimento,
+repetições e um resumo estatístico; os resultados são gravados em JSON.
+
+Uso:
+    python3 bench/bench.py run [-g GERADOR...] [-s TAMANHO...] [-o ARQ]
+    python3 bench/bench.py compare base.json novo.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import threading
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from Lexer import Lexer
+from Parser import Parser
+from Visitor import UseDefVisitor, analyze
+from Traversal import evaluate
+from Unifier import infer_types
+from generators import GENERATORS
+
+DEFAULT_SIZES = [50, 100, 200, 400]
+
+# Os programas gerados são profundos; as fases recursivas precisam de uma
+# pilha maior que a padrão.
+RECURSION_LIMIT = 1000000
+STACK_SIZE = 512 * 1024 * 1024
+
+def phases(source):
+    """
+    Devolve as fases do interpretador para um programa, na ordem em que são
+    executadas. Cada fase é uma função sem argumentos; as entradas de cada
+    fase são preparadas uma única vez, para que só a fase seja medida.
+    """
+    tokens = list(Lexer(source).tokens())
+    exp = Parser(tokens).parse()
+    return [
+        ("lexer", lambda: list(Lexer(source).tokens())),
+        ("parser", lambda: Parser(tokens).parse()),
+        ("usedef", lambda: exp.accept(UseDefVisitor(), set())),
+        ("typecheck", lambda: infer_types(exp)),
+        ("analysis", lambda: analyze(exp)),
+        ("eval", lambda: evaluate(exp, {})),
+    ]
+
+def summarize(times):
+    return {
+        "mean": statistics.mean(times),
+        "median": statistics.median(times),
+        "min": min(times),
+        "max": max(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+def measure(run, repeat, warmup):
+    """Mede uma fase: devolve os tempos e o resumo, ou o erro que ela gerou"""
+    try:
+        for _ in range(warmup):
+            run()
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+    except SystemExit as e:
+        return {"error": str(e.code)}
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    return dict(summarize(times), times=times)
+
+def run_benchmarks(generators, sizes, repeat, warmup, phase_names=None):
+    results = []
+    for name in generators:
+        for size in sizes:
+            source = GENERATORS[name](size)
+            try:
+                program_phases = phases(source)
+            except (SystemExit, Exception) as e:
+                results.append({"generator": name, "size": size, "phase": "parser",
+                                "error": str(e)})
+                continue
+            for phase, run in program_phases:
+                if phase_names and phase not in phase_names:
+                    continue
+                entry = {"generator": name, "size": size, "phase": phase,
+                         "source_bytes": len(source)}
+                entry.update(measure(run, repeat, warmup))
+                results.append(entry)
+                if "error" in entry:
+                    print(f"  {name:15s} {size:7d} {phase:10s} erro: {entry['error']}")
+                else:
+                    print(f"  {name:15s} {size:7d} {phase:10s} "
+                          f"{entry['median'] * 1000:10.3f} ms ± {entry['stdev'] * 1000:.3f}")
+    return results
+
+def run_with_big_stack(function, *args):
+    """Executa a função em uma thread com pilha grande"""
+    sys.setrecursionlimit(RECURSION_LIMIT)
+    threading.stack_size(STACK_SIZE)
+    outcome = {}
+    def target():
+        outcome["result"] = function(*args)
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    return outcome["result"]
+
+def key(entry):
+    return (entry["generator"], entry["size"], entry["phase"])
+
+def compare(base_file, new_file, threshold):
+    """
+    Compara dois arquivos de resultados, pela mediana de cada medida, e
+    devolve o número de regressões maiores que o limiar.
+    """
+    with open(base_file, 'r', encoding='utf-8') as f:
+        base = {key(e): e for e in json.load(f)["results"]}
+    with open(new_file, 'r', encoding='utf-8') as f:
+        new = {key(e): e for e in json.load(f)["results"]}
+
+    regressions = 0
+    print(f"{'gerador':15s} {'tamanho':>7s} {'fase':10s} {'base (ms)':>12s} "
+          f"{'novo (ms)':>12s} {'speedup':>8s}")
+    for k in sorted(base.keys() & new.keys()):
+        b, n = base[k], new[k]
+        if "error" in b or "error" in n:
+            print(f"{k[0]:15s} {k[1]:7d} {k[2]:10s} "
+                  f"{b.get('error', 'ok'):>12.12s} {n.get('error', 'ok'):>12.12s}")
+            continue
+        speedup = b["median"] / n["median"] if n["median"] else float("inf")
+        mark = ""
+        if n["median"] > b["median"] * (1 + threshold):
+            regressions += 1
+            mark = "  <- regressão"
+        print(f"{k[0]:15s} {k[1]:7d} {k[2]:10s} {b['median'] * 1000:12.3f} "
+              f"{n['median'] * 1000:12.3f} {speedup:7.2f}x{mark}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do interpretador SML")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='Executa os benchmarks')
+    run.add_argument('-g', '--generators', nargs='+', choices=sorted(GENERATORS),
+                     default=sorted(GENERATORS), help='Geradores de programas')
+    run.add_argument('-s', '--sizes', nargs='+', type=int, default=DEFAULT_SIZES,
+                     help='Tamanhos dos programas')
+    run.add_argument('-p', '--phases', nargs='+',
+                     choices=['lexer', 'parser', 'usedef', 'typecheck', 'analysis', 'eval'],
+                     help='Fases medidas (padrão: todas)')
+    run.add_argument('-r', '--repeat', type=int, default=5,
+                     help='Repetições de cada medida')
+    run.add_argument('-w', '--warmup', type=int, default=1,
+                     help='Execuções de aquecimento')
+    run.add_argument('-o', '--output', default='bench_results.json',
+                     help='Arquivo JSON de saída')
+
+    cmp = commands.add_parser('compare', help='Compara dois resultados')
+    cmp.add_argument('base')
+    cmp.add_argument('new')
+    cmp.add_argument('--threshold', type=float, default=0.10,
+                     help='Regressão tolerada (padrão: 0.10 = 10%%)')
+
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        regressions = compare(args.base, args.new, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    results = run_with_big_stack(run_benchmarks, args.generators, args.sizes,
+                                 args.repeat, args.warmup, args.phases)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+        },
+        "results": results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados gravados em {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Synthetic SML programs for the benchmarks. Every generator takes a size n
+and returns the source text of a program whose cost grows with n, so that
+the same shape can be measured at several sizes and plotted as a curve.
+
+Example:
+>>> import os, sys
+>>> sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+>>> from Runtime import run_source
+>>> [run_source(GENERATORS[name](10))['value'] for name in sorted(GENERATORS)]
+['11', '55', '1', '10', '60', '6', '55', '10']
+"""
+
+def op_chain(n):
+    """
+    A left-deep chain of n arithmetic operators: 1 + 2 - 1 + 2 - ...
+
+    >>> op_chain(4)
+    '1 + 2 - 1 + 2 - 1'
+    """
+    parts = ["1"]
+    for i in range(n):
+        parts.append("+ 2" if i % 2 == 0 else "- 1")
+    return " ".join(parts)
+
+def let_nest(n):
+    """
+    n nested let expressions, each one using the previous binding.
+
+    >>> let_nest(2)
+    'let val x1 = 1 in let val x2 = x1 + 1 in x2 end end'
+    """
+    parts = ["let val x1 = 1 in"]
+    for i in range(2, n + 1):
+        parts.append(f"let val x{i} = x{i - 1} + 1 in")
+    parts.append(f"x{n}")
+    parts.append(" ".join(["end"] * n))
+    return " ".join(parts)
+
+def wide_closure(n):
+    """
+    A closure that captures n variables, applied n times by a recursive
+    function, so that every application copies a wide environment.
+    """
+    parts = [f"let val a{i} = {i} in" for i in range(1, n + 1)]
+    total = " + ".join(f"a{i}" for i in range(1, n + 1))
+    parts.append(f"let val f = fn y => y + ({total}) - ({total}) in")
+    parts.append("let fun loop k = if k = 0 then 0 else f 1 + loop (k - 1)")
+    parts.append(f"in loop {n} end end")
+    parts.append(" ".join(["end"] * n))
+    return " ".join(parts)
+
+def deep_recursion(n):
+    """
+    A non-tail recursive sum of the first n integers.
+
+    >>> deep_recursion(3)
+    'let fun sum k = if k = 0 then 0 else k + sum (k - 1) in sum 3 end'
+    """
+    return f"let fun sum k = if k = 0 then 0 else k + sum (k - 1) in sum {n} end"
+
+def tail_recursion(n):
+    """
+    A tail recursive sum of the first n integers, using a curried
+    accumulator.
+    """
+    return ("let fun loop k = fn acc => if k = 0 then acc "
+            f"else loop (k - 1) (acc + k) in loop {n} 0 end")
+
+def compose_tower(n):
+    """
+    A tower of n applications of a higher-order compose function.
+
+    >>> compose_tower(2)
+    'let val compose = fn f => fn g => fn x => f (g x) in let val succ = fn x => x + 1 in (compose succ (compose succ (succ))) 0 end end'
+    """
+    tower = "succ"
+    for _ in range(n):
+        tower = f"compose succ ({tower})"
+    return ("let val compose = fn f => fn g => fn x => f (g x) in "
+            "let val succ = fn x => x + 1 in "
+            f"({tower}) 0 end end")
+
+def literals(n):
+    """
+    A large source made mostly of literals in several bases, booleans and
+    conditionals.
+
+    >>> literals(2)
+    '(if true then 0x1 else 0b10) + (if false then 0x2 else 0b11)'
+    """
+    terms = []
+    for i in range(1, n + 1):
+        cond = "true" if i % 2 else "false"
+        terms.append(f"(if {cond} then {hex(i)} else {bin(i + 1)})")
+    return " + ".join(terms)
+
+def eq_chain(n):
+    """
+    A chain of n comparisons combined by boolean operators, evaluating to 1.
+    """
+    terms = " and ".join(f"({i} < {i + 1} or {i} = {i})" for i in range(n))
+    return f"if {terms} then 1 else 0"
+
+GENERATORS = {
+    "op_chain": op_chain,
+    "let_nest": let_nest,
+    "wide_closure": wide_closure,
+    "deep_recursion": deep_recursion,
+    "tail_recursion": tail_recursion,
+    "compose_tower": compose_tower,
+    "literals": literals,
+    "eq_chain": eq_chain,
+}
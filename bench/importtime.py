@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Orçamento de tempo de importação do sml.py
+
+Executa `python -X importtime sml.py` sobre um programa curto e soma o tempo
+de importação de cada módulo de primeiro nível. O caminho rápido do sml.py
+(um programa, sem opções) não deve importar os módulos das outras opções,
+e o tempo total de importação deve caber no orçamento.
+
+Uso:
+    python3 bench/importtime.py [--budget-ms MS] [--repeat N] [-- comando...]
+
+Sem comando, mede `sml.py` sobre o programa '1', lido da entrada padrão.
+O código de saída é 1 se o orçamento for ultrapassado.
+
+Example:
+>>> report = import_times()
+>>> sorted(set(report['modules']) & set(LAZY_MODULES))
+[]
+>>> report['total'] > 0
+True
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que o caminho rápido não deve importar.
+LAZY_MODULES = ["argparse", "json", "glob", "hashlib", "inspect", "multiprocessing",
+                "concurrent", "Runtime", "Unifier", "Profiler", "Stats", "Tracing"]
+
+DEFAULT_BUDGET_MS = 60.0
+
+def import_times(command=None, source="1"):
+    """
+    Executa o comando com -X importtime e devolve o tempo cumulativo (em
+    segundos) de cada módulo importado no primeiro nível e o total
+    """
+    command = command or [os.path.join(ROOT, "sml.py")]
+    result = subprocess.run([sys.executable, "-X", "importtime", *command],
+                            input=source, capture_output=True, text=True, cwd=ROOT)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Os módulos importados por outros módulos aparecem indentados.
+        if not name.startswith("  "):
+            modules[name.strip()] = int(cumulative) / 1e6
+    return {"modules": modules, "total": sum(modules.values()),
+            "output": result.stdout, "returncode": result.returncode}
+
+def main():
+    parser = argparse.ArgumentParser(description="Orçamento de importação do sml.py")
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help=f'Tempo máximo de importação (padrão: {DEFAULT_BUDGET_MS} ms)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Execuções; vale a de menor tempo')
+    parser.add_argument('command', nargs='*',
+                        help='Comando medido (padrão: sml.py)')
+    args = parser.parse_args()
+
+    reports = [import_times(args.command or None) for _ in range(max(args.repeat, 1))]
+    best = min(reports, key=lambda report: report["total"])
+    for name, seconds in sorted(best["modules"].items(), key=lambda item: -item[1]):
+        print(f"{name:30s} {seconds * 1000:10.3f} ms")
+    lazy = sorted(set(best["modules"]) & set(LAZY_MODULES))
+    total = best["total"] * 1000
+    print(f"{'total':30s} {total:10.3f} ms (orçamento: {args.budget_ms:.1f} ms)")
+    if lazy:
+        print(f"❌ módulos que deveriam ser importados sob demanda: {', '.join(lazy)}")
+    if total > args.budget_ms:
+        print("❌ orçamento de importação ultrapassado")
+    sys.exit(1 if lazy or total > args.budget_ms else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Empacota o interpretador em um único arquivo executável (zipapp)
+
+Os módulos são compilados para bytecode antes de entrar no arquivo, e só o
+bytecode é guardado: o Python não precisa ler nem compilar os fontes a cada
+execução, mesmo quando não pode gravar __pycache__. O bytecode só vale para
+a versão do Python que gerou o arquivo.
+
+Uso:
+    python3 build_zipapp.py [-o sml.pyz] [--python /usr/bin/env python3]
+
+Depois:
+    echo "2 + 3" | ./sml.pyz
+    python3 sml.pyz --batch examples
+"""
+
+import os
+import sys
+import argparse
+import zipfile
+import tempfile
+import py_compile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+MODULES = ["sml", "Expression", "Lexer", "Parser", "Visitor", "Types", "Builtins", "Traversal",
+           "Module", "Runtime", "Unifier", "Tracing", "Profiler", "Stats"]
+
+MAIN = "import sml\nsml.main()\n"
+
+def compile_module(name, directory):
+    """Compila um módulo e devolve o conteúdo do arquivo .pyc"""
+    source = os.path.join(ROOT, name + ".py")
+    target = os.path.join(directory, name + ".pyc")
+    # Sem data no cabeçalho: o bytecode não depende do momento da compilação.
+    py_compile.compile(source, cfile=target, dfile=name + ".py", doraise=True,
+                       invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+    with open(target, 'rb') as f:
+        return f.read()
+
+def build(output, interpreter="/usr/bin/env python3"):
+    with tempfile.TemporaryDirectory() as directory:
+        with open(output, 'wb') as f:
+            f.write(f"#!{interpreter}\n".encode())
+            with zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr("__main__.py", MAIN)
+                for name in MODULES:
+                    archive.writestr(name + ".pyc", compile_module(name, directory))
+    os.chmod(output, 0o755)
+
+def main():
+    parser = argparse.ArgumentParser(description="Empacota o interpretador em um zipapp")
+    parser.add_argument('-o', '--output', default=os.path.join(ROOT, "sml.pyz"),
+                        help='Arquivo gerado (padrão: sml.pyz)')
+    parser.add_argument('--python', default="/usr/bin/env python3",
+                        help='Interpretador da linha #! do arquivo')
+    args = parser.parse_args()
+    build(args.output, args.python)
+    print(f"✅ {args.output} ({os.path.getsize(args.output)} bytes, "
+          f"Python {sys.version_info.major}.{sys.version_info.minor})")
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,22 @@ if __name__ == "__main__":
     """
     Este arquivo nao deve ser alterado, mas deve ser enviado para resolver o
     VPL. O arquivo contem o codigo que testa a implementacao do parser.
+
+    Com 'python3 driver.py --stream [N] [--cache PASTA]', le pedidos
+    enquadrados da entrada padrao, e responde cada um (veja Runtime.serve),
+    usando N processos e, se houver, um cache de respostas em PASTA.
     """
+    if sys.argv[1:2] == ['--stream']:
+        from Runtime import serve
+        args = sys.argv[2:]
+        cache = None
+        if '--cache' in args:
+            index = args.index('--cache')
+            cache = args[index + 1]
+            del args[index:index + 2]
+        jobs = int(args[0]) if args else 1
+        serve(sys.stdin.buffer, sys.stdout.buffer, jobs, cache)
+        sys.exit(0)
     text = sys.stdin.read()
     (option, rest) = text.split(maxsplit=1)
     lexer = Lexer(rest)
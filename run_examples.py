@@ -1,62 +1,188 @@
 #!/usr/bin/env python3
 """
 Script para executar todos os exemplos SML
+
+Cada arquivo é avaliado por inteiro, no próprio processo, através de
+Runtime.run_source. Os arquivos são distribuídos entre processos de um pool,
+e os resultados ficam em cache, indexados pelo hash do conteúdo do arquivo e
+da versão do interpretador. O resultado de cada arquivo é comparado com a
+saída esperada, guardada em um arquivo '.expected' ao lado do programa.
+Um arquivo que dispara uma exceção Python (um erro do interpretador, não do
+programa) sempre falha, e sua saída nunca é gravada como esperada.
+
+Uso:
+    python3 run_examples.py [opções] [arquivos ou pastas...]
+
+Opções:
+    -j, --jobs N     Número de processos (padrão: número de CPUs)
+    --update         Regrava as saídas esperadas com os resultados atuais
+    --no-cache       Ignora o cache de resultados
+    --report ARQ     Grava um relatório JSON com os tempos de cada arquivo
 """
 
 import os
-import subprocess
 import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+from Runtime import run_source, INTERPRETER_MODULES
+
+CACHE_FILE = os.path.join(ROOT, ".run_examples_cache.json")
+INTERPRETER_FILES = [name + ".py" for name in INTERPRETER_MODULES]
+
+def interpreter_digest():
+    """Hash dos fontes do interpretador: invalida o cache quando mudam"""
+    digest = hashlib.sha256()
+    for name in INTERPRETER_FILES:
+        with open(os.path.join(ROOT, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def format_result(result):
+    """Formata o resultado como o sml.py o imprime"""
+    if result.get("crashed"):
+        return f"Erro interno: {result['error']}"
+    if result["error"] is not None:
+        return f"Erro: {result['error']}"
+    return result["value"]
+
+def expected_path(filepath):
+    return os.path.splitext(filepath)[0] + ".expected"
+
+def collect_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, f) for f in sorted(os.listdir(path))
+                         if f.endswith('.sml'))
+        else:
+            files.append(path)
+    return files
+
+def evaluate_file(filepath):
+    """Avalia um arquivo inteiro; executado nos processos do pool"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return run_source(f.read())
+
+def load_cache(use_cache):
+    if not use_cache or not os.path.exists(CACHE_FILE):
+        return {}
+    try:
+        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_cache(cache):
+    tmp = f"{CACHE_FILE}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    os.replace(tmp, CACHE_FILE)
+
+def run_examples(paths, jobs=None, update=False, use_cache=True):
+    """
+    Avalia os arquivos e devolve o relatório, com uma entrada por arquivo.
+    """
+    start = time.perf_counter()
+    files = collect_files(paths)
+    version = interpreter_digest()
+    cache = load_cache(use_cache)
+
+    keys = {}
+    for filepath in files:
+        with open(filepath, 'rb') as f:
+            keys[filepath] = hashlib.sha256(version.encode() + f.read()).hexdigest()
+
+    pending = [f for f in files if keys[f] not in cache]
+    results = {f: cache[keys[f]] for f in files if keys[f] in cache}
+    if len(pending) > 1 and jobs != 1:
+        with ProcessPoolExecutor(jobs) as pool:
+            results.update(zip(pending, pool.map(evaluate_file, pending)))
+    else:
+        results.update((f, evaluate_file(f)) for f in pending)
+
+    entries = []
+    for filepath in files:
+        result = results[filepath]
+        cache[keys[filepath]] = result
+        output = format_result(result)
+        crashed = result.get("crashed", False)
+        expected_file = expected_path(filepath)
+        if update and not crashed:
+            with open(expected_file, 'w', encoding='utf-8') as f:
+                f.write(output + "\n")
+        if os.path.exists(expected_file):
+            with open(expected_file, 'r', encoding='utf-8') as f:
+                expected = f.read().rstrip("\n")
+            status = "pass" if expected == output and not crashed else "fail"
+        else:
+            expected, status = None, "fail" if crashed else "new"
+        entries.append({
+            "file": filepath,
+            "value": result["value"],
+            "error": result["error"],
+            "crashed": crashed,
+            "expected": expected,
+            "status": status,
+            "cached": filepath not in pending,
+            "time": result["time"],
+        })
+
+    if use_cache:
+        save_cache(cache)
+    return {
+        "files": entries,
+        "passed": sum(e["status"] == "pass" for e in entries),
+        "failed": sum(e["status"] == "fail" for e in entries),
+        "new": sum(e["status"] == "new" for e in entries),
+        "time": time.perf_counter() - start,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Executa os exemplos SML")
+    parser.add_argument('paths', nargs='*', default=[os.path.join(ROOT, "examples")],
+                        help='Arquivos .sml ou pastas com arquivos .sml')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Número de processos (padrão: número de CPUs)')
+    parser.add_argument('--update', action='store_true',
+                        help='Regrava as saídas esperadas')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Ignora o cache de resultados')
+    parser.add_argument('--report', metavar='ARQUIVO',
+                        help='Grava o relatório em JSON')
+    args = parser.parse_args()
+
+    files = collect_files(args.paths)
+    if not files:
+        print("❌ Nenhum arquivo .sml encontrado")
+        sys.exit(1)
 
-def run_examples():
-    examples_dir = "examples"
-    if not os.path.exists(examples_dir):
-        print("❌ Pasta de exemplos não encontrada")
-        return
-    
-    sml_files = [f for f in os.listdir(examples_dir) if f.endswith('.sml')]
-    
-    if not sml_files:
-        print("❌ Nenhum arquivo .sml encontrado na pasta examples")
-        return
-    
     print("🚀 Executando exemplos SML...")
     print("=" * 50)
-    
-    for sml_file in sorted(sml_files):
-        filepath = os.path.join(examples_dir, sml_file)
-        print(f"\n📁 Executando {sml_file}:")
-        print("-" * 30)
-        
-        try:
-            # Lê o conteúdo do arquivo
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Executa cada linha não-comentário
-            lines = [line.strip() for line in content.split('\n') 
-                    if line.strip() and not line.strip().startswith('--')]
-            
-            for line in lines:
-                if line:
-                    print(f"sml> {line}")
-                    result = subprocess.run(
-                        [sys.executable, 'sml.py'], 
-                        input=line, 
-                        text=True, 
-                        capture_output=True
-                    )
-                    
-                    if result.returncode == 0:
-                        print(f"=> {result.stdout.strip()}")
-                    else:
-                        print(f"Erro: {result.stderr.strip()}")
-                    print()
-        
-        except Exception as e:
-            print(f"❌ Erro ao executar {sml_file}: {e}")
-    
+
+    report = run_examples(args.paths, args.jobs, args.update, not args.no_cache)
+    marks = {"pass": "✅", "fail": "❌", "new": "🆕"}
+    for entry in report["files"]:
+        output = format_result(entry)
+        print(f"{marks[entry['status']]} {os.path.basename(entry['file'])}: "
+              f"{output} ({entry['time'] * 1000:.2f} ms)")
+        if entry["status"] == "fail":
+            print(f"   esperado: {entry['expected']}")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
     print("=" * 50)
-    print("✅ Execução dos exemplos concluída!")
+    print(f"{report['passed']} ok, {report['failed']} falhas, "
+          f"{report['new']} sem saída esperada em {report['time']:.2f} s")
+    sys.exit(1 if report["failed"] else 0)
 
 if __name__ == "__main__":
-    run_examples()
+    main()
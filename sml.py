@@ -10,7 +10,8 @@ Este interpretador suporta:
 - Expressões condicionais (if-then-else)
 - Operações aritméticas (+, -, *, /)
 - Operações lógicas (and, or, not)
-- Comparações (=, <, <=)
+- Comparações (=, <, <=, >, >=)
+- Programas com declarações de topo (val, fun, fun ... and ...)
 - Números inteiros e booleanos
 
 Uso:
@@ -22,16 +23,37 @@ Opções:
     -v, --verbose   Modo verboso (mostra tokens e AST)
     --ast-only      Mostra apenas a AST sem avaliar
     --tokens-only   Mostra apenas os tokens
+    -t, --typecheck Infere o tipo do programa antes de avaliá-lo
+    --prelude ARQ   Avalia as declarações de ARQ antes do programa
+    --profile       Mostra o custo de cada linha do programa (em stderr)
+    --callgraph     Mostra o custo de cada função do programa (em stderr)
+    --flamegraph ARQ  Grava as pilhas de chamadas no formato 'collapsed'
+    --memprofile    Mostra a memória de ambientes e closures por linha
+    --mem-snapshot L  Tira um snapshot das closures vivas ao chegar à linha L
+    --stats         Mostra tempos de cada fase e contadores da execução
+    --repeat N      Executa o programa N vezes (média/mínimo/desvio)
+    --batch ALVO    Avalia vários arquivos (pasta, glob ou @lista), em JSON lines
+    --jobs N        Número de processos do modo batch
+    --ordered       No modo batch, imprime na ordem de entrada
+    --cache DIR     Guarda os resultados em DIR e reaproveita os já calculados
+    --save-image ARQ  Grava o ambiente do --prelude avaliado em uma imagem
+    --image ARQ     Começa do ambiente gravado na imagem (em vez do --prelude)
+    --primitives ARQ.py  Executa ARQ.py, que registra primitivas em Python
     
 Se nenhum arquivo for especificado, lê da entrada padrão.
 """
 
+# Só os módulos usados para avaliar um programa são importados aqui; os das
+# outras opções (argparse, Runtime, Profiler, Stats, Unifier...) são
+# importados quando a opção é usada, para que programas curtos iniciem rápido.
+import os
 import sys
-import argparse
+import time
 from Expression import *
 from Visitor import *
 from Lexer import Lexer
 from Parser import Parser
+from Traversal import evaluate
 
 def print_tokens(code):
     """Imprime os tokens gerados pelo lexer"""
@@ -43,57 +65,49 @@ def print_tokens(code):
     print()
     return tokens
 
+# Cabeçalho e filhos (com rótulo, se houver) de cada classe de nó. As classes
+# que não estão na tabela são impressas só pelo nome.
+AST_FORMAT = {
+    Num: lambda e: (f"Num({e.num})", []),
+    Bln: lambda e: (f"Bln({e.bln})", []),
+    Var: lambda e: (f"Var({e.identifier})", []),
+    Add: lambda e: ("Add", [(None, e.left), (None, e.right)]),
+    Sub: lambda e: ("Sub", [(None, e.left), (None, e.right)]),
+    Mul: lambda e: ("Mul", [(None, e.left), (None, e.right)]),
+    Div: lambda e: ("Div", [(None, e.left), (None, e.right)]),
+    Cons: lambda e: ("Cons", [(None, e.left), (None, e.right)]),
+    Append: lambda e: ("Append", [(None, e.left), (None, e.right)]),
+    Fn: lambda e: (f"Fn({e.formal.identifier})", [(None, e.body)]),
+    App: lambda e: ("App", [("function:", e.function), ("argument:", e.actual)]),
+    Let: lambda e: (f"Let({e.identifier.identifier})",
+                    [("value:", e.exp_def), ("body:", e.exp_body)]),
+    LetRec: lambda e: ("LetRec", [*((None, f) for f in e.functions), ("body:", e.exp_body)]),
+    IfThenElse: lambda e: ("IfThenElse", [("condition:", e.cond), ("then:", e.e0),
+                                          ("else:", e.e1)]),
+}
+
 def print_ast(exp, indent=0):
-    """Imprime a AST de forma hierárquica"""
-    spaces = "  " * indent
-    
-    if isinstance(exp, Num):
-        print(f"{spaces}Num({exp.num})")
-    elif isinstance(exp, Bln):
-        print(f"{spaces}Bln({exp.bln})")
-    elif isinstance(exp, Var):
-        print(f"{spaces}Var({exp.identifier})")
-    elif isinstance(exp, Add):
-        print(f"{spaces}Add")
-        print_ast(exp.left, indent + 1)
-        print_ast(exp.right, indent + 1)
-    elif isinstance(exp, Sub):
-        print(f"{spaces}Sub")
-        print_ast(exp.left, indent + 1)
-        print_ast(exp.right, indent + 1)
-    elif isinstance(exp, Mul):
-        print(f"{spaces}Mul")
-        print_ast(exp.left, indent + 1)
-        print_ast(exp.right, indent + 1)
-    elif isinstance(exp, Div):
-        print(f"{spaces}Div")
-        print_ast(exp.left, indent + 1)
-        print_ast(exp.right, indent + 1)
-    elif isinstance(exp, Fn):
-        print(f"{spaces}Fn({exp.formal.identifier})")
-        print_ast(exp.body, indent + 1)
-    elif isinstance(exp, App):
-        print(f"{spaces}App")
-        print(f"{spaces}  function:")
-        print_ast(exp.function, indent + 2)
-        print(f"{spaces}  argument:")
-        print_ast(exp.actual, indent + 2)
-    elif isinstance(exp, Let):
-        print(f"{spaces}Let({exp.identifier.identifier})")
-        print(f"{spaces}  value:")
-        print_ast(exp.exp_def, indent + 2)
-        print(f"{spaces}  body:")
-        print_ast(exp.exp_body, indent + 2)
-    elif isinstance(exp, IfThenElse):
-        print(f"{spaces}IfThenElse")
-        print(f"{spaces}  condition:")
-        print_ast(exp.cond, indent + 2)
-        print(f"{spaces}  then:")
-        print_ast(exp.e0, indent + 2)
-        print(f"{spaces}  else:")
-        print_ast(exp.e1, indent + 2)
-    else:
-        print(f"{spaces}{type(exp).__name__}")
+    """Imprime a AST de forma hierárquica, com uma pilha explícita"""
+    stack = [(exp, indent)]
+    while stack:
+        item, indent = stack.pop()
+        spaces = "  " * indent
+        if isinstance(item, str):
+            print(f"{spaces}{item}")
+            continue
+        node_format = next((AST_FORMAT[cls] for cls in type(item).__mro__
+                            if cls in AST_FORMAT), None)
+        if node_format is None:
+            print(f"{spaces}{type(item).__name__}")
+            continue
+        header, parts = node_format(item)
+        print(f"{spaces}{header}")
+        for label, child in reversed(parts):
+            if label is None:
+                stack.append((child, indent + 1))
+            else:
+                stack.append((child, indent + 2))
+                stack.append((label, indent + 1))
 
 def evaluate_code(code, verbose=False):
     """Avalia um código SML e retorna o resultado"""
@@ -112,8 +126,7 @@ def evaluate_code(code, verbose=False):
             print_ast(exp)
             print()
         
-        visitor = EvalVisitor()
-        result = exp.accept(visitor, {})
+        result = evaluate(exp, {})
         
         return result, exp
         
@@ -121,8 +134,32 @@ def evaluate_code(code, verbose=False):
         print(f"Erro: {e}", file=sys.stderr)
         return None, None
 
-def interactive_mode():
-    """Modo interativo - REPL"""
+def print_result(result):
+    """Imprime o resultado de uma entrada de uma sessão (Runtime.Session)"""
+    if result["error"] is not None:
+        print(f"Erro: {result['error']}")
+        return
+    for name, type_name in result["names"]:
+        print(f"val {name} : {type_name}")
+    if result["value"] is not None:
+        print(f"=> {result['value']} : {result['type']}")
+
+def print_times(times):
+    """Imprime o tempo de cada fase de uma entrada"""
+    for phase, seconds in times.items():
+        print(f"  {phase:10s} {seconds * 1000:10.3f} ms")
+
+def interactive_mode(prelude=None, image=None):
+    """
+    Modo interativo - REPL. As declarações val/fun ficam definidas para as
+    próximas entradas; cada entrada é analisada e avaliada sobre o ambiente
+    já construído, sem reprocessar as anteriores.
+    """
+    from Runtime import load_image, Session
+    session = Session(*load_image(image)) if image else Session()
+    if prelude:
+        print_result(session.run(prelude))
+
     print("SML Subset Interpreter - Modo Interativo")
     print("Digite 'quit' ou 'exit' para sair")
     print("Digite 'help' para ver comandos disponíveis")
@@ -142,6 +179,8 @@ Comandos disponíveis:
   quit/exit    - Sai do interpretador
   :tokens      - Mostra os tokens da próxima expressão
   :ast         - Mostra a AST da próxima expressão
+  :time CÓDIGO - Executa o código e mostra o tempo de cada fase
+  :stats       - Mostra as definições e os tempos da última entrada
   
 Exemplos de código SML:
   42
@@ -149,8 +188,9 @@ Exemplos de código SML:
   2 + 3 * 4
   fn x => x + 1
   (fn x => x * x) 5
-  let x <- 10 in x + 5 end
-  if 2 < 3 then "verdadeiro" else "falso"
+  val dobro = fn x => x * 2
+  fun fat n = if n <= 1 then 1 else n * fat (n - 1)
+  let val x = 10 in x + 5 end
                 """)
                 continue
             elif code.strip() == '':
@@ -169,11 +209,20 @@ Exemplos de código SML:
                     print_ast(exp)
                 except Exception as e:
                     print(f"Erro: {e}")
+                except SystemExit as e:
+                    print(f"Erro: {e.code}")
+                continue
+            elif code.startswith(':time'):
+                print_result(session.run(code[len(':time'):]))
+                print_times(session.last_times)
+                continue
+            elif code.startswith(':stats'):
+                print(f"  entradas   {session.inputs}")
+                print(f"  definições {len(session.env)}")
+                print_times(session.last_times)
                 continue
             
-            result, exp = evaluate_code(code)
-            if result is not None:
-                print(f"=> {result}")
+            print_result(session.run(code))
                 
         except KeyboardInterrupt:
             print("\nGoodbye!")
@@ -182,7 +231,154 @@ Exemplos de código SML:
             print("\nGoodbye!")
             break
 
+def batch_files(target):
+    """
+    Lista os arquivos do modo batch: os arquivos .sml de uma pasta, os que
+    casam com um padrão glob, ou os listados (um por linha) em @arquivo
+    """
+    import glob
+    if target.startswith('@'):
+        with open(target[1:], 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f
+                    if line.strip() and not line.startswith('#')]
+    if os.path.isdir(target):
+        return [os.path.join(target, f) for f in sorted(os.listdir(target))
+                if f.endswith('.sml')]
+    return sorted(glob.glob(target, recursive=True))
+
+def batch_mode(target, jobs=None, ordered=False, prelude="", cache=None, image=None):
+    """
+    Avalia muitos arquivos em uma única invocação, distribuídos entre os
+    processos de um Runtime.WorkerPool, e imprime um objeto JSON por linha
+    assim que cada resultado fica pronto. Se cache é uma pasta, os resultados
+    ficam em um Runtime.ResultCache. Devolve o número de arquivos com erro.
+    """
+    import json
+    from Runtime import (load_image, load_prelude, image_context, run_file,
+                         ResultCache, WorkerPool)
+    try:
+        files = batch_files(target)
+    except OSError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not files:
+        print(f"Erro: Nenhum arquivo encontrado em '{target}'", file=sys.stderr)
+        sys.exit(1)
+
+    start = time.perf_counter()
+    errors = 0
+    def emit(result):
+        nonlocal errors
+        errors += result["error"] is not None
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+
+    if jobs == 1 or len(files) == 1:
+        if image:
+            env, _ = load_image(image)
+        else:
+            env = load_prelude(prelude) if prelude else {}
+        context = image_context(image) if image else prelude
+        results = ResultCache(cache, context) if cache else None
+        for path in files:
+            emit(run_file(path, env, results))
+        if results is not None:
+            results.close()
+    else:
+        jobs = jobs or os.cpu_count() or 1
+        # Lotes de arquivos diminuem a comunicação com os workers, sem
+        # atrasar demais os primeiros resultados.
+        chunksize = max(1, min(64, len(files) // (jobs * 8)))
+        with WorkerPool(prelude, jobs, cache, image) as pool:
+            for result in pool.map_files(files, ordered, chunksize):
+                emit(result)
+
+    print(f"{len(files)} arquivos, {errors} com erro em "
+          f"{time.perf_counter() - start:.2f} s", file=sys.stderr)
+    return errors
+
+def save_image_mode(prelude_path, image_path):
+    """
+    Avalia as declarações do prelúdio, infere os seus tipos e grava o
+    ambiente em uma imagem (Runtime.save_image), que pode ser carregada por
+    --image sem reavaliar o prelúdio
+    """
+    from Runtime import load_prelude, save_image
+    from Unifier import infer_declarations
+    if not prelude_path:
+        print("Erro: --save-image precisa de --prelude", file=sys.stderr)
+        sys.exit(1)
+    with open(prelude_path, 'r', encoding='utf-8') as f:
+        prelude = f.read()
+    env = load_prelude(prelude)
+    try:
+        types = infer_declarations(Parser(Lexer(prelude).tokens()).parse_declarations())
+    except SystemExit:
+        types = None
+    save_image(image_path, env, types)
+    print(f"Imagem gravada em {image_path} ({len(env)} nomes)", file=sys.stderr)
+
+def load_primitives(path):
+    """
+    Executa o arquivo Python path, que registra primitivas com
+    Builtins.register; é carregado antes do prelúdio e dos processos do
+    modo batch, que herdam as primitivas
+    """
+    import runpy
+    try:
+        runpy.run_path(path, run_name="__primitives__")
+    except FileNotFoundError:
+        print(f"Erro: Arquivo '{path}' não encontrado", file=sys.stderr)
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Erro nas primitivas de {path}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+def read_code(path):
+    """
+    Lê o programa de um arquivo, ou da entrada padrão se path é None, e
+    devolve o código sem os espaços das pontas e o tempo de leitura
+    """
+    read_start = time.perf_counter()
+    if path:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                code = f.read()
+        except FileNotFoundError:
+            print(f"Erro: Arquivo '{path}' não encontrado", file=sys.stderr)
+            sys.exit(1)
+        except Exception as e:
+            print(f"Erro ao ler arquivo: {e}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        code = sys.stdin.read()
+    read_time = time.perf_counter() - read_start
+    
+    # Remove quebras de linha extras
+    code = code.strip()
+    
+    if not code:
+        print("Erro: Nenhum código fornecido", file=sys.stderr)
+        sys.exit(1)
+    return code, read_time
+
+def run_program(path):
+    """Caminho rápido: avalia um programa, sem opções, e imprime o valor"""
+    code, _ = read_code(path)
+    try:
+        exp = Parser(list(Lexer(code).tokens())).parse()
+        print(evaluate(exp, {}))
+    except Exception as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        sys.exit(1)
+
 def main():
+    argv = sys.argv[1:]
+    if len(argv) <= 1 and not any(arg.startswith('-') for arg in argv):
+        run_program(argv[0] if argv else None)
+        return
+
+    import json
+    import argparse
     parser = argparse.ArgumentParser(
         description="Interpretador para um subconjunto da linguagem SML",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -192,6 +388,7 @@ Exemplos:
   python3 sml.py -i                  # Modo interativo
   python3 sml.py -v programa.sml     # Modo verboso
   echo "2 + 3" | python3 sml.py     # Lê da entrada padrão
+  python3 sml.py --batch examples -j 4  # Avalia todos os .sml da pasta
         """
     )
     
@@ -204,33 +401,78 @@ Exemplos:
                        help='Mostra apenas a AST sem avaliar')
     parser.add_argument('--tokens-only', action='store_true',
                        help='Mostra apenas os tokens')
+    parser.add_argument('-t', '--typecheck', action='store_true',
+                       help='Infere o tipo do programa antes de avaliá-lo')
+    parser.add_argument('--prelude', metavar='ARQUIVO',
+                       help='Arquivo de declarações val/fun avaliado antes do programa')
+    parser.add_argument('--profile', action='store_true',
+                       help='Mede visitas e tempo de cada nó e linha (relatório em stderr)')
+    parser.add_argument('--profile-json', metavar='ARQUIVO',
+                       help='Grava o relatório do profiler em JSON')
+    parser.add_argument('--profile-sort', choices=['exclusive', 'inclusive', 'count'],
+                       default='exclusive', help='Ordem do relatório do profiler')
+    parser.add_argument('--callgraph', action='store_true',
+                       help='Mede chamadas, profundidade, argumentos e tempo de cada função')
+    parser.add_argument('--callgraph-json', metavar='ARQUIVO',
+                       help='Grava o relatório de chamadas em JSON')
+    parser.add_argument('--flamegraph', metavar='ARQUIVO',
+                       help='Grava as pilhas de chamadas no formato collapsed (flamegraph.pl)')
+    parser.add_argument('--memprofile', action='store_true',
+                       help='Atribui a memória de ambientes e closures às linhas (em stderr)')
+    parser.add_argument('--memprofile-json', metavar='ARQUIVO',
+                       help='Grava o relatório de memória em JSON')
+    parser.add_argument('--mem-snapshot', type=int, action='append', default=[],
+                       metavar='LINHA',
+                       help='Tira um snapshot das closures vivas ao avaliar a linha (repetível)')
+    parser.add_argument('--stats', action='store_true',
+                       help='Mostra tempo de cada fase, tamanhos e contadores (em stderr)')
+    parser.add_argument('--stats-json', metavar='ARQUIVO',
+                       help='Grava as estatísticas da execução em JSON')
+    parser.add_argument('--repeat', type=int, default=1, metavar='N',
+                       help='Executa o programa N vezes e resume os tempos')
+    parser.add_argument('--batch', metavar='ALVO',
+                       help='Avalia os arquivos de uma pasta, de um glob ou de @lista '
+                            '(um resultado JSON por linha)')
+    parser.add_argument('-j', '--jobs', type=int, default=None, metavar='N',
+                       help='Número de processos do modo batch (padrão: número de CPUs)')
+    parser.add_argument('--ordered', action='store_true',
+                       help='No modo batch, imprime os resultados na ordem de entrada')
+    parser.add_argument('--cache', metavar='PASTA',
+                       help='Cache persistente de resultados, indexado pela AST normalizada')
+    parser.add_argument('--save-image', metavar='ARQUIVO',
+                       help='Avalia o --prelude e grava o ambiente em uma imagem')
+    parser.add_argument('--image', metavar='ARQUIVO',
+                       help='Carrega o ambiente de uma imagem gravada com --save-image')
+    parser.add_argument('--primitives', metavar='ARQUIVO', action='append', default=[],
+                       help='Arquivo Python que registra primitivas (repetível)')
     
     args = parser.parse_args()
+
+    for path in args.primitives:
+        load_primitives(path)
+
+    if args.save_image:
+        save_image_mode(args.prelude, args.save_image)
+        return
+
+    if args.batch:
+        prelude = ""
+        if args.prelude:
+            with open(args.prelude, 'r', encoding='utf-8') as f:
+                prelude = f.read()
+        errors = batch_mode(args.batch, args.jobs, args.ordered, prelude, args.cache,
+                            args.image)
+        sys.exit(1 if errors else 0)
     
     if args.interactive:
-        interactive_mode()
+        prelude = None
+        if args.prelude:
+            with open(args.prelude, 'r', encoding='utf-8') as f:
+                prelude = f.read()
+        interactive_mode(prelude, args.image)
         return
     
-    # Lê o código fonte
-    if args.arquivo:
-        try:
-            with open(args.arquivo, 'r', encoding='utf-8') as f:
-                code = f.read()
-        except FileNotFoundError:
-            print(f"Erro: Arquivo '{args.arquivo}' não encontrado", file=sys.stderr)
-            sys.exit(1)
-        except Exception as e:
-            print(f"Erro ao ler arquivo: {e}", file=sys.stderr)
-            sys.exit(1)
-    else:
-        code = sys.stdin.read()
-    
-    # Remove quebras de linha extras
-    code = code.strip()
-    
-    if not code:
-        print("Erro: Nenhum código fornecido", file=sys.stderr)
-        sys.exit(1)
+    code, read_time = read_code(args.arquivo)
     
     try:
         lexer = Lexer(code)
@@ -255,9 +497,106 @@ Exemplos:
             print()
             print("=== RESULTADO ===")
         
-        visitor = EvalVisitor()
-        result = exp.accept(visitor, {})
-        print(result)
+        env = {}
+        prelude = ""
+        context = ""
+        image_types = None
+        if args.image:
+            from Runtime import load_image, image_context
+            env, image_types = load_image(args.image)
+            context = image_context(args.image)
+        elif args.prelude:
+            with open(args.prelude, 'r', encoding='utf-8') as f:
+                prelude = f.read()
+            from Runtime import load_prelude
+            env = load_prelude(prelude)
+            context = prelude
+
+        program_type = None
+        if args.typecheck:
+            from Unifier import infer, infer_declarations
+            if args.image:
+                # Os nomes sem tipo na imagem aceitam qualquer tipo.
+                from Types import TypeVariable, GENERIC
+                scope = {name: TypeVariable(GENERIC) for name in env}
+                scope.update(image_types or {})
+            else:
+                scope = infer_declarations(Parser(Lexer(prelude).tokens()).parse_declarations())
+            program_type = infer(exp, scope)
+
+        if args.stats or args.stats_json or args.repeat > 1:
+            from Stats import collect_stats, format_stats
+            stats = collect_stats(code, env, max(args.repeat, 1), read_time)
+            if stats["error"] is not None:
+                print(f"Erro: {stats['error']}", file=sys.stderr)
+            else:
+                print(stats["value"])
+            print(format_stats(stats), file=sys.stderr)
+            if args.stats_json:
+                with open(args.stats_json, 'w', encoding='utf-8') as f:
+                    json.dump(stats, f, indent=2)
+            if stats["error"] is not None:
+                sys.exit(1)
+            return
+
+        profiling = args.profile or args.profile_json
+        callgraph = args.callgraph or args.callgraph_json or args.flamegraph
+        memprofile = args.memprofile or args.memprofile_json or args.mem_snapshot
+        if sum(map(bool, (profiling, callgraph, memprofile))) > 1:
+            print("Erro: --profile, --callgraph/--flamegraph e --memprofile "
+                  "não podem ser usados juntos", file=sys.stderr)
+            sys.exit(1)
+        if profiling:
+            from Profiler import NodeProfiler
+            visitor = NodeProfiler()
+            result = visitor.evaluate(exp, env)
+        elif callgraph:
+            from Profiler import CallProfiler
+            visitor = CallProfiler()
+            result = visitor.evaluate(exp, env)
+        elif memprofile:
+            from Profiler import MemoryProfiler
+            visitor = MemoryProfiler(args.mem_snapshot)
+            result = visitor.evaluate(exp, env)
+        elif args.cache:
+            from Runtime import ResultCache
+            with ResultCache(args.cache, context) as cache:
+                cached = cache.get(exp)
+                if cached is None:
+                    try:
+                        cached = {"value": str(evaluate(exp, env)), "error": None}
+                    except SystemExit as e:
+                        cached = {"value": None, "error": str(e.code)}
+                    cache.put(exp, cached)
+            if cached["error"] is not None:
+                sys.exit(cached["error"])
+            result = cached["value"]
+        else:
+            result = evaluate(exp, env)
+        if program_type is not None:
+            from Types import type_to_string
+            print(f"{result} : {type_to_string(program_type)}")
+        else:
+            print(result)
+
+        if args.profile:
+            print(visitor.format_report(code, args.profile_sort), file=sys.stderr)
+        if args.profile_json:
+            with open(args.profile_json, 'w', encoding='utf-8') as f:
+                json.dump(visitor.to_json(args.profile_sort), f, indent=2)
+        if args.callgraph:
+            print(visitor.format_report(), file=sys.stderr)
+        if args.callgraph_json:
+            with open(args.callgraph_json, 'w', encoding='utf-8') as f:
+                json.dump(visitor.to_json(), f, indent=2)
+        if args.flamegraph:
+            with open(args.flamegraph, 'w', encoding='utf-8') as f:
+                f.write("\n".join(visitor.collapsed_stacks()) + "\n")
+        if args.memprofile or (args.mem_snapshot and not args.memprofile_json):
+            print(visitor.format_report(code), file=sys.stderr)
+        if args.memprofile_json:
+            with open(args.memprofile_json, 'w', encoding='utf-8') as f:
+                json.dump(visitor.to_json(), f, indent=2)
         
     except Exception as e:
         print(f"Erro: {e}", file=sys.stderr)